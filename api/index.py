@@ -1,20 +1,41 @@
 #!/usr/bin/env python3
 # combined.py
 import os
+import time
+_IMPORT_STARTED = time.perf_counter()  # cold start medido até o fim do módulo
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
 import threading
-import time
 import logging
 import random
 import urllib.parse
 import json
+import hmac
 import re
-from datetime import datetime, timedelta
-from flask import Flask, jsonify, request
-
-# Discord imports
-import discord
-from discord.ext import commands, tasks
+import queue
+import math
+import heapq
+import bisect
+import itertools
+import socket
+import sys
+import selectors
+import gzip
+import mmap
+import struct
+from array import array
+import tempfile
+import atexit
+try:
+    import fcntl
+except ImportError:  # Windows: FileLock só protege dentro do processo
+    fcntl = None
+import contextvars
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from flask import Flask, jsonify, request, Response, stream_with_context, g
 
 # -------------------------
 # LOG
@@ -26,25 +47,275 @@ logging.basicConfig(level=logging.INFO, format='[MINI] %(message)s')
 # -------------------------
 app = Flask(__name__)
 
+# ==============================
+# RUNTIME
+# ==============================
+# "threads" (padrão): crawler, Flask e bot em threads separadas.
+# "asyncio": tudo no event loop do bot (aiohttp para HTTP de entrada e saída).
+# "serverless" (server.py / Vercel): nada roda no import; /jobs e /api servem do último
+# snapshot em disco e cada ciclo de crawl é disparado por /cron/crawl. Várias instâncias
+# podem dividir o STATE_DIR: o journal é relido a cada requisição e gravado sob lock
+# (Journal shared=True). Webhooks pendentes ficam na memória de cada instância.
+RUNTIME = os.environ.get("RUNTIME", "threads").lower()
+SERVERLESS = RUNTIME == "serverless"
+STATE_DIR = os.environ.get("STATE_DIR", "")
+if SERVERLESS and not STATE_DIR:
+    # sem disco durável, cada cold start perderia pool, histórico e contadores em silêncio
+    raise RuntimeError(
+        "RUNTIME=serverless exige STATE_DIR num volume persistente "
+        "(o /tmp da Vercel some a cada cold start)."
+    )
+CRON_SECRET = os.environ.get("CRON_SECRET", "")  # Vercel Cron manda "Authorization: Bearer <CRON_SECRET>"
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "400"))  # aviso se o import passar disso
+
 # ==============================
 # CONFIG - JOBIDS (mini API)
 # ==============================
 GAME_ID = os.environ.get("GAME_ID", "109983668079237")
-BASE_URL = f"https://games.roblox.com/v1/games/{GAME_ID}/servers/Public?sortOrder=Asc&limit=100"
+GAMES_API_URL = os.environ.get("GAMES_API_URL", "https://games.roblox.com").rstrip("/")
 MAIN_API_URL = os.environ.get("MAIN_API_URL", "https://main-jobid-production.up.railway.app/add-pool")
 
+# Vários places no mesmo processo (proxies, threads de crawl e bot compartilhados).
+# O primeiro é o padrão (/jobs, /jobids, POOL_FILE). MAIN_API_URL aceita "{place_id}";
+# PLACE_PUSH_URLS="id=url,id=url" troca o destino de places específicos.
+PLACE_IDS = [p.strip() for p in os.environ.get("PLACE_IDS", GAME_ID).split(",") if p.strip()] or [GAME_ID]
+PLACE_PUSH_URLS = dict(
+    item.split("=", 1) for item in os.environ.get("PLACE_PUSH_URLS", "").split(",") if "=" in item
+)
+CRAWL_PLACE_WORKERS = max(1, int(os.environ.get("CRAWL_PLACE_WORKERS", str(min(2, len(PLACE_IDS))))))
+
 SEND_INTERVAL = int(os.environ.get("SEND_INTERVAL", "30"))
 REQUEST_TIMEOUT = int(os.environ.get("REQUEST_TIMEOUT", "10"))
 SEND_MIN_SERVERS = int(os.environ.get("SEND_MIN_SERVERS", "1"))
 MAX_PAGES_PER_CYCLE = int(os.environ.get("MAX_PAGES_PER_CYCLE", "10"))
 
+# Crawler concorrente: uma cadeia de cursores por sortOrder (Asc/Desc em paralelo)
+CRAWL_SORT_ORDERS = [o.strip() for o in os.environ.get("CRAWL_SORT_ORDERS", "Asc,Desc").split(",") if o.strip()]
+CRAWL_CHAIN_CONCURRENCY = max(1, int(os.environ.get("CRAWL_CHAIN_CONCURRENCY", "1")))  # requisições simultâneas por página
+CRAWL_PAGE_DELAY = float(os.environ.get("CRAWL_PAGE_DELAY", "0"))  # pausa entre páginas da mesma cadeia (s)
+CRAWL_MEET_OVERLAP = float(os.environ.get("CRAWL_MEET_OVERLAP", "0.5"))  # fração de ids já vistos pela outra cadeia
+
+# Agendamento adaptativo: intervalo e profundidade de cada place seguem o churn do último ciclo
+# (ids novos/sumidos e variação de lotação) e recuam quando aparecem 429. CRAWL_ADAPTIVE=0 fixa
+# SEND_INTERVAL/MAX_PAGES_PER_CYCLE.
+CRAWL_ADAPTIVE = os.environ.get("CRAWL_ADAPTIVE", "1") == "1"
+CRAWL_INTERVAL_MIN = float(os.environ.get("CRAWL_INTERVAL_MIN", str(max(1, SEND_INTERVAL / 3))))
+CRAWL_INTERVAL_MAX = float(os.environ.get("CRAWL_INTERVAL_MAX", str(SEND_INTERVAL * 4)))
+CRAWL_PAGES_MIN = max(1, int(os.environ.get("CRAWL_PAGES_MIN", str(min(2, MAX_PAGES_PER_CYCLE)))))
+CRAWL_PAGES_MAX = max(CRAWL_PAGES_MIN, int(os.environ.get("CRAWL_PAGES_MAX", str(MAX_PAGES_PER_CYCLE))))
+CRAWL_CHURN_TARGET = float(os.environ.get("CRAWL_CHURN_TARGET", "0.2"))  # churn que já pede o ritmo máximo
+CRAWL_JITTER = float(os.environ.get("CRAWL_JITTER", "0.1"))  # ±10% no intervalo
+CRAWL_FULL_EVERY = max(1, int(os.environ.get("CRAWL_FULL_EVERY", "5")))  # ciclos rasos seguidos antes de um completo
+
+# Envio em micro-lotes para o MAIN: dispara com PUSH_BATCH_SIZE ids ou após PUSH_BATCH_MS
+PUSH_BATCH_SIZE = int(os.environ.get("PUSH_BATCH_SIZE", "500"))
+PUSH_BATCH_MS = int(os.environ.get("PUSH_BATCH_MS", "1000"))
+
+# "delta" envia só ids novos/removidos (com resync completo a cada PUSH_RESYNC_EVERY ciclos); "full" envia tudo
+PUSH_MODE = os.environ.get("PUSH_MODE", "delta").lower()
+PUSH_RESYNC_EVERY = max(1, int(os.environ.get("PUSH_RESYNC_EVERY", "10")))
+PUSH_GZIP = os.environ.get("PUSH_GZIP", "1") == "1"
+PUSH_OUTBOX_MAX = int(os.environ.get("PUSH_OUTBOX_MAX", "100"))
+PUSH_RETRY_MAX = float(os.environ.get("PUSH_RETRY_MAX", "60"))  # teto do backoff (s)
+
 MIN_PLAYERS = int(os.environ.get("MIN_PLAYERS", "0"))
 MAX_PLAYERS = int(os.environ.get("MAX_PLAYERS", "999"))
 
-POOL_FILE = os.environ.get("POOL_FILE", "pool.json")
+# binário (map_pool); sem ele lê o pool.json antigo ao lado. Um POOL_FILE .json vira só
+# leitura: o binário é gravado no .bin vizinho
+POOL_FILE = os.environ.get("POOL_FILE", os.path.join(STATE_DIR, "pool.bin"))
+
+# Persistência em segundo plano: no máximo uma gravação por arquivo a cada PERSIST_INTERVAL_MS
+PERSIST_INTERVAL_MS = int(os.environ.get("PERSIST_INTERVAL_MS", "1000"))
+PERSIST_FSYNC = os.environ.get("PERSIST_FSYNC", "0") == "1"
+
+# Quantas versões do pool guardar para responder /jobs?since=<versão> só com o diff
+POOL_DIFF_HISTORY = int(os.environ.get("POOL_DIFF_HISTORY", "64"))
+
+# Índice de servers por job id (first/last seen, lotação, ping): sai após N ciclos sem ser visto
+SERVER_EVICT_AFTER = max(1, int(os.environ.get("SERVER_EVICT_AFTER", "3")))
+JOBS_RANKED_MAX = int(os.environ.get("JOBS_RANKED_MAX", "1000"))  # teto de ?limit= em /jobs?order=
+
+# Feed SSE (novos job ids e detecções): uma thread com selectors atende todos os clientes
+FEED_PORT = int(os.environ.get("FEED_PORT", "8081"))  # 0 desliga
+FEED_BACKLOG = int(os.environ.get("FEED_BACKLOG", "1000"))  # eventos guardados para Last-Event-ID
+FEED_MAX_CLIENTS = int(os.environ.get("FEED_MAX_CLIENTS", "5000"))
+FEED_CLIENT_BUFFER = int(os.environ.get("FEED_CLIENT_BUFFER", str(256 * 1024)))  # bytes pendentes antes de derrubar
+FEED_HEARTBEAT = float(os.environ.get("FEED_HEARTBEAT", "15"))
+FEED_HANDSHAKE_TIMEOUT = float(os.environ.get("FEED_HANDSHAKE_TIMEOUT", "10"))  # para mandar o GET inteiro
+# /events em SSE na porta do Flask (runtime threads): uma thread por cliente, então poucos;
+# para muitos clientes o caminho é o FEED_PORT
+FEED_MAIN_PORT_MAX_CLIENTS = int(os.environ.get("FEED_MAIN_PORT_MAX_CLIENTS", "32"))
+
+ASYNC_HTTP_LIMIT = int(os.environ.get("ASYNC_HTTP_LIMIT", "64"))  # conexões de saída simultâneas (modo asyncio)
+ASYNC_WSGI_THREADS = int(os.environ.get("ASYNC_WSGI_THREADS", "8"))  # handlers Flask fora do event loop (modo asyncio)
+
+# ==============================
+# WORKERS (thread ou asyncio)
+# ==============================
+ASYNC_LOOP = None  # preenchido por main_async() no modo RUNTIME=asyncio
+WSGI_EXECUTOR = None  # idem: threads que rodam o app Flask atrás do aiohttp
+ASYNC_HTTP = None  # aiohttp.ClientSession compartilhada no modo asyncio
+
+class AsyncSignal:
+    """asyncio.Event que pode ser disparado de qualquer thread."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def set(self):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout=None):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.event.clear()
+
+def start_worker(run_sync, run_async):
+    """Sobe o worker como task no loop (modo asyncio) ou como thread daemon.
+
+    Retorna o AsyncSignal que acorda a task, ou None no modo threads. No modo
+    serverless não sobe nada: a fila é esvaziada pela própria requisição (drain).
+    """
+    if SERVERLESS:
+        return None
+    if ASYNC_LOOP is not None:
+        signal = AsyncSignal(ASYNC_LOOP)
+        ASYNC_LOOP.call_soon_threadsafe(lambda: ASYNC_LOOP.create_task(run_async(signal)))
+        return signal
+    threading.Thread(target=run_sync, daemon=True).start()
+    return None
+
+async def run_blocking(fn, *args):
+    """Roda fn no executor padrão do loop: o que pega STATE_LOCK (e pode esperar um
+    handler longo numa thread do WSGI_EXECUTOR) não segura o event loop."""
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
 
-# Global list with last filtered job ids (exposto em /jobs)
-LAST_JOBIDS = []
+# ==============================
+# MÉTRICAS (/metrics)
+# ==============================
+# Formato texto do Prometheus, sem dependência: cada observação é um lock + soma num dict
+METRICS = []  # na ordem de criação (ordem do /metrics)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _label_value(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _metric_labels(names, values, extra=None):
+    pairs = [f'{n}="{_label_value(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _metric_value(v):
+    return str(v) if isinstance(v, int) else repr(float(v))
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values = {}  # valores dos labels -> total
+        self.lock = threading.Lock()
+        METRICS.append(self)
+
+    def inc(self, *values, amount=1):
+        with self.lock:
+            self.values[values] = self.values.get(values, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_metric_labels(self.labels, v)} {_metric_value(n)}" for v, n in items]
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series = {}  # valores dos labels -> [contagem por balde (+Inf no fim), soma]
+        self.lock = threading.Lock()
+        METRICS.append(self)
+
+    def observe(self, value, *values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def samples(self):
+        with self.lock:
+            items = [(v, list(counts), total) for v, (counts, total) in self.series.items()]
+        out = []
+        for v, counts, total in items:
+            running = 0
+            for le, n in zip(self.buckets + ("+Inf",), counts):
+                running += n
+                le_label = 'le="%s"' % le
+                out.append(f"{self.name}_bucket{_metric_labels(self.labels, v, le_label)} {running}")
+            out.append(f"{self.name}_sum{_metric_labels(self.labels, v)} {_metric_value(total)}")
+            out.append(f"{self.name}_count{_metric_labels(self.labels, v)} {running}")
+        return out
+
+class CallbackMetric:
+    """Valor lido na hora do /metrics (tamanho de fila, contadores que já existem em outro lugar)."""
+
+    def __init__(self, name, help_text, labels, read, kind="gauge"):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.read = read  # () -> {valores dos labels: número}
+        self.kind = kind
+        METRICS.append(self)
+
+    def samples(self):
+        return [f"{self.name}{_metric_labels(self.labels, v)} {_metric_value(n)}" for v, n in self.read().items()]
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        try:
+            samples = metric.samples()
+        except Exception:
+            logging.exception(f"[METRICS] {metric.name}")
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+PAGE_FETCHES = Counter("mini_page_fetches_total", "Páginas da API de games por proxy e status (error = sem resposta)", ("proxy", "status"))
+PAGE_FETCH_SECONDS = Histogram("mini_page_fetch_seconds", "Latência das páginas da API de games", ("proxy",))
+CRAWL_CYCLE_SECONDS = Histogram("mini_crawl_cycle_seconds", "Duração do ciclo de crawl", ("place",),
+                                buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300))
+CRAWL_CYCLE_PAGES = Histogram("mini_crawl_cycle_pages", "Páginas por ciclo de crawl", ("place",),
+                              buckets=(1, 2, 3, 5, 10, 20, 50, 100, 200))
+CRAWL_SERVERS = Counter("mini_crawl_servers_total", "Servers vistos pelo crawl (antes do filtro)", ("place",))
+CRAWL_SERVERS_KEPT = Counter("mini_crawl_servers_kept_total", "Servers que passaram no filtro de players", ("place",))
+PUSH_SECONDS = Histogram("mini_push_seconds", "Latência dos envios ao MAIN", ("place",))
+PUSH_RESULTS = Counter("mini_push_results_total", "Envios ao MAIN por resultado (ok, retry, drop, error)", ("place", "outcome"))
+WEBHOOK_SECONDS = Histogram("mini_webhook_seconds", "Latência dos POSTs de webhook por tier", ("tier",))
+WEBHOOK_RESULTS = Counter("mini_webhook_results_total", "POSTs de webhook por tier e resultado (throttled = 429 do Discord)", ("tier", "outcome"))
+PERSIST_SECONDS = Histogram("mini_persist_write_seconds", "Gravação em disco por arquivo (cache, journal, pool:<place>)", ("file",))
+HTTP_SECONDS = Histogram("mini_http_request_seconds", "Latência das requisições HTTP por endpoint", ("endpoint", "status"))
 
 # ==============================
 # PROXIES
@@ -77,232 +348,3168 @@ if not PROXIES:
 else:
     logging.info(f"[INIT] {len(PROXIES)} proxies carregadas.")
 
+# Pool de proxies: sessão keep-alive por proxy + score por latência/erros
+PROXY_EWMA_ALPHA = float(os.environ.get("PROXY_EWMA_ALPHA", "0.3"))
+PROXY_BENCH_AFTER = int(os.environ.get("PROXY_BENCH_AFTER", "3"))  # falhas seguidas (429/403/407/5xx/timeout) até o banco
+PROXY_BENCH_BASE = float(os.environ.get("PROXY_BENCH_BASE", "5"))  # cool-down inicial (s), dobra a cada banco
+PROXY_BENCH_MAX = float(os.environ.get("PROXY_BENCH_MAX", "300"))
+PROXY_SESSION_POOL_SIZE = int(os.environ.get("PROXY_SESSION_POOL_SIZE", "10"))
+
+def proxy_label(proxy):
+    """host:port da proxy, sem usuário/senha (seguro para logs e /)."""
+    if not proxy:
+        return "sem proxy"
+    parsed = urllib.parse.urlsplit(proxy)
+    return parsed.hostname and f"{parsed.hostname}:{parsed.port}" or proxy
+
+class ProxyStats:
+    __slots__ = ("proxy", "latency", "error_rate", "requests", "errors", "throttled",
+                 "failures_in_row", "bench_count", "benched_until", "in_flight")
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.latency = None  # EWMA em segundos (None = ainda sem amostra)
+        self.error_rate = 0.0  # EWMA de 0..1
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.failures_in_row = 0
+        self.bench_count = 0
+        self.benched_until = 0.0
+        self.in_flight = 0
+
+    def score(self):
+        # proxies livres primeiro; entre elas, as sem amostra (para serem medidas) e as mais rápidas
+        latency = self.latency if self.latency is not None else 0.0
+        return (self.in_flight, latency * (1 + 4 * self.error_rate))
+
+class ProxyPool:
+    """Escolhe a proxy saudável mais rápida e tira do ar as que falham seguidas vezes (429, 403/407, 5xx, timeout)."""
+
+    def __init__(self, proxies):
+        self.lock = threading.Lock()
+        self.stats = {p: ProxyStats(p) for p in (proxies or [None])}
+        self.sessions = {}
+
+    def session(self, proxy):
+        with self.lock:
+            s = self.sessions.get(proxy)
+            if s is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=PROXY_SESSION_POOL_SIZE)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                self.sessions[proxy] = s
+            return s
+
+    def acquire(self, exclude=()):
+        now = time.monotonic()
+        with self.lock:
+            candidates = [st for p, st in self.stats.items() if p not in exclude]
+            healthy = [st for st in candidates if st.benched_until <= now]
+            if healthy:
+                best = min(healthy, key=ProxyStats.score)
+            else:
+                # todas no banco: usa a que sai primeiro
+                best = min(candidates, key=lambda st: st.benched_until)
+            best.in_flight += 1
+            return best.proxy
+
+    def acquire_many(self, n):
+        chosen = []
+        for _ in range(min(n, len(self.stats))):
+            chosen.append(self.acquire(exclude=chosen))
+        return chosen
+
+    def bench_wait(self):
+        """Segundos até a primeira proxy sair do banco (0 se alguma já está saudável)."""
+        now = time.monotonic()
+        with self.lock:
+            return max(0.0, min(st.benched_until for st in self.stats.values()) - now)
+
+    def abandon(self, proxy):
+        """Requisição cancelada (perdeu a corrida do hedge): não conta como erro."""
+        with self.lock:
+            st = self.stats.get(proxy)
+            if st is not None:
+                st.in_flight = max(0, st.in_flight - 1)
+
+    def release(self, proxy, latency, status=None):
+        """Registra o resultado de uma requisição (status None = erro de conexão/timeout)."""
+        a = PROXY_EWMA_ALPHA
+        label = proxy_label(proxy)
+        PAGE_FETCHES.inc(label, str(status) if status is not None else "error")
+        PAGE_FETCH_SECONDS.observe(latency, label)
+        with self.lock:
+            st = self.stats.get(proxy)
+            if st is None:
+                return
+            st.in_flight = max(0, st.in_flight - 1)
+            st.requests += 1
+            # 403: IP da proxy bloqueado; 407: autenticação da proxy recusada. Os dois se
+            # repetem a cada requisição por essa proxy, então contam como falha
+            failed = status is None or status in (403, 407, 429) or status >= 500
+            if not failed:
+                st.latency = latency if st.latency is None else (1 - a) * st.latency + a * latency
+                st.error_rate = (1 - a) * st.error_rate
+                st.failures_in_row = 0
+                # o castigo esfria aos poucos: uma proxy que volta a levar 429 não recomeça do zero
+                st.bench_count = max(0, st.bench_count - 1)
+                return
+            st.errors += 1
+            st.error_rate = (1 - a) * st.error_rate + a
+            if status == 429:
+                st.throttled += 1
+            st.failures_in_row += 1
+            if st.failures_in_row >= PROXY_BENCH_AFTER:
+                st.bench_count += 1
+                cooldown = min(PROXY_BENCH_MAX, PROXY_BENCH_BASE * 2 ** (st.bench_count - 1))
+                st.benched_until = time.monotonic() + cooldown
+                st.failures_in_row = 0
+                logging.warning(f"[PROXY] {proxy_label(proxy)} no banco por {cooldown:.0f}s.")
+
+    def request(self, method, url, proxy, **kwargs):
+        """Faz a requisição pela sessão da proxy (já adquirida) e registra o resultado."""
+        proxies = {"http": proxy, "https": proxy} if proxy else None
+        started = time.monotonic()
+        try:
+            r = self.session(proxy).request(method, url, proxies=proxies, **kwargs)
+        except requests.exceptions.RequestException:
+            self.release(proxy, time.monotonic() - started)
+            raise
+        self.release(proxy, time.monotonic() - started, r.status_code)
+        return r
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "proxy": proxy_label(st.proxy),
+                    "healthy": st.benched_until <= now,
+                    "benched_for": max(0.0, round(st.benched_until - now, 1)),
+                    "latency_ms": round(st.latency * 1000, 1) if st.latency is not None else None,
+                    "error_rate": round(st.error_rate, 3),
+                    "requests": st.requests,
+                    "errors": st.errors,
+                    "throttled": st.throttled,
+                    "in_flight": st.in_flight,
+                }
+                for st in self.stats.values()
+            ]
+
+PROXY_POOL = ProxyPool(PROXIES)
+
 # ==============================
 # SALVAR LOCAL
 # ==============================
-def save_pool(job_ids):
+def dumps_compact(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def atomic_write(path, data: bytes, fsync=PERSIST_FSYNC):
+    """Grava em arquivo temporário no mesmo diretório e troca com os.replace."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
     try:
-        with open(POOL_FILE, "w", encoding="utf-8") as f:
-            json.dump({"servers": job_ids}, f, indent=4)
-        logging.info(f"[LOCAL] {POOL_FILE} atualizado com {len(job_ids)} servers.")
-    except Exception as e:
-        logging.error(f"[LOCAL ERRO] Falha ao salvar {POOL_FILE}: {e}")
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, 0o666 & ~_UMASK)  # mkstemp cria 0600; mantém a permissão de um open() normal
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+class StateWriter:
+    """Write-behind: quem altera estado só marca o arquivo como sujo; uma thread grava."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.targets = {}  # nome -> função que grava (na ordem de registro)
+        self.dirty = set()
+        self.cond = threading.Condition()
+        self.flush_lock = threading.Lock()  # uma passada de escrita por vez (thread, atexit, serverless)
+        self.thread = None
+        self.last_flush = 0.0
+
+    def register(self, name, write):
+        self.targets[name] = write
+
+    def mark_dirty(self, name):
+        with self.cond:
+            self.dirty.add(name)
+            if self.thread is None and not SERVERLESS:  # serverless: flush no fim da requisição
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.dirty:
+                    self.cond.wait()
+                # junta todas as alterações que chegarem até o fim do intervalo
+                wait_for = self.last_flush + self.interval - time.monotonic()
+                if wait_for > 0:
+                    self.cond.wait(wait_for)
+            self.flush()
+
+    def flush(self):
+        # o lock cobre a passada inteira: um snapshot e a compactação do journal que ele
+        # dispara não podem se intercalar com as escritas de outra passada
+        with self.flush_lock:
+            with self.cond:
+                names, self.dirty = self.dirty, set()
+                self.last_flush = time.monotonic()
+            for name, write in self.targets.items():
+                if name not in names:
+                    continue
+                started = time.perf_counter()
+                try:
+                    write()
+                except Exception as e:
+                    logging.error(f"[LOCAL ERRO] Falha ao salvar {name}: {e}")
+                PERSIST_SECONDS.observe(time.perf_counter() - started, name)
+
+class FileLock:
+    """Lock exclusivo entre processos (fcntl.lockf num arquivo ao lado), também entre threads.
+
+    lockf usa locks POSIX, que funcionam em NFS/EFS; sem fcntl (Windows) só vale dentro do processo.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.Lock()  # locks POSIX são por processo: as threads se revezam aqui
+        self.fd = None
+
+    def __enter__(self):
+        self.local.acquire()
+        try:
+            if fcntl is not None:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+                fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._release()
+
+    def _release(self):
+        if self.fd is not None:
+            os.close(self.fd)  # fechar solta o lock
+            self.fd = None
+        self.local.release()
+
+class Journal:
+    """Log append-only (NDJSON) com número de sequência, compactado por um snapshot.
+
+    append() só bufferiza em memória (O(1)); as linhas vão para o disco na thread do
+    StateWriter. Depois que um snapshot até a sequência N é gravado, compacted(N)
+    zera o arquivo. Quem chama append() deve segurar o lock do estado que o snapshot lê.
+
+    Com shared=True (serverless: várias instâncias no mesmo STATE_DIR) a sequência vem
+    do arquivo: gravar e compactar acontecem sob o FileLock, depois de aplicar (on_remote)
+    o que as outras instâncias gravaram. A compactação deixa uma linha "base" com a
+    sequência do snapshot; quem ficou para trás dela recarrega tudo (on_remote(None)).
+    """
+
+    def __init__(self, path, writer, name, compact_name, compact_every, shared=False, on_remote=None):
+        self.path = path
+        self.writer = writer
+        self.name = name
+        self.compact_name = compact_name
+        self.compact_every = max(1, compact_every)
+        self.shared = shared
+        self.on_remote = on_remote
+        self.file_lock = FileLock(path + ".lock")
+        self.seq = 0  # última sequência aplicada (shared: a do arquivo)
+        self.buffer = []  # (seq, registro); shared: seq None até ir para o arquivo
+        self.since_compact = 0
+        self.offset = 0  # shared: até onde o arquivo já foi lido
+        self.stamp = None  # (dev, inode, tamanho, mtime) na última leitura
+        self.first_line = b""  # identifica o arquivo (a linha "base") mesmo se o inode for reusado
+        self.lock = threading.Lock()
+        writer.register(name, self.write_pending)
+
+    def append(self, record):
+        with self.lock:
+            if self.shared:
+                seq = None
+            else:
+                self.seq += 1
+                seq = self.seq
+            self.buffer.append((seq, record))
+            self.since_compact += 1
+            compact = self.since_compact >= self.compact_every
+        self.writer.mark_dirty(self.name)
+        if compact:
+            self.writer.mark_dirty(self.compact_name)
+
+    def write_pending(self):
+        if not self.shared:
+            self._write_pending()
+            return
+        if not self.buffer:
+            return
+        with self.file_lock:
+            self.sync_locked()
+            self._write_pending()
+
+    def _write_pending(self):
+        with self.lock:
+            pending, self.buffer = self.buffer, []
+            if self.shared:
+                # numera agora, depois das linhas das outras instâncias
+                pending = [(self.seq + i, record) for i, (_, record) in enumerate(pending, 1)]
+        if not pending:
+            return
+        for seq, record in pending:
+            record["seq"] = seq
+        data = b"".join(dumps_compact(record) + b"\n" for _, record in pending)
+        try:
+            with open(self.path, "ab") as f:
+                f.write(data)
+                if PERSIST_FSYNC:
+                    f.flush()
+                    os.fsync(f.fileno())
+                end = f.tell()
+        except Exception:
+            with self.lock:
+                self.buffer[:0] = [(None if self.shared else seq, r) for seq, r in pending]
+            raise
+        if self.shared:
+            with self.lock:
+                self.seq = pending[-1][0]
+                self._mark_read(end)
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _read_first_line(self):
+        try:
+            with open(self.path, "rb") as f:
+                return f.readline()
+        except OSError:
+            return b""
+
+    def _mark_read(self, offset):
+        self.offset = offset
+        self.stamp = self._stamp()
+        self.first_line = self._read_first_line()
+
+    def sync(self):
+        """shared: aplica o que as outras instâncias gravaram desde a última leitura."""
+        if self.shared:
+            with self.file_lock:
+                self.sync_locked()
+
+    def sync_locked(self):
+        stamp = self._stamp()
+        if stamp is None or stamp == self.stamp:
+            return  # nada novo (o caso comum: um stat por requisição)
+        records = []
+        stale = False
+        with open(self.path, "rb") as f:
+            # mesma primeira linha = mesmo arquivo, só cresceu; senão foi compactado
+            offset = self.offset if f.readline() == self.first_line and self.first_line else 0
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # última linha ainda sendo escrita
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                seq = record.get("seq", 0)
+                if record.get("op") == "base":
+                    stale = stale or seq > self.seq
+                elif seq > self.seq:
+                    records.append(record)
+        self._mark_read(offset)
+        if stale:
+            # outra instância compactou coisas que não vimos: recarrega do snapshot
+            self.on_remote(None)
+            return
+        if records:
+            self.seq = max(self.seq, max(r.get("seq", 0) for r in records))
+            self.on_remote(records)
+
+    def cover_pending(self):
+        """shared, no snapshot (sob STATE_LOCK): o buffer já está na memória e vai junto.
+
+        Retorna a sequência do snapshot; ela avança mesmo sem linhas novas para que as
+        outras instâncias percebam a compactação e recarreguem.
+        """
+        with self.lock:
+            if not self.shared:
+                return self.seq
+            self.buffer = []
+            self.seq += 1
+            return self.seq
+
+    def compacted(self, upto_seq):
+        with self.lock:
+            self.buffer = [(seq, r) for seq, r in self.buffer if seq is None or seq > upto_seq]
+            self.since_compact = len(self.buffer)
+            # tudo que já estava no arquivo tem seq <= upto_seq
+            atomic_write(self.path, dumps_compact({"op": "base", "seq": upto_seq}) + b"\n" if self.shared else b"")
+            if self.shared:
+                self._mark_read(os.path.getsize(self.path))
+
+    def replay(self, after_seq=0):
+        """Lê os registros com seq > after_seq (ignora uma última linha truncada)."""
+        if not os.path.exists(self.path):
+            self.seq = max(self.seq, after_seq)
+            return []
+        records = []
+        last = after_seq
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if self.shared and not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.warning(f"[JOURNAL] linha inválida em {self.path} ignorada.")
+                    continue
+                seq = record.get("seq", 0)
+                if record.get("op") == "base":
+                    last = max(last, seq)
+                elif seq > after_seq:
+                    records.append(record)
+                    last = max(last, seq)
+        with self.lock:
+            self.seq = max(self.seq, last) if not self.shared else last
+            self.since_compact = len(records)
+            self._mark_read(offset)
+        return records
+
+PERSIST = StateWriter(PERSIST_INTERVAL_MS / 1000)
+atexit.register(PERSIST.flush)
 
 # ==============================
 # FETCH SERVERS
 # ==============================
-def fetch_all_roblox_servers(retries=3):
-    all_servers = []
+def servers_url(place_id, sort_order="Asc", cursor=None):
+    url = f"{GAMES_API_URL}/v1/games/{place_id}/servers/Public?sortOrder={sort_order}&limit=100"
+    return url + (f"&cursor={urllib.parse.quote(cursor, safe='')}" if cursor else "")
+
+class CrawlError(Exception):
+    """Falha de uma página no crawler asyncio (status None = rede/timeout)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+class CrawlCycle:
+    """Estado compartilhado entre as cadeias de cursores de um ciclo.
+
+    As páginas (só com servers novos) vão para `emit`; cada cadeia termina com emit(None).
+    """
+
+    def __init__(self, place_id, max_pages, retries=3, emit=None):
+        self.place_id = place_id
+        # com vários places, os logs levam o place junto da cadeia
+        self.prefix = f"{place_id} " if len(PLACE_IDS) > 1 else ""
+        self.max_pages = max_pages
+        self.retries = retries
+        self.pages = 0
+        self.count = 0
+        self.seen = {}  # job id -> cadeia que viu primeiro
+        self.failures = {}  # cadeia -> falhas
+        self.throttled = 0  # páginas perdidas por 429 (vai para o agendador)
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        if emit is None:
+            self.pages_out = queue.Queue()
+            emit = self.pages_out.put
+        self.emit = emit
+
+    def claim_page(self):
+        with self.lock:
+            if self.stop.is_set() or self.pages >= self.max_pages:
+                return False
+            self.pages += 1
+            return True
+
+    def release_page(self):
+        with self.lock:
+            self.pages -= 1
+
+    def add_page(self, chain, servers):
+        """Registra uma página; retorna False quando a cadeia deve parar."""
+        fresh = []
+        with self.lock:
+            overlap = 0
+            for s in servers:
+                job_id = s.get("id")
+                if job_id is None:
+                    continue
+                owner = self.seen.get(job_id)
+                if owner is None:
+                    self.seen[job_id] = chain
+                    fresh.append(s)
+                elif owner != chain:
+                    overlap += 1
+            self.count += len(fresh)
+            if servers and overlap / len(servers) >= CRAWL_MEET_OVERLAP and not self.stop.is_set():
+                logging.info(f"[CRAWL] Cadeias se encontraram ({overlap}/{len(servers)} ids repetidos).")
+                self.stop.set()
+            keep_going = not self.stop.is_set()
+        if fresh:
+            self.emit(fresh)
+        return keep_going
+
+    def page_done(self, chain, data, proxy):
+        """Processa a resposta de uma página; retorna o próximo cursor ou None para parar."""
+        servers = data.get("data", [])
+        cursor = data.get("nextPageCursor")
+        keep_going = self.add_page(chain, servers)
+        logging.info(f"[PAGE {self.prefix}{chain}] +{len(servers)} servers via {proxy_label(proxy)} (Total: {self.count})")
+        if not cursor:
+            # uma cadeia chegou ao fim da lista: a outra não tem mais nada novo
+            self.stop.set()
+            return None
+        return cursor if keep_going else None
+
+    def page_failed(self, chain, status, error):
+        """Devolve a página ao orçamento; False quando a cadeia esgotou as tentativas."""
+        self.release_page()
+        if status == 429:
+            with self.lock:
+                self.throttled += 1
+            logging.warning(f"[429] Too Many Requests ({self.prefix}{chain}) — trocando de proxy...")
+        else:
+            logging.warning(f"[ERRO] Cadeia {self.prefix}{chain} falhou: {error}")
+        with self.lock:
+            self.failures[chain] = self.failures.get(chain, 0) + 1
+            return self.failures[chain] < (len(PROXIES) or 1) * self.retries
+
+    def report(self, out):
+        """Resumo do ciclo para quem chamou (páginas, servers, 429, falhas)."""
+        if out is not None:
+            with self.lock:
+                out.update(
+                    pages=self.pages,
+                    servers=self.count,
+                    throttled=self.throttled,
+                    errors=sum(self.failures.values()),
+                )
+
+def fetch_servers_page(place_id, sort_order, cursor, proxy):
+    r = PROXY_POOL.request("GET", servers_url(place_id, sort_order, cursor), proxy, timeout=REQUEST_TIMEOUT)
+    if r.status_code == 429:
+        raise requests.exceptions.HTTPError("429 Too Many Requests", response=r)
+    r.raise_for_status()
+    return r.json()
+
+def _fetch_page_hedged(executor, place_id, sort_order, cursor, proxies):
+    """Dispara a mesma página em várias proxies e fica com a primeira resposta válida."""
+    if executor is None or len(proxies) == 1:
+        return fetch_servers_page(place_id, sort_order, cursor, proxies[0]), proxies[0]
+    futures = {executor.submit(fetch_servers_page, place_id, sort_order, cursor, p): p for p in proxies}
+    error = None
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for fut in done:
+            proxy = futures.pop(fut)
+            try:
+                return fut.result(), proxy
+            except requests.exceptions.RequestException as e:
+                logging.warning(f"[ERRO] Proxy {proxy_label(proxy)} falhou: {e}")
+                error = e
+    raise error
+
+def _wait_bench(cycle, minimum=0.0):
+    """Com todas as proxies no banco, espera a primeira sair; False se o ciclo parou antes."""
+    wait = max(minimum, PROXY_POOL.bench_wait())
+    return not (wait > 0 and cycle.stop.wait(wait))
+
+def _crawl_chain(cycle, sort_order):
     cursor = None
-    page_count = 0
-    proxy_index = 0
+    width = min(CRAWL_CHAIN_CONCURRENCY, len(PROXIES) or 1)
+    executor = ThreadPoolExecutor(max_workers=width) if width > 1 else None
 
-    while True:
-        proxy = random.choice(PROXIES) if PROXIES else None
-        proxies = {"http": proxy, "https": proxy} if proxy else None
+    try:
+        while _wait_bench(cycle) and cycle.claim_page():
+            # o pool penaliza proxies em uso, então cada cadeia tende a ficar com a sua
+            proxies = PROXY_POOL.acquire_many(width)
 
-        try:
-            url = BASE_URL + (f"&cursor={cursor}" if cursor else "")
-            page_count += 1
-            logging.info(f"[FETCH] Página {page_count} via {proxy or 'sem proxy'}...")
+            try:
+                data, proxy = _fetch_page_hedged(executor, cycle.place_id, sort_order, cursor, proxies)
+            except requests.exceptions.RequestException as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if not cycle.page_failed(sort_order, status, e):
+                    break
+                if not _wait_bench(cycle, minimum=1.0):
+                    break
+                continue
+
+            cursor = cycle.page_done(sort_order, data, proxy)
+            if cursor is None:
+                break
+            if CRAWL_PAGE_DELAY > 0:
+                time.sleep(CRAWL_PAGE_DELAY)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        cycle.emit(None)  # fim desta cadeia
+
+def iter_roblox_pages(place_id=GAME_ID, retries=3, max_pages=MAX_PAGES_PER_CYCLE, report=None):
+    """Gera as páginas do ciclo (só servers ainda não vistos) conforme chegam.
+
+    No fim, `report` (dict) recebe o resumo do ciclo.
+    """
+    cycle = CrawlCycle(place_id, max_pages, retries)
+    started = time.monotonic()
 
-            r = requests.get(url, proxies=proxies, timeout=REQUEST_TIMEOUT)
-            if r.status_code == 429:
-                logging.warning("[429] Too Many Requests — trocando de proxy...")
-                time.sleep(1)
+    orders = CRAWL_SORT_ORDERS or ["Asc"]
+    for order in orders:
+        threading.Thread(target=_crawl_chain, args=(cycle, order), daemon=True).start()
+
+    running = len(orders)
+    try:
+        while running:
+            page = cycle.pages_out.get()
+            if page is None:
+                running -= 1
                 continue
+            yield page
+    finally:
+        # consumidor desistiu no meio: as cadeias param na próxima página
+        cycle.stop.set()
+        cycle.report(report)
 
-            r.raise_for_status()
-            data = r.json()
-            servers = data.get("data", [])
-            all_servers.extend(servers)
-            cursor = data.get("nextPageCursor")
+    logging.info(
+        f"[INFO] {cycle.prefix}Ciclo: {cycle.pages}/{max_pages} páginas, "
+        f"{cycle.count} servers em {time.monotonic() - started:.1f}s."
+    )
 
-            logging.info(f"[PAGE {page_count}] +{len(servers)} servers (Total: {len(all_servers)})")
+async def fetch_servers_page_async(place_id, sort_order, cursor, proxy):
+    import aiohttp
+    started = time.monotonic()
+    try:
+        async with ASYNC_HTTP.get(
+            servers_url(place_id, sort_order, cursor),
+            proxy=proxy,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+        ) as r:
+            status = r.status
+            data = await r.json(content_type=None) if status == 200 else None
+    except asyncio.CancelledError:
+        PROXY_POOL.abandon(proxy)
+        raise
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        PROXY_POOL.release(proxy, time.monotonic() - started)
+        raise CrawlError(str(e) or type(e).__name__)
+    PROXY_POOL.release(proxy, time.monotonic() - started, status)
+    if status != 200:
+        raise CrawlError(f"HTTP {status}", status)
+    return data
 
-            if not cursor or page_count >= MAX_PAGES_PER_CYCLE:
-                logging.info(f"[INFO] Limite de páginas atingido ({page_count}/{MAX_PAGES_PER_CYCLE}).")
-                break
+async def _fetch_page_hedged_async(place_id, sort_order, cursor, proxies):
+    if len(proxies) == 1:
+        return await fetch_servers_page_async(place_id, sort_order, cursor, proxies[0]), proxies[0]
+    tasks = {asyncio.ensure_future(fetch_servers_page_async(place_id, sort_order, cursor, p)): p for p in proxies}
+    error = None
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                proxy = tasks.pop(task)
+                try:
+                    return task.result(), proxy
+                except CrawlError as e:
+                    logging.warning(f"[ERRO] Proxy {proxy_label(proxy)} falhou: {e}")
+                    error = e
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()  # as perdedoras são canceladas de verdade
 
-            time.sleep(0.5)
+async def _crawl_chain_async(cycle, sort_order):
+    cursor = None
+    width = min(CRAWL_CHAIN_CONCURRENCY, len(PROXIES) or 1)
+    try:
+        while True:
+            wait = PROXY_POOL.bench_wait()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if not cycle.claim_page():
+                break
+            proxies = PROXY_POOL.acquire_many(width)
+            try:
+                data, proxy = await _fetch_page_hedged_async(cycle.place_id, sort_order, cursor, proxies)
+            except CrawlError as e:
+                if not cycle.page_failed(sort_order, e.status, e):
+                    break
+                await asyncio.sleep(max(1.0, PROXY_POOL.bench_wait()))
+                continue
 
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"[ERRO] Proxy {proxy or 'sem proxy'} falhou: {e}")
-            time.sleep(1)
-            proxy_index += 1
-            if proxy_index >= (len(PROXIES) or 1) * retries:
+            cursor = cycle.page_done(sort_order, data, proxy)
+            if cursor is None:
                 break
+            if CRAWL_PAGE_DELAY > 0:
+                await asyncio.sleep(CRAWL_PAGE_DELAY)
+    finally:
+        cycle.emit(None)
+
+async def iter_roblox_pages_async(place_id=GAME_ID, retries=3, max_pages=MAX_PAGES_PER_CYCLE, report=None):
+    """Versão asyncio de iter_roblox_pages: cadeias como tasks no mesmo loop."""
+    pages = asyncio.Queue()
+    cycle = CrawlCycle(place_id, max_pages, retries, emit=pages.put_nowait)
+    started = time.monotonic()
 
-    return all_servers
+    orders = CRAWL_SORT_ORDERS or ["Asc"]
+    tasks = [asyncio.ensure_future(_crawl_chain_async(cycle, order)) for order in orders]
+    running = len(orders)
+    try:
+        while running:
+            page = await pages.get()
+            if page is None:
+                running -= 1
+                continue
+            yield page
+    finally:
+        cycle.stop.set()
+        for task in tasks:
+            task.cancel()
+        cycle.report(report)
+
+    logging.info(
+        f"[INFO] {cycle.prefix}Ciclo: {cycle.pages}/{max_pages} páginas, "
+        f"{cycle.count} servers em {time.monotonic() - started:.1f}s."
+    )
 
 # ==============================
-# LOOP PRINCIPAL (jobids)
+# JOB IDS (16 bytes)
 # ==============================
-def fetch_and_send_loop():
-    global LAST_JOBIDS
+def format_job_ids(buf, sep):
+    """Buffer de ids empacotados (16 bytes cada) -> UUIDs em texto separados por sep (bytes).
 
-    while True:
-        servers = fetch_all_roblox_servers()
-        total_servers = len(servers)
+    Monta coluna por coluna com fatias de passo fixo: o custo não tem laço Python por id.
+    """
+    n = len(buf) // 16
+    if not n:
+        return b""
+    h = buf.hex().encode()
+    width = 36 + len(sep)
+    out = bytearray(width * n)
+    pos = 0
+    for j in range(32):
+        if j in (8, 12, 16, 20):
+            out[pos::width] = b"-" * n
+            pos += 1
+        out[pos::width] = h[j::32]
+        pos += 1
+    for k in range(len(sep)):
+        out[36 + k::width] = sep[k:k + 1] * n
+    return bytes(out[:len(out) - len(sep)])
 
-        if not servers:
-            logging.warning("⚠️ Nenhum servidor encontrado.")
-            time.sleep(SEND_INTERVAL)
-            continue
+def unpack_job_ids(buf):
+    """Buffer de ids empacotados -> lista de UUIDs em texto."""
+    return format_job_ids(buf, b",").decode().split(",") if len(buf) else []
 
-        job_ids = [
-            s["id"]
-            for s in servers
-            if "id" in s and MIN_PLAYERS <= s.get("playing", 0) <= MAX_PLAYERS
-        ]
+def pack_job_id(job_id):
+    """UUID em texto (minúsculo, com hífens, como a API manda) -> 16 bytes; None se não for."""
+    if type(job_id) is not str or len(job_id) != 36 or job_id != job_id.lower():
+        return None
+    if job_id[8] != "-" or job_id[13] != "-" or job_id[18] != "-" or job_id[23] != "-":
+        return None
+    try:
+        packed = bytes.fromhex(job_id.replace("-", ""))
+    except ValueError:
+        return None
+    return packed if len(packed) == 16 else None
 
-        logging.info(f"[FILTER] {len(job_ids)} servers após filtro ({MIN_PLAYERS}–{MAX_PLAYERS} players)")
+class PackedIds:
+    """Conjunto ordenado de job ids: 16 bytes por id num buffer contíguo + tabela hash em array.
 
-        LAST_JOBIDS = job_ids
+    Só cresce (o pool de cada ciclo é um conjunto novo). O buffer pode vir de um mmap
+    somente leitura: aí a tabela só é montada na primeira consulta e o buffer só é
+    copiado se alguém acrescentar ids.
+    """
 
-        save_pool(job_ids)
+    __slots__ = ("buf", "count", "table", "mask")
 
-        if len(job_ids) < SEND_MIN_SERVERS:
-            logging.info(f"[SKIP] Apenas {len(job_ids)} válidos (mínimo: {SEND_MIN_SERVERS}).")
-            time.sleep(SEND_INTERVAL)
-            continue
+    def __init__(self, ids=()):
+        self.buf = bytearray()
+        self.count = 0
+        self.table = None
+        self.mask = 0
+        for job_id in ids:
+            self.add(job_id)
+
+    @classmethod
+    def from_buffer(cls, buf):
+        ids = cls()
+        ids.buf = buf
+        ids.count = len(buf) // 16
+        return ids
+
+    def copy(self):
+        ids = PackedIds.from_buffer(bytearray(self.buf))
+        if self.table is not None:
+            ids.table, ids.mask = array("I", self.table), self.mask
+        return ids
+
+    def _rehash(self, size):
+        # índice+1 de cada id (0 = vazio); os ids são aleatórios, os 8 primeiros bytes já são o hash
+        table = array("I", bytes(4 * size))
+        mask = size - 1
+        buf = self.buf
+        for n in range(self.count):
+            slot = int.from_bytes(buf[n * 16:n * 16 + 8], "little") & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = n + 1
+        self.table, self.mask = table, mask
+
+    def _find(self, job_id):
+        """(slot, achou?) para job_id na tabela."""
+        table, mask, buf = self.table, self.mask, self.buf
+        slot = int.from_bytes(job_id[:8], "little") & mask
+        while True:
+            n = table[slot]
+            if not n:
+                return slot, False
+            if buf[(n - 1) * 16:n * 16] == job_id:
+                return slot, True
+            slot = (slot + 1) & mask
+
+    def __contains__(self, job_id):
+        if not self.count:
+            return False
+        if self.table is None:
+            self._rehash(_table_size(self.count))
+        return self._find(job_id)[1]
+
+    def add(self, job_id):
+        """Acrescenta no fim; False se já estava."""
+        if self.table is None or 2 * (self.count + 1) > len(self.table):
+            self._rehash(_table_size(self.count + 1))
+        slot, found = self._find(job_id)
+        if found:
+            return False
+        if not isinstance(self.buf, bytearray):
+            self.buf = bytearray(self.buf)  # veio de mmap
+        self.buf += job_id
+        self.count += 1
+        self.table[slot] = self.count
+        return True
+
+    def __len__(self):
+        return self.count
 
-        payload = {"servers": job_ids}
+    def __iter__(self):
+        snapshot = bytes(self.buf)
+        return (snapshot[k:k + 16] for k in range(0, 16 * self.count, 16))
+
+    def raw(self):
+        return self.buf
+
+    def strings(self):
+        return unpack_job_ids(self.buf)
+
+def _table_size(count):
+    size = 16
+    while size < 2 * count:
+        size *= 2
+    return size
+
+# Snapshot do pool em disco: cabeçalho + ids empacotados, lido com mmap por /jobs
+POOL_MAGIC = b"JOBP"
+POOL_HEADER = struct.Struct("<4sII")  # magic, versão do formato, quantidade
+
+def encode_pool(ids):
+    buf = ids.raw()
+    return POOL_HEADER.pack(POOL_MAGIC, 1, len(ids)) + bytes(buf)
+
+def map_pool(path):
+    """PackedIds sobre o arquivo mapeado (sem copiar); None se não for snapshot binário.
+
+    O arquivo é trocado com os.replace, então o mapeamento antigo segue válido
+    enquanto alguém o usa.
+    """
+    with open(path, "rb") as f:
+        if f.read(4) != POOL_MAGIC:
+            return None
         try:
-            resp = requests.post(MAIN_API_URL, json=payload, timeout=REQUEST_TIMEOUT)
-            if resp.ok:
-                added = resp.json().get("added", None)
-                logging.info(f"✅ Enviados {len(job_ids)} — adicionados: {added}")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+    magic, fmt, count = POOL_HEADER.unpack_from(mapped)
+    if fmt != 1 or len(mapped) != POOL_HEADER.size + 16 * count:
+        raise ValueError(f"snapshot inválido: {path}")
+    return PackedIds.from_buffer(memoryview(mapped)[POOL_HEADER.size:])
+
+def packed_servers(page):
+    """[(id empacotado, server)] da página; ids fora do formato UUID ficam de fora."""
+    out = []
+    for server in page:
+        job_id = pack_job_id(server.get("id"))
+        if job_id is not None:
+            out.append((job_id, server))
+    return out
+
+def filter_job_ids(servers):
+    return [
+        job_id
+        for job_id, s in servers
+        if MIN_PLAYERS <= s.get("playing", 0) <= MAX_PLAYERS
+    ]
+
+# ==============================
+# ENVIO PARA O MAIN
+# ==============================
+class MainPusher:
+    """Envia ao MAIN por uma sessão keep-alive, com outbox limitada e retry com backoff.
+
+    Em modo delta o payload continua compatível com /add-pool: "servers" leva só os
+    ids novos e "removed" os que sumiram; "resync": true marca o envio completo.
+    `extra` vai em todo payload (ex.: {"placeId": ...} com vários places).
+    """
+
+    def __init__(self, url, mode, resync_every, use_gzip, outbox_max, extra=None, session=None, label=""):
+        self.url = url
+        self.label = label  # nas métricas
+        self.extra = extra or {}
+        self.delta = mode == "delta"
+        self.resync_every = resync_every
+        self.gzip = use_gzip
+        self.outbox = deque()
+        self.outbox_max = max(1, outbox_max)
+        self.cond = threading.Condition()
+        self.started = False
+        self.signal = None  # AsyncSignal no modo asyncio
+        self.sent = PackedIds()  # ids que o MAIN já tem (ou que estão na outbox)
+        self.cycles = 0
+        self.need_resync = False
+        self.session = session
+        if session is None:
+            self.session = requests.Session()
+            self.session.mount("http://", HTTPAdapter(pool_maxsize=2))
+            self.session.mount("https://", HTTPAdapter(pool_maxsize=2))
+
+    def _enqueue(self, payload):
+        with self.cond:
+            if not self.started:
+                self.started = True
+                self.signal = start_worker(self._run, self._run_async)
+            if len(self.outbox) >= self.outbox_max:
+                self.outbox.popleft()
+                self.need_resync = True  # perdemos um delta: o próximo fim de ciclo manda tudo
+                logging.warning("[PUSH] Outbox cheia — delta mais antigo descartado.")
+            self.outbox.append(payload)
+            self.cond.notify()
+            if self.signal is not None:
+                self.signal.set()
+
+    def push_ids(self, job_ids):
+        """job_ids empacotados; viram texto só em _encode."""
+        if self.delta:
+            with self.cond:
+                added = [i for i in job_ids if self.sent.add(i)]
+            job_ids = added
+        if job_ids:
+            self._enqueue({"servers": job_ids})
+
+    def end_cycle(self, job_ids):
+        """Fecha o ciclo: manda os removidos e, quando for a vez, um resync completo."""
+        if not self.delta:
+            return
+        current = job_ids.copy() if isinstance(job_ids, PackedIds) else PackedIds(job_ids)
+        with self.cond:
+            self.cycles += 1
+            resync = self.need_resync or self.cycles % self.resync_every == 0
+            removed = [i for i in self.sent if i not in current]
+            self.sent = current
+            self.need_resync = False
+        if resync:
+            self._enqueue({"servers": list(job_ids), "resync": True})
+        elif removed:
+            self._enqueue({"servers": [], "removed": removed})
+
+    def _encode(self, payload):
+        payload = {**payload, "servers": unpack_job_ids(b"".join(payload["servers"]))}
+        if payload.get("removed"):
+            payload["removed"] = unpack_job_ids(b"".join(payload["removed"]))
+        if self.extra:
+            payload = {**payload, **self.extra}
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.gzip:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def _refused_gzip(self, status):
+        if self.gzip and status in (400, 415):
+            logging.warning(f"[PUSH] MAIN recusou gzip ({status}) — enviando sem compressão.")
+            self.gzip = False
+            return True
+        return False
+
+    def _post(self, payload):
+        body, headers = self._encode(payload)
+        resp = self.session.post(self.url, data=body, headers=headers, timeout=REQUEST_TIMEOUT)
+        if self._refused_gzip(resp.status_code):
+            return self._post(payload)
+        return resp
+
+    def _on_response(self, payload, status, text):
+        """True = concluído (ok ou descartado), False = tentar de novo."""
+        if 200 <= status < 400:
+            try:
+                added = json.loads(text).get("added", None)
+            except (ValueError, AttributeError):
+                added = None
+            if payload.get("removed"):
+                logging.info(f"✅ Removidos {len(payload['removed'])} do MAIN")
             else:
-                logging.warning(f"⚠️ MAIN retornou {resp.status_code}: {resp.text}")
+                kind = "resync" if payload.get("resync") else "enviados"
+                logging.info(f"✅ {kind.capitalize()} {len(payload['servers'])} — adicionados: {added}")
+            return True
+        logging.warning(f"⚠️ MAIN retornou {status}: {text[:200]}")
+        if status == 429 or status >= 500:
+            return False
+        with self.cond:
+            self.need_resync = True
+        return True
+
+    def _observe(self, started, status):
+        PUSH_SECONDS.observe(time.perf_counter() - started, self.label)
+        if status is None:
+            outcome = "error"
+        elif 200 <= status < 400:
+            outcome = "ok"
+        else:
+            outcome = "retry" if status == 429 or status >= 500 else "drop"
+        PUSH_RESULTS.inc(self.label, outcome)
+
+    def send_now(self, payload):
+        """Um envio; True = concluído (ok ou descartado), False = tentar de novo."""
+        started = time.perf_counter()
+        try:
+            resp = self._post(payload)
         except Exception as e:
-            logging.exception(f"❌ Erro ao enviar para MAIN: {e}")
+            self._observe(started, None)
+            logging.warning(f"❌ Erro ao enviar para MAIN: {e}")
+            return False
+        self._observe(started, resp.status_code)
+        return self._on_response(payload, resp.status_code, resp.text)
+
+    async def send_now_async(self, payload):
+        import aiohttp
+        started = time.perf_counter()
+        try:
+            while True:
+                body, headers = self._encode(payload)
+                async with ASYNC_HTTP.post(
+                    self.url, data=body, headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                ) as resp:
+                    status = resp.status
+                    text = await resp.text(errors="replace")
+                if not self._refused_gzip(status):
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self._observe(started, None)
+            logging.warning(f"❌ Erro ao enviar para MAIN: {e}")
+            return False
+        self._observe(started, status)
+        return self._on_response(payload, status, text)
+
+    def _sent(self, payload):
+        with self.cond:
+            if self.outbox and self.outbox[0] is payload:
+                self.outbox.popleft()
+
+    def _run(self):
+        delay = 1.0
+        while True:
+            with self.cond:
+                while not self.outbox:
+                    self.cond.wait()
+                payload = self.outbox[0]
+            if self.send_now(payload):
+                delay = 1.0
+                self._sent(payload)
+            else:
+                time.sleep(delay)
+                delay = min(PUSH_RETRY_MAX, delay * 2)
+
+    async def _run_async(self, signal):
+        delay = 1.0
+        while True:
+            with self.cond:
+                payload = self.outbox[0] if self.outbox else None
+            if payload is None:
+                await signal.wait()
+                continue
+            if await self.send_now_async(payload):
+                delay = 1.0
+                self._sent(payload)
+            else:
+                await asyncio.sleep(delay)
+                delay = min(PUSH_RETRY_MAX, delay * 2)
+
+    def drain(self):
+        """Envia a outbox na thread de quem chamou (serverless); para na primeira falha."""
+        while True:
+            with self.cond:
+                if not self.outbox:
+                    return
+                payload = self.outbox[0]
+            if not self.send_now(payload):
+                return
+            self._sent(payload)
+
+    def pending(self):
+        with self.cond:
+            return len(self.outbox)
+
+class PushBatcher:
+    """Junta job ids e envia em micro-lotes (max_size ids ou max_wait segundos)."""
+
+    def __init__(self, send, max_size, max_wait):
+        self.send = send
+        self.max_size = max(1, max_size)
+        self.max_wait = max_wait
+        self.pending = []
+        self.first_at = None
+        self.inflight = 0  # lotes tirados de pending e ainda não entregues ao send
+        self.cond = threading.Condition()
+        self.started = False
+        self.signal = None
+
+    def add(self, job_ids):
+        if not job_ids:
+            return
+        with self.cond:
+            if not self.started:
+                self.started = True
+                self.signal = start_worker(self._run, self._run_async)
+            if not self.pending:
+                self.first_at = time.monotonic()
+            self.pending.extend(job_ids)
+            self.cond.notify()
+            if self.signal is not None:
+                self.signal.set()
+
+    def _take(self, force=False):
+        if not self.pending:
+            return None
+        if not force and len(self.pending) < self.max_size and time.monotonic() - self.first_at < self.max_wait:
+            return None
+        batch, self.pending = self.pending[:self.max_size], self.pending[self.max_size:]
+        self.first_at = time.monotonic() if self.pending else None
+        self.inflight += 1
+        return batch
+
+    def _send(self, batch):
+        try:
+            self.send(batch)
+        finally:
+            with self.cond:
+                self.inflight -= 1
+                if not self.inflight:
+                    self.cond.notify_all()
+
+    def _timeout(self):
+        if not self.pending:
+            return None
+        return max(0.0, self.first_at + self.max_wait - time.monotonic())
 
-        time.sleep(SEND_INTERVAL)
+    def _run(self):
+        while True:
+            with self.cond:
+                batch = self._take()
+                while batch is None:
+                    self.cond.wait(self._timeout())
+                    batch = self._take()
+            self._send(batch)
 
-# Inicia thread do loop de jobids
-threading.Thread(target=fetch_and_send_loop, daemon=True).start()
+    async def _run_async(self, signal):
+        # send é não bloqueante (só enfileira no MainPusher)
+        while True:
+            with self.cond:
+                batch = self._take()
+                timeout = self._timeout()
+            if batch is None:
+                await signal.wait(timeout)
+                continue
+            self._send(batch)
+
+    def flush(self):
+        """Envia o que estiver pendente agora, na thread de quem chamou.
+
+        Só volta depois que o lote que o worker já tirou for entregue: o end_cycle
+        logo em seguida troca o `sent` do MainPusher, e um push_ids atrasado acharia
+        que os ids daquele lote já tinham sido enviados.
+        """
+        while True:
+            with self.cond:
+                batch = self._take(force=True)
+                if batch is None:
+                    while self.inflight:
+                        self.cond.wait()
+                    return
+            self._send(batch)
 
 # ==============================
-# CONFIG - WEBHOOKS & BOT
+# FEED DE EVENTOS (SSE)
 # ==============================
-# (Você pode substituir as variáveis abaixo por ENV vars)
-WEBHOOK_A1 = os.environ.get("WEBHOOK_A1", "https://discord.com/api/webhooks/1434974603599675546/")
-WEBHOOK_A2 = os.environ.get("WEBHOOK_A2", "https://discord.com/api/webhooks/1434974826539520090/")
-WEBHOOK_B  = os.environ.get("WEBHOOK_B", "https://discord.com/api/webhooks/1434974948476190730/")
-WEBHOOK_C  = os.environ.get("WEBHOOK_C", "https://discord.com/api/webhooks/1434975012837920768/")
+class EventBus:
+    """Eventos com id crescente, já codificados como frame SSE; guarda os últimos para replay."""
 
-BOT_TOKEN = os.environ.get("BOT_TOKEN", "")  # <-- coloque seu token aqui ou via ENV
-STATS_CHANNEL_ID = int(os.environ.get("STATS_CHANNEL_ID", "1434686237184233523"))
+    def __init__(self, backlog):
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.recent = deque(maxlen=max(1, backlog))  # (id, tipo, dados, frame)
+        self.listeners = []
 
-PLACE_ID = int(os.environ.get("PLACE_ID", str(GAME_ID)))
-CACHE_FILE = os.environ.get("CACHE_FILE", "cache.json")
+    def subscribe(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
 
-SEND_INTERVAL_WEBHOOK = int(os.environ.get("SEND_INTERVAL_WEBHOOK", "30"))
-RESET_INTERVAL = int(os.environ.get("RESET_INTERVAL", str(24*60*60)))  # default 24h
+    def publish(self, kind, data):
+        with self.lock:
+            self.last_id += 1
+            payload = json.dumps(data, separators=(",", ":"))
+            frame = f"id: {self.last_id}\nevent: {kind}\ndata: {payload}\n\n".encode()
+            event = (self.last_id, kind, data, frame)
+            self.recent.append(event)
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener(event)
 
-# Estado do bot/webhook
-name_counter = {}
-job_history = []  # histórico de secrets (com secrets e timestamps)
-last_reset = datetime.now()
-_state = {"use_first_webhook": True, "stats_message_id": None}
+    def since(self, last_id):
+        """Eventos depois de last_id; None se alguns já saíram do backlog."""
+        with self.lock:
+            if last_id >= self.last_id:
+                return []
+            if not self.recent or last_id < self.recent[0][0] - 1:
+                return None
+            return [e for e in self.recent if e[0] > last_id]
 
-MAX_HISTORY = int(os.environ.get("MAX_HISTORY", "50"))
+FEED = EventBus(FEED_BACKLOG)
 
+class _FeedClient:
+    __slots__ = ("sock", "inbuf", "outbuf", "ready", "kinds", "closing", "deadline")
+
+    def __init__(self, sock, deadline):
+        self.sock = sock
+        self.deadline = deadline  # até quando pode levar para mandar a requisição
+        self.inbuf = b""
+        self.outbuf = bytearray()
+        self.ready = False
+        self.kinds = None  # None = todos os tipos
+        self.closing = False
+
+class FeedServer:
+    """Servidor SSE em uma thread só (selectors): GET /events?since=<id>&types=jobids,detection.
+
+    Cada cliente tem um buffer de saída limitado; quem não acompanha é derrubado.
+    """
+
+    def __init__(self, bus, port, max_clients, buffer_limit):
+        self.bus = bus
+        self.port = port
+        self.max_clients = max_clients
+        self.buffer_limit = buffer_limit
+        self.sel = selectors.DefaultSelector()
+        self.clients = {}
+        self.handshaking = deque()  # clientes na ordem de chegada (prazos crescentes)
+        self.inbox = deque()
+        self.dropped = 0
+        self.wake_r = self.wake_w = None  # socketpair criado em start()
+
+    def start(self):
+        self.wake_r, self.wake_w = socket.socketpair()
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(("0.0.0.0", self.port))
+        listener.listen(128)
+        listener.setblocking(False)
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.sel.register(listener, selectors.EVENT_READ, "listen")
+        self.sel.register(self.wake_r, selectors.EVENT_READ, "wake")
+        self.bus.subscribe(self._on_event)
+        threading.Thread(target=self._run, daemon=True).start()
+        logging.info(f"[FEED] SSE na porta {self.port} (/events)")
+
+    def _on_event(self, event):
+        # chamado de qualquer thread: só enfileira e acorda o selector
+        self.inbox.append(event)
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        next_beat = time.monotonic() + FEED_HEARTBEAT
+        while True:
+            wake_at = next_beat
+            if self.handshaking:
+                wake_at = min(wake_at, self.handshaking[0].deadline)
+            for key, mask in self.sel.select(timeout=max(0.0, wake_at - time.monotonic())):
+                if key.data == "listen":
+                    self._accept(key.fileobj)
+                elif key.data == "wake":
+                    try:
+                        while key.fileobj.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    self._dispatch()
+                else:
+                    client = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._read(client)
+                    if mask & selectors.EVENT_WRITE and client.sock.fileno() != -1:
+                        self._write(client)
+            self._expire_handshakes()
+            if time.monotonic() >= next_beat:
+                next_beat = time.monotonic() + FEED_HEARTBEAT
+                for client in list(self.clients.values()):
+                    if client.ready:
+                        self._send(client, b": ping\n\n")
+
+    def _accept(self, listener):
+        try:
+            sock, _ = listener.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        client = _FeedClient(sock, time.monotonic() + FEED_HANDSHAKE_TIMEOUT)
+        self.clients[sock.fileno()] = client
+        self.handshaking.append(client)
+        self.sel.register(sock, selectors.EVENT_READ, client)
+
+    def _expire_handshakes(self):
+        """Derruba quem conectou e não mandou a requisição inteira a tempo."""
+        now = time.monotonic()
+        while self.handshaking and (self.handshaking[0].ready or self.handshaking[0].deadline <= now):
+            client = self.handshaking.popleft()
+            if not client.ready and client.sock.fileno() != -1:
+                self._close(client)
+
+    def _close(self, client):
+        self.clients.pop(client.sock.fileno(), None)
+        try:
+            self.sel.unregister(client.sock)
+        except (KeyError, ValueError):
+            pass
+        client.sock.close()
+
+    def _read(self, client):
+        try:
+            data = client.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._close(client)
+            return
+        if client.ready:
+            return  # SSE é só de ida
+        client.inbuf += data
+        if b"\r\n\r\n" not in client.inbuf:
+            if len(client.inbuf) > 8192:
+                self._close(client)
+            return
+        self._handshake(client)
+
+    def _handshake(self, client):
+        head = client.inbuf.split(b"\r\n\r\n", 1)[0].decode("latin-1")
+        client.inbuf = b""
+        lines = head.split("\r\n")
+        parts = lines[0].split(" ")
+        target = urllib.parse.urlsplit(parts[1] if len(parts) > 1 else "/")
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if parts[0] != "GET" or target.path != "/events":
+            self._reply(client, "404 Not Found", b'{"error":"use GET /events"}')
+            return
+        if sum(1 for c in self.clients.values() if c.ready) >= self.max_clients:
+            self._reply(client, "503 Service Unavailable", b'{"error":"muitos clientes"}')
+            return
+
+        query = urllib.parse.parse_qs(target.query)
+        if "types" in query:
+            client.kinds = set(query["types"][0].split(","))
+        try:
+            last_id = int(headers.get("last-event-id") or query.get("since", ["-1"])[0])
+        except ValueError:
+            last_id = -1
+
+        client.ready = True
+        self._send(client, (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: keep-alive\r\n"
+            "Access-Control-Allow-Origin: *\r\n\r\n"
+            "retry: 3000\n\n"
+        ).encode())
+        if last_id >= 0:
+            backlog = self.bus.since(last_id)
+            if backlog is None:
+                # perdeu eventos: o cliente deve recarregar /jobs e /jobs_history
+                self._send(client, f"event: resync\ndata: {self.bus.last_id}\n\n".encode())
+            else:
+                for event in backlog:
+                    self._push(client, event)
+
+    def _reply(self, client, status, body):
+        client.closing = True
+        self._send(client, (
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+        ).encode() + body)
+
+    def _push(self, client, event):
+        if client.kinds is None or event[1] in client.kinds:
+            self._send(client, event[3])
+
+    def _dispatch(self):
+        while self.inbox:
+            event = self.inbox.popleft()
+            for client in list(self.clients.values()):
+                if client.ready:
+                    self._push(client, event)
+
+    def _send(self, client, data):
+        if len(client.outbuf) + len(data) > self.buffer_limit:
+            # consumidor lento: derruba em vez de acumular memória
+            self.dropped += 1
+            self._close(client)
+            return
+        was_empty = not client.outbuf
+        client.outbuf += data
+        if was_empty:
+            self._write(client)
+
+    def _write(self, client):
+        try:
+            sent = client.sock.send(client.outbuf)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._close(client)
+            return
+        del client.outbuf[:sent]
+        if client.outbuf:
+            self.sel.modify(client.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, client)
+        elif client.closing:
+            self._close(client)
+        else:
+            self.sel.modify(client.sock, selectors.EVENT_READ, client)
+
+    def stats(self):
+        return {
+            "port": self.port,
+            "clients": sum(1 for c in list(self.clients.values()) if c.ready),
+            "dropped": self.dropped,
+            "last_event_id": self.bus.last_id,
+        }
+
+class _SseClient:
+    __slots__ = ("kinds", "chunks", "pending", "signal", "closing")
+
+    def __init__(self, kinds, signal):
+        self.kinds = kinds
+        self.chunks = deque()
+        self.pending = 0
+        self.signal = signal
+        self.closing = False
+
+class ThreadSignal:
+    """Mesma interface do AsyncSignal para quem espera numa thread."""
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def set(self):
+        self.event.set()
+
+    def wait(self, timeout=None):
+        self.event.wait(timeout)
+        self.event.clear()
+
+class SseClients:
+    """Clientes SSE com buffer de saída limitado (lento é derrubado), alimentados pelo bus.
+
+    Base do SseHub (asyncio) e do /events do Flask (threads); o FeedServer tem o seu.
+    """
+
+    def __init__(self, bus, max_clients, buffer_limit):
+        self.bus = bus
+        self.max_clients = max_clients
+        self.buffer_limit = buffer_limit
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.dropped = 0
+        bus.subscribe(self._on_event)
+
+    def _on_event(self, event):
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            if client.kinds is None or event[1] in client.kinds:
+                self._send(client, event[3])
+
+    def _send(self, client, data):
+        with self.lock:
+            if client.closing:
+                return
+            if client.pending + len(data) > self.buffer_limit:
+                client.closing = True
+                self.dropped += 1
+            else:
+                client.chunks.append(data)
+                client.pending += len(data)
+        client.signal.set()
+
+    def open(self, kinds, last_id, signal):
+        """Registra o cliente e enfileira o replay desde last_id (-1 = sem replay); None se lotado."""
+        with self.lock:
+            if len(self.clients) >= self.max_clients:
+                return None
+            client = _SseClient(kinds, signal)
+            self.clients.add(client)
+        if last_id >= 0:
+            backlog = self.bus.since(last_id)
+            if backlog is None:
+                # perdeu eventos: o cliente deve recarregar /jobs e /jobs_history
+                self._send(client, f"event: resync\ndata: {self.bus.last_id}\n\n".encode())
+            else:
+                for event in backlog:
+                    if kinds is None or event[1] in kinds:
+                        self._send(client, event[3])
+        return client
+
+    def take(self, client):
+        """(bytes pendentes, cliente derrubado?)"""
+        with self.lock:
+            data = b"".join(client.chunks)
+            client.chunks.clear()
+            client.pending = 0
+            return data, client.closing
+
+    def close(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def stats(self):
+        return {
+            "clients": len(self.clients),
+            "dropped": self.dropped,
+            "last_event_id": self.bus.last_id,
+        }
+
+class FlaskSse(SseClients):
+    """/events com Accept: text/event-stream na porta do Flask (runtime threads).
+
+    Cada cliente ocupa uma thread do servidor do Flask durante toda a conexão, por isso
+    o limite é baixo (FEED_MAIN_PORT_MAX_CLIENTS, depois 503); o FeedServer em FEED_PORT
+    atende milhares numa thread só.
+    """
+
+    def stream(self, kinds, last_id):
+        """Corpo da resposta SSE, ou None se já há clientes demais."""
+        client = self.open(kinds, last_id, ThreadSignal())
+        if client is None:
+            return None
+
+        def body():
+            try:
+                yield b"retry: 3000\n\n"
+                while True:
+                    data, closing = self.take(client)
+                    if closing:
+                        return
+                    if data:
+                        yield data
+                        continue
+                    client.signal.wait(FEED_HEARTBEAT)
+                    if not client.chunks and not client.closing:
+                        yield b": ping\n\n"
+            finally:
+                self.close(client)
+
+        return body()
+
+# FeedServer (threads, criado no __main__) ou SseHub (asyncio, criado em main_async)
+FEED_SERVER = None
+# SSE também na porta principal; no asyncio quem atende é o SseHub, no serverless não há conexão longa
+FEED_STREAMS = FlaskSse(FEED, FEED_MAIN_PORT_MAX_CLIENTS, FEED_CLIENT_BUFFER) if RUNTIME == "threads" else None
+
+# ==============================
+# POOL PUBLICADO (/jobs, /jobids)
+# ==============================
+# versões do pool (e ETags) não valem entre reinícios nem entre instâncias (serverless)
+BOOT_ID = format(int(time.time()), "x") + os.urandom(3).hex()
+
+class PoolView:
+    """Pool publicado em /jobs: serializado (e comprimido) uma vez por versão.
+
+    Cada publish/extend gera uma versão nova e guarda o diff, para que
+    /jobs?since=<versão> devolva só o que mudou. Para fora a versão vai como
+    "<BOOT_ID>-<n>": o contador recomeça a cada boot, e um `since` de outro boot
+    (ou de outra instância) recebe o pool completo. Os ids ficam empacotados
+    (PackedIds) e só viram texto na hora de serializar.
+    """
+
+    def __init__(self, diff_history, place_id=None):
+        self.place_id = place_id
+        self.lock = threading.Lock()
+        self.version = 0
+        self.ids = PackedIds()
+        self.diffs = deque(maxlen=max(1, diff_history))  # (versão, adicionados, removidos) empacotados
+        self.body = None
+        self.body_gz = None
+        self.file_checked = False
+        self.file_mtime = None
+
+    def _bump(self, added, removed):
+        self.version += 1
+        self.diffs.append((self.version, added, removed))
+        self.body = self.body_gz = None
+        FEED.publish("jobids", {
+            "placeId": self.place_id, "version": version_tag(self.version),
+            "added": unpack_job_ids(added), "removed": unpack_job_ids(removed),
+        })
+
+    def extend(self, fresh):
+        """Acrescenta ids novos (durante o ciclo)."""
+        with self.lock:
+            ids = self.ids.copy()  # quem leu self.ids fora do lock segue com a versão anterior
+            fresh = b"".join(i for i in fresh if ids.add(i))
+            if not fresh:
+                return
+            self.ids = ids
+            self._bump(fresh, b"")
+
+    def publish(self, ids):
+        """Troca o pool inteiro (fim de ciclo); aceita PackedIds ou ids empacotados."""
+        if not isinstance(ids, PackedIds):
+            ids = PackedIds(ids)
+        with self.lock:
+            if self.ids:
+                added = b"".join(i for i in ids if i not in self.ids)
+                removed = b"".join(i for i in self.ids if i not in ids)
+            else:
+                added, removed = bytes(ids.raw()), b""  # pool vazio (boot): sem montar tabela
+            self.ids = ids
+            if added or removed or not self.version:
+                self._bump(added, removed)
+
+    def load_file(self, path, follow=False, legacy=None):
+        """Na primeira chamada com o pool vazio, usa o último pool salvo.
+
+        Com follow=True (serverless) recarrega sempre que o arquivo mudar, já que o
+        crawl roda em outra invocação. Sem `path`, tenta o arquivo `legacy` (pool.json).
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            if legacy is not None:
+                self.load_file(legacy, follow)
+            return
+        with self.lock:
+            if follow:
+                if mtime == self.file_mtime:
+                    return
+            elif self.file_checked or self.ids:
+                return
+            self.file_checked = True
+            self.file_mtime = mtime
+        try:
+            ids = map_pool(path)
+            if ids is None:
+                # pool.json de antes do formato binário
+                with open(path, "r", encoding="utf-8") as f:
+                    servers = json.load(f).get("servers", [])
+                ids = PackedIds(filter(None, map(pack_job_id, servers)))
+            self.publish(ids)
+        except (OSError, ValueError):
+            pass
+
+    def etag(self):
+        return f'"{version_tag(self.version)}"'
+
+    def rendered(self, use_gzip):
+        with self.lock:
+            if self.body is None:
+                # mesmo JSON de dumps_compact (UUIDs não precisam de escape), sem passar por json
+                servers = format_job_ids(self.ids.raw(), b'","')
+                servers = b'"' + servers + b'"' if servers else b""
+                self.body = b'{"count":%d,"servers":[%s]}' % (len(self.ids), servers)
+            if use_gzip and self.body_gz is None:
+                self.body_gz = gzip.compress(self.body, compresslevel=6)
+            return (self.body_gz if use_gzip else self.body), self.etag(), self.version
+
+    def diff_since(self, since):
+        """Diff desde a versão `since` (contador deste boot); None se ela já saiu do histórico."""
+        with self.lock:
+            if since == self.version:
+                return [], [], self.version
+            if not self.diffs or since < self.diffs[0][0] - 1 or since > self.version:
+                return None
+            added, removed = {}, {}
+            for version, plus, minus in self.diffs:
+                if version <= since:
+                    continue
+                for k in range(0, len(plus), 16):
+                    i = plus[k:k + 16]
+                    if removed.pop(i, None) is None:
+                        added[i] = True
+                for k in range(0, len(minus), 16):
+                    i = minus[k:k + 16]
+                    if added.pop(i, None) is None:
+                        removed[i] = True
+            return unpack_job_ids(b"".join(added)), unpack_job_ids(b"".join(removed)), self.version
+
+def version_tag(version):
+    """Versão do pool como sai em X-Pool-Version, no JSON e no feed."""
+    return f"{BOOT_ID}-{version}"
+
+def parse_version_tag(text):
+    """Contador de uma versão "<BOOT_ID>-<n>"; None se for de outro boot (ou sem boot).
+
+    ValueError se não for uma versão.
+    """
+    boot, _, version = text.strip().strip('"').rpartition("-")
+    version = int(version)
+    return version if boot == BOOT_ID else None
+
+def ranked_response(place):
+    """/jobs?order=fresh|fill|ping&limit=N: os N melhores do pool, com os dados de cada server."""
+    order = request.args.get("order")
+    if order not in ServerIndex.ORDERS:
+        return jsonify({"error": f"order deve ser um de: {', '.join(ServerIndex.ORDERS)}"}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", "100")), JOBS_RANKED_MAX))
+    except ValueError:
+        return jsonify({"error": "limit deve ser inteiro"}), 400
+    with place.view.lock:
+        ids, version = place.view.ids, place.view.version
+    servers = place.index.ranked(ids, order, limit)
+    resp = jsonify({"version": version_tag(version), "order": order, "count": len(servers), "servers": servers})
+    resp.headers["X-Pool-Version"] = version_tag(version)
+    return resp
+
+def pool_response(view):
+    """Resposta de /jobs e /jobids a partir do cache (304 com If-None-Match, diff com ?since=)."""
+    since = request.args.get("since")
+    if since is not None:
+        try:
+            since_version = parse_version_tag(since)
+        except ValueError:
+            return jsonify({"error": "since deve ser uma versão do pool (X-Pool-Version)"}), 400
+        diff = view.diff_since(since_version) if since_version is not None else None
+        if diff is not None:
+            added, removed, version = diff
+            resp = jsonify({
+                "version": version_tag(version), "since": version_tag(since_version),
+                "added": added, "removed": removed,
+            })
+            resp.headers["X-Pool-Version"] = version_tag(version)
+            return resp
+        # outro boot/instância ou versão antiga demais: cai para o pool completo
+
+    use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+    body, etag, version = view.rendered(use_gzip)
+    headers = {"ETag": etag, "X-Pool-Version": version_tag(version), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag in request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype="application/json", headers=headers)
+
+# ==============================
+# PLACES
+# ==============================
+PUSH_SESSION = requests.Session()  # keep-alive compartilhado pelos pushers de todos os places
+PUSH_SESSION.mount("http://", HTTPAdapter(pool_maxsize=4))
+PUSH_SESSION.mount("https://", HTTPAdapter(pool_maxsize=4))
+
+class _ServerInfo:
+    __slots__ = ("first_seen", "last_seen", "playing", "max_players", "ping", "cycle")
+
+class ServerIndex:
+    """Servers de um place por job id, com o que a API de games devolve além do id.
+
+    Cada id fica no balde do último ciclo em que foi visto, então atualizar é O(tamanho
+    da página) e o despejo no fim do ciclo só toca os ids vencidos.
+    """
+
+    ORDERS = {
+        # nome -> (chave, maiores primeiro?)
+        "fresh": (lambda e: e.first_seen, True),
+        "fill": (lambda e: e.playing / e.max_players if e.max_players else 0.0, True),
+        "ping": (lambda e: e.ping if e.ping is not None else float("inf"), False),
+    }
+
+    def __init__(self, evict_after):
+        self.evict_after = evict_after
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.by_cycle = {}  # ciclo -> ids vistos por último nele
+
+    def update(self, servers, cycle):
+        """servers: [(id empacotado, server)] de uma página (packed_servers)."""
+        now = time.time()
+        with self.lock:
+            bucket = self.by_cycle.setdefault(cycle, set())
+            for job_id, server in servers:
+                entry = self.entries.get(job_id)
+                if entry is None:
+                    entry = self.entries[job_id] = _ServerInfo()
+                    entry.first_seen = now
+                elif entry.cycle != cycle:
+                    old = self.by_cycle.get(entry.cycle)
+                    if old is not None:
+                        old.discard(job_id)
+                entry.last_seen = now
+                entry.playing = server.get("playing", 0)
+                entry.max_players = server.get("maxPlayers", 0)
+                entry.ping = server.get("ping")
+                entry.cycle = cycle
+                bucket.add(job_id)
+
+    def end_cycle(self, cycle):
+        """Despeja quem não aparece há evict_after ciclos; retorna quantos saíram."""
+        evicted = 0
+        with self.lock:
+            for old in [c for c in self.by_cycle if c <= cycle - self.evict_after]:
+                for job_id in self.by_cycle.pop(old):
+                    del self.entries[job_id]
+                    evicted += 1
+        return evicted
+
+    def __contains__(self, job_id):
+        return job_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def ranked(self, job_ids, order, limit):
+        """Os `limit` primeiros de job_ids (só os indexados) na ordem pedida."""
+        key, largest = self.ORDERS[order]
+        with self.lock:
+            entries = [(i, self.entries[i]) for i in job_ids if i in self.entries]
+            pick = heapq.nlargest if largest else heapq.nsmallest
+            top = pick(limit, entries, key=lambda item: key(item[1]))
+            return [
+                {
+                    "id": unpack_job_ids(job_id)[0],
+                    "playing": e.playing,
+                    "maxPlayers": e.max_players,
+                    "ping": e.ping,
+                    "first_seen": round(e.first_seen, 1),
+                    "last_seen": round(e.last_seen, 1),
+                }
+                for job_id, e in top
+            ]
+
+class Place:
+    """Estado de um place: pool publicado, arquivo, envio ao MAIN e métricas do último ciclo."""
+
+    def __init__(self, place_id, pool_file, push_url, tagged):
+        self.place_id = place_id
+        self.tag = f" {place_id}" if tagged else ""  # nos logs, com vários places
+        self.pool_file, self.legacy_file = _pool_files(pool_file)
+        self.view = PoolView(POOL_DIFF_HISTORY, place_id)
+        self.index = ServerIndex(SERVER_EVICT_AFTER)
+        self.pusher = MainPusher(
+            push_url, PUSH_MODE, PUSH_RESYNC_EVERY, PUSH_GZIP, PUSH_OUTBOX_MAX,
+            extra={"placeId": place_id} if tagged else None,
+            session=PUSH_SESSION,
+            label=place_id,
+        )
+        self.batcher = PushBatcher(self.pusher.push_ids, PUSH_BATCH_SIZE, PUSH_BATCH_MS / 1000)
+        self.last_jobids = PackedIds()
+        self.last_fill = {}  # job id -> playing/maxPlayers no último ciclo
+        self.to_save = PackedIds()
+        # agendamento
+        self.churn = 1.0  # fração do pool que mudou no último ciclo (começa alta: prioridade)
+        self.fill_delta = 0.0
+        self.rate_429 = 0.0
+        self.activity = None  # EWMA de max(churn, fill_delta)
+        self.interval = float(SEND_INTERVAL)
+        self.depth = MAX_PAGES_PER_CYCLE
+        self.next_wait = self.interval
+        self.partial_streak = 0  # ciclos seguidos abaixo da profundidade máxima
+        self.failed_streak = 0  # ciclos seguidos em que todas as páginas falharam
+        self.last_crawl = None
+        self.crawling = False
+        self.cycles = 0
+        PERSIST.register(f"pool:{place_id}", self._write)
+
+    def _write(self):
+        atomic_write(self.pool_file, encode_pool(self.to_save))
+
+    def load_saved(self, follow=False):
+        self.view.load_file(self.pool_file, follow, legacy=self.legacy_file)
+
+    def save(self, job_ids):
+        self.to_save = job_ids
+        PERSIST.mark_dirty(f"pool:{self.place_id}")
+        logging.info(f"[LOCAL] {self.pool_file} atualizado com {len(job_ids)} servers.")
+
+    def tune(self, churn, fill_delta, rate_429):
+        """Intervalo e profundidade do próximo ciclo a partir do que mudou neste."""
+        self.churn, self.fill_delta, self.rate_429 = churn, fill_delta, rate_429
+        self.failed_streak = 0
+        if CRAWL_ADAPTIVE:
+            activity = max(churn, fill_delta)
+            self.activity = activity if self.activity is None else 0.5 * self.activity + 0.5 * activity
+            # 0 = lista parada (intervalo máximo, poucas páginas); 1 = churn no alvo ou acima
+            level = min(1.0, self.activity / max(CRAWL_CHURN_TARGET, 1e-6))
+            interval = CRAWL_INTERVAL_MAX * (CRAWL_INTERVAL_MIN / CRAWL_INTERVAL_MAX) ** level
+            depth = CRAWL_PAGES_MIN + (CRAWL_PAGES_MAX - CRAWL_PAGES_MIN) * level
+            if rate_429 > 0:
+                # rate limit: espaça e encurta o próximo ciclo
+                interval *= 1 + 4 * rate_429
+                depth *= max(0.25, 1 - rate_429)
+            self.interval = min(CRAWL_INTERVAL_MAX, max(CRAWL_INTERVAL_MIN, interval))
+            self.depth = min(CRAWL_PAGES_MAX, max(CRAWL_PAGES_MIN, int(round(depth))))
+            if self.partial_streak >= CRAWL_FULL_EVERY and not rate_429:
+                self.depth = CRAWL_PAGES_MAX  # de tempos em tempos um ciclo completo limpa os ids antigos
+        self.next_wait = self.interval * (1 + random.uniform(-CRAWL_JITTER, CRAWL_JITTER))
+        logging.info(
+            f"[SCHED{self.tag}] churn={churn:.3f} lotação={fill_delta:.3f} 429={rate_429:.2f} "
+            f"→ próximo em {self.next_wait:.1f}s, {self.depth} páginas"
+        )
+
+    def back_off(self, rate_429):
+        """Ciclo em que todas as páginas falharam: não diz nada sobre o churn.
+
+        Atividade, intervalo e profundidade ficam como estão (um churn 0 aqui levaria ao
+        intervalo máximo com poucas páginas); só o próximo ciclo espera mais, dobrando a
+        cada falha seguida até CRAWL_INTERVAL_MAX.
+        """
+        self.rate_429 = rate_429
+        self.failed_streak += 1
+        wait = min(CRAWL_INTERVAL_MAX, self.interval * 2 ** min(self.failed_streak, 6))
+        self.next_wait = max(self.interval, wait) * (1 + random.uniform(-CRAWL_JITTER, CRAWL_JITTER))
+        logging.warning(
+            f"[SCHED{self.tag}] {self.failed_streak} ciclo(s) seguido(s) sem nenhuma página "
+            f"(429={rate_429:.2f}) → próximo em {self.next_wait:.1f}s"
+        )
+
+    def stats(self):
+        return {
+            "servers": len(self.last_jobids),
+            "indexed": len(self.index),
+            "churn": round(self.churn, 3),
+            "fill_delta": round(self.fill_delta, 3),
+            "rate_429": round(self.rate_429, 3),
+            "interval": round(self.interval, 1),
+            "depth": self.depth,
+            "failed_streak": self.failed_streak,
+            "cycles": self.cycles,
+            "crawling": self.crawling,
+            "push_target": self.pusher.url,
+            "push_outbox": self.pusher.pending(),
+        }
+
+def _pool_files(path):
+    """(binário, pool.json legado) de um caminho configurado; nunca grava binário num .json."""
+    root, ext = os.path.splitext(path)
+    if ext.lower() == ".json":
+        return f"{root}.bin", path
+    return path, f"{root}.json"
+
+def _place_pool_file(place_id, first):
+    if first:
+        return POOL_FILE
+    root, ext = os.path.splitext(POOL_FILE)
+    return f"{root}.{place_id}{ext or '.bin'}"
+
+PLACES = {}
+for _n, _place_id in enumerate(PLACE_IDS):
+    PLACES[_place_id] = Place(
+        _place_id,
+        _place_pool_file(_place_id, _n == 0),
+        PLACE_PUSH_URLS.get(_place_id, MAIN_API_URL.replace("{place_id}", _place_id)),
+        tagged=len(PLACE_IDS) > 1,
+    )
+DEFAULT_PLACE = PLACES[PLACE_IDS[0]]
+POOL_VIEW = DEFAULT_PLACE.view  # /jobs e /jobids
+
+class CrawlScheduler:
+    """Decide qual place varrer agora, para N workers dividirem o mesmo orçamento de proxies.
+
+    Cada place volta a ficar pronto `next_wait` segundos depois do último ciclo (ajustado
+    por Place.tune); entre os prontos, o de maior churn vai primeiro (e, empatando, o que
+    espera há mais tempo).
+    """
+
+    def __init__(self, places):
+        self.places = list(places)
+        self.cond = threading.Condition()
+
+    def _ready_in(self, place, now):
+        if place.last_crawl is None:
+            return 0.0
+        return place.last_crawl + place.next_wait - now
+
+    def try_claim(self):
+        """Reserva o próximo place; retorna (place, 0) ou (None, segundos até o próximo ficar pronto)."""
+        with self.cond:
+            now = time.monotonic()
+            idle = [p for p in self.places if not p.crawling]
+            if not idle:
+                return None, CRAWL_INTERVAL_MIN
+            ready = [p for p in idle if self._ready_in(p, now) <= 0]
+            if not ready:
+                return None, min(self._ready_in(p, now) for p in idle)
+            place = max(ready, key=lambda p: (p.churn, -(p.last_crawl or 0.0)))
+            place.crawling = True
+            return place, 0.0
+
+    def claim(self):
+        with self.cond:
+            while True:
+                place, wait_for = self.try_claim()
+                if place is not None:
+                    return place
+                self.cond.wait(wait_for)
+
+    def done(self, place):
+        with self.cond:
+            place.crawling = False
+            place.last_crawl = time.monotonic()
+            self.cond.notify_all()
+
+SCHEDULER = CrawlScheduler(PLACES.values())
+
+# ==============================
+# LOOP PRINCIPAL (jobids)
+# ==============================
+class PoolCycle:
+    """Um ciclo de um place: publica em /jobs e alimenta o push conforme as páginas chegam."""
+
+    def __init__(self, place):
+        self.place = place
+        self.started = time.monotonic()
+        self.job_ids = []
+        self.held = []  # segurado até o ciclo atingir SEND_MIN_SERVERS
+        self.published = place.last_jobids.copy()
+        self.total_servers = 0
+        self.fill = {}
+        self.report = {}  # resumo do crawler (páginas, 429...)
+        self.max_pages = place.depth
+        self.number = place.cycles + 1
+
+    def crawl(self):
+        return iter_roblox_pages(self.place.place_id, max_pages=self.max_pages, report=self.report)
+
+    def crawl_async(self):
+        return iter_roblox_pages_async(self.place.place_id, max_pages=self.max_pages, report=self.report)
+
+    def on_page(self, page):
+        self.total_servers += len(page)
+        servers = packed_servers(page)
+        self.place.index.update(servers, self.number)
+        for job_id, server in servers:
+            if server.get("maxPlayers"):
+                self.fill[job_id] = server.get("playing", 0) / server["maxPlayers"]
+        ids = filter_job_ids(servers)
+        if not ids:
+            return
+        if not self.job_ids:
+            logging.info(f"[STREAM{self.place.tag}] Primeiro job id em {time.monotonic() - self.started:.2f}s")
+        self.job_ids.extend(ids)
+
+        # publica em /jobs na hora, sem esperar o fim do ciclo
+        fresh = [i for i in ids if self.published.add(i)]
+        if fresh:
+            self.place.view.extend(fresh)
+
+        batcher = self.place.batcher
+        if len(self.job_ids) < SEND_MIN_SERVERS:
+            self.held.extend(ids)
+        else:
+            if self.held:
+                batcher.add(self.held)
+                self.held = []
+            batcher.add(ids)
+
+    def finish(self):
+        """Fecha o ciclo (fim do pool, salvar, delta de removidos). False se não veio nada."""
+        place = self.place
+        place.cycles += 1
+        job_ids = self.job_ids
+        CRAWL_CYCLE_SECONDS.observe(time.monotonic() - self.started, place.place_id)
+        CRAWL_CYCLE_PAGES.observe(self.report.get("pages", 0), place.place_id)
+        CRAWL_SERVERS.inc(place.place_id, amount=self.total_servers)
+        CRAWL_SERVERS_KEPT.inc(place.place_id, amount=len(job_ids))
+        requests_made = self.report.get("pages", 0) + self.report.get("errors", 0)
+        rate_429 = self.report.get("throttled", 0) / max(1, requests_made)
+        if not self.total_servers:
+            logging.warning(f"⚠️ Nenhum servidor encontrado{place.tag}.")
+            if not self.report.get("pages", 0) and self.report.get("errors", 0):
+                place.back_off(rate_429)  # todas as páginas falharam
+            else:
+                place.tune(0.0, 0.0, rate_429)
+            return False
+
+        logging.info(f"[FILTER{place.tag}] {len(job_ids)} servers após filtro ({MIN_PLAYERS}–{MAX_PLAYERS} players)")
+
+        place.index.end_cycle(self.number)
+
+        # ciclo raso (parou no orçamento de páginas, abaixo do máximo): o que não foi visto
+        # não sumiu necessariamente, então os ids antigos ficam enquanto estiverem no índice
+        partial = self.report.get("pages", 0) >= self.max_pages and self.max_pages < CRAWL_PAGES_MAX
+        place.partial_streak = place.partial_streak + 1 if partial else 0
+        job_ids = PackedIds(job_ids)
+        if partial:
+            for i in place.last_jobids:
+                if i in place.index:
+                    job_ids.add(i)
+
+        # churn: ids que entraram ou saíram, sobre a união do pool velho com o novo (num
+        # ciclo raso os não vistos continuam no pool, então não contam como saída);
+        # lotação: variação média de playing/maxPlayers
+        old = place.last_jobids
+        if old:
+            added = sum(1 for i in job_ids if i not in old)
+            removed = sum(1 for i in old if i not in job_ids)
+            churn = (added + removed) / max(1, len(old) + added)
+            common = [i for i in self.fill if i in place.last_fill]
+            fill_delta = sum(abs(self.fill[i] - place.last_fill[i]) for i in common) / max(1, len(common))
+            place.tune(churn, fill_delta, rate_429)
+        place.last_fill = self.fill
+
+        # fim do ciclo: ids que sumiram saem do pool
+        place.last_jobids = job_ids
+        place.view.publish(job_ids)
+
+        place.save(job_ids)
+
+        if len(job_ids) < SEND_MIN_SERVERS:
+            logging.info(f"[SKIP{place.tag}] Apenas {len(job_ids)} válidos (mínimo: {SEND_MIN_SERVERS}).")
+        else:
+            place.batcher.flush()
+            place.pusher.end_cycle(job_ids)
+        return True
+
+def crawl_worker():
+    """Worker de crawl: pega o próximo place do agendador e faz um ciclo."""
+    while True:
+        place = SCHEDULER.claim()
+        try:
+            cycle = PoolCycle(place)
+            for page in cycle.crawl():
+                cycle.on_page(page)
+            cycle.finish()
+        except Exception:
+            logging.exception(f"[CRAWL] Ciclo de {place.place_id} falhou")
+        finally:
+            SCHEDULER.done(place)
+
+def run_crawl_cycle():
+    """Um ciclo de cada place na thread de quem chamou (serverless: disparado por /cron/crawl)."""
+    cycles = {}
+    for place in PLACES.values():
+        cycle = PoolCycle(place)
+        for page in cycle.crawl():
+            cycle.on_page(page)
+        cycle.finish()
+        place.pusher.drain()
+        cycles[place.place_id] = cycle
+    return cycles
+
+async def crawl_worker_async():
+    while True:
+        place, wait_for = SCHEDULER.try_claim()
+        if place is None:
+            await asyncio.sleep(min(wait_for, 1.0))
+            continue
+        try:
+            cycle = PoolCycle(place)
+            async for page in cycle.crawl_async():
+                cycle.on_page(page)
+            await run_blocking(cycle.finish)
+        except Exception:
+            logging.exception(f"[CRAWL] Ciclo de {place.place_id} falhou")
+        finally:
+            SCHEDULER.done(place)
+
+# Workers de crawl (no modo asyncio, main_async() cria as tasks): um número fixo, seja quantos forem os places
+if RUNTIME == "threads":
+    for _ in range(CRAWL_PLACE_WORKERS):
+        threading.Thread(target=crawl_worker, daemon=True).start()
+
+# ==============================
+# HISTÓRICO DE DETECÇÕES
+# ==============================
+def _gen_bucket(gen_value):
+    """Faixa de ordem de grandeza da geração (0 = < 10, 6 = milhões...)."""
+    return int(math.log10(gen_value)) if gen_value >= 1 else 0
+
+class SeqIndex:
+    """Seqs crescentes de uma chave do HistoryStore: array com início deslocado.
+
+    popleft() só avança `head`; o começo morto é apagado quando passa da metade do
+    array, então cada seq é copiado O(1) vezes em média. Diferente de um deque, ler
+    `seqs[i]` no meio (bisect do cursor) é O(1).
+    """
+
+    __slots__ = ("seqs", "head")
+
+    def __init__(self):
+        self.seqs = array("q")
+        self.head = 0
+
+    def append(self, seq):
+        self.seqs.append(seq)
+
+    def popleft(self):
+        self.head += 1
+        if self.head >= 64 and 2 * self.head >= len(self.seqs):
+            del self.seqs[:self.head]
+            self.head = 0
+
+    def __len__(self):
+        return len(self.seqs) - self.head
+
+    def __iter__(self):
+        return itertools.islice(self.seqs, self.head, None)
+
+class HistoryStore:
+    """Buffer circular de detecções com índices por name, rarity, jobId e faixa de geração.
+
+    Cada entrada ganha um seq crescente; os índices (SeqIndex) guardam seqs em ordem,
+    então inserir e expulsar a mais antiga é O(1) amortizado. Não tem lock próprio:
+    use STATE_LOCK.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(1, capacity)
+        self.ring = [None] * self.capacity  # (seq, entry, gen_value)
+        self.next_seq = 0
+        self.indexes = {"name": {}, "rarity": {}, "jobId": {}, "gen": {}}
+
+    def _keys(self, entry, gen_value):
+        return (
+            ("name", entry.get("name")),
+            ("rarity", entry.get("rarity")),
+            ("jobId", entry.get("jobId")),
+            ("gen", _gen_bucket(gen_value)),
+        )
+
+    def add(self, entry):
+        seq = self.next_seq
+        slot = seq % self.capacity
+        old = self.ring[slot]
+        if old is not None:
+            old_seq, old_entry, old_gen = old
+            for index, key in self._keys(old_entry, old_gen):
+                seqs = self.indexes[index][key]
+                seqs.popleft()  # a mais antiga é sempre a primeira do índice
+                if not seqs:
+                    del self.indexes[index][key]
+        gen_value = parse_generation(entry.get("generation"))
+        self.ring[slot] = (seq, entry, gen_value)
+        for index, key in self._keys(entry, gen_value):
+            seqs = self.indexes[index].get(key)
+            if seqs is None:
+                seqs = self.indexes[index][key] = SeqIndex()
+            seqs.append(seq)
+        self.next_seq += 1
+        return seq
+
+    def clear(self):
+        self.ring = [None] * self.capacity
+        self.next_seq = 0
+        for index in self.indexes.values():
+            index.clear()
+
+    def __len__(self):
+        return min(self.next_seq, self.capacity)
+
+    def _get(self, seq):
+        return self.ring[seq % self.capacity]
+
+    def recent(self, n):
+        """As n entradas mais novas (mais nova primeiro)."""
+        first = max(self.next_seq - self.capacity, self.next_seq - n, 0)
+        return [self._get(seq)[1] for seq in range(self.next_seq - 1, first - 1, -1)]
+
+    def to_list(self):
+        return self.recent(self.capacity)
+
+    @staticmethod
+    def _ordered(parts, newest, cursor):
+        """Seqs de `parts` (SeqIndex ou range) a partir do cursor, em ordem; merge preguiçoso."""
+        iters = []
+        for part in parts:
+            seqs, head = (part.seqs, part.head) if isinstance(part, SeqIndex) else (part, 0)
+            if newest:
+                end = len(seqs) if cursor is None else bisect.bisect_left(seqs, cursor, head)
+                iters.append(map(seqs.__getitem__, range(end - 1, head - 1, -1)))
+            else:
+                begin = head if cursor is None else bisect.bisect_right(seqs, cursor, head)
+                iters.append(map(seqs.__getitem__, range(begin, len(seqs))))
+        return iters[0] if len(iters) == 1 else heapq.merge(*iters, reverse=newest)
+
+    def query(self, name=None, rarity=None, job_id=None, min_gen=None, max_gen=None,
+              sort="newest", limit=50, cursor=None):
+        """Filtra pelo índice mais seletivo; retorna (entradas, próximo cursor).
+
+        Em sort newest/oldest o cursor é um seq; em generation/-generation é um offset.
+        """
+        # candidatos: (tamanho, sequências ordenadas de seqs); o menor é percorrido
+        candidates = []
+        for index, key in (("name", name), ("rarity", rarity), ("jobId", job_id)):
+            if key is not None:
+                seqs = self.indexes[index].get(key, ())
+                candidates.append((len(seqs), [seqs]))
+        lo = _gen_bucket(min_gen) if min_gen is not None else 0
+        hi = _gen_bucket(max_gen) if max_gen is not None else None
+        by_gen = sorted(
+            ((bucket, seqs) for bucket, seqs in self.indexes["gen"].items()
+             if bucket >= lo and (hi is None or bucket <= hi)),
+            key=lambda item: item[0],
+        )
+        if min_gen is not None or max_gen is not None:
+            candidates.append((sum(len(seqs) for _, seqs in by_gen), [seqs for _, seqs in by_gen]))
+        if not candidates:
+            candidates.append((len(self), [range(max(0, self.next_seq - self.capacity), self.next_seq)]))
+        size, parts = min(candidates, key=lambda c: c[0])
+
+        def matches(item):
+            seq, entry, gen_value = item
+            return (
+                (name is None or entry.get("name") == name)
+                and (rarity is None or entry.get("rarity") == rarity)
+                and (job_id is None or entry.get("jobId") == job_id)
+                and (min_gen is None or gen_value >= min_gen)
+                and (max_gen is None or gen_value <= max_gen)
+            )
+
+        limit = max(1, limit)
+        if sort in ("newest", "oldest"):
+            out = []
+            for seq in self._ordered(parts, sort == "newest", cursor):
+                item = self._get(seq)
+                if matches(item):
+                    if len(out) == limit:
+                        return [e for _, e, _ in out], out[-1][0]
+                    out.append(item)
+            return [e for _, e, _ in out], None
+
+        # ordenação por geração: as faixas do índice "gen" já vêm em ordem, então basta
+        # ordenar dentro de cada faixa e parar quando a página (e mais um) estiver completa
+        descending = sort != "generation"
+        offset = cursor or 0
+        if size < sum(len(seqs) for _, seqs in by_gen):
+            groups = parts  # um índice mais seletivo: ordena tudo o que casa
+        else:
+            groups = [seqs for _, seqs in (reversed(by_gen) if descending else by_gen)]
+        matched = []
+        for group in groups:
+            items = [item for item in map(self._get, group) if matches(item)]
+            items.sort(key=lambda item: (item[2], item[0]), reverse=descending)
+            matched += items
+            if len(matched) > offset + limit:
+                break
+        page = matched[offset:offset + limit]
+        next_cursor = offset + limit if len(matched) > offset + limit else None
+        return [e for _, e, _ in page], next_cursor
+
+def parse_window(text):
+    """Janela em segundos: "90m", "6h", "1d" ou segundos puros."""
+    text = str(text).strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text and text[-1] in units:
+        seconds = float(text[:-1]) * units[text[-1]]
+    else:
+        seconds = float(text)
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError(f"janela inválida: {text}")
+    return int(seconds)
+
+def format_window(seconds):
+    if seconds % 86400 == 0:
+        return f"{seconds // 86400 * 24}h" if seconds <= 86400 else f"{seconds // 86400}d"
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    return f"{max(1, seconds // 60)}min"
+
+class RollingCounter:
+    """Contagem por nome em janela deslizante de `buckets` baldes de `bucket_seconds`.
+
+    Cada balde do anel guarda {nome: contagem} só dos nomes vistos nele, mais o total
+    do balde. Os totais da janela inteira (por nome e geral) são mantidos a cada add();
+    quando o anel gira, o balde que sai é descontado deles, então cada contagem entra
+    e sai uma vez só. O top-K sai de um heap com entradas preguiçosas: toda mudança
+    empurra (contagem, nome) e as entradas velhas são descartadas na leitura.
+    """
+
+    def __init__(self, bucket_seconds, buckets, k):
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.size = max(1, buckets)
+        self.k = max(1, k)
+        self.buckets = [None] * self.size  # {nome: contagem} do balde (None = vazio)
+        self.bucket_totals = [0] * self.size
+        self.counts = {}  # nome -> total na janela inteira
+        self.total = 0
+        self.heap = []  # (-contagem, nome), com entradas velhas
+        self.head = self._bucket(time.time())
+
+    @property
+    def span(self):
+        return self.bucket_seconds * self.size
+
+    def _bucket(self, ts):
+        return int(ts // self.bucket_seconds)
+
+    def _rotate(self):
+        """Avança o anel até agora, descontando os baldes que saíram da janela."""
+        idx = self._bucket(time.time())
+        if idx <= self.head:
+            return self.head
+        counts = self.counts
+        for j in range(self.head + 1, self.head + 1 + min(idx - self.head, self.size)):
+            slot = j % self.size
+            expired = self.buckets[slot]
+            if expired:
+                for name, n in expired.items():
+                    left = counts[name] - n
+                    if left:
+                        counts[name] = left
+                        heapq.heappush(self.heap, (-left, name))
+                    else:
+                        del counts[name]
+                self.buckets[slot] = None
+            self.total -= self.bucket_totals[slot]
+            self.bucket_totals[slot] = 0
+        self.head = idx
+        self._compact_heap()
+        return idx
+
+    def _compact_heap(self):
+        if len(self.heap) > 2 * len(self.counts) + 64:
+            self.heap = [(-n, name) for name, n in self.counts.items()]
+            heapq.heapify(self.heap)
+
+    def add(self, name, ts=None, n=1):
+        head = self._rotate()
+        idx = head if ts is None else min(self._bucket(ts), head)
+        if idx <= head - self.size:
+            return  # já fora da janela
+        slot = idx % self.size
+        bucket = self.buckets[slot]
+        if bucket is None:
+            bucket = self.buckets[slot] = {}
+        bucket[name] = bucket.get(name, 0) + n
+        self.bucket_totals[slot] += n
+        count = self.counts[name] = self.counts.get(name, 0) + n
+        self.total += n
+        heapq.heappush(self.heap, (-count, name))
+        self._compact_heap()
+
+    def _top(self, k):
+        """Os k maiores da janela inteira; devolve ao heap só as entradas ainda válidas."""
+        heap, counts = self.heap, self.counts
+        out = []
+        seen = set()
+        while heap and len(out) < k:
+            neg, name = heapq.heappop(heap)
+            if name in seen or counts.get(name) != -neg:
+                continue  # velha (a contagem mudou) ou repetida
+            seen.add(name)
+            out.append((name, -neg))
+        for name, count in out:
+            heapq.heappush(heap, (-count, name))
+        return out
+
+    def window(self, seconds=None):
+        """Janela realmente somada: `seconds` arredondado para cima em baldes inteiros,
+        entre um balde e a janela toda (None = janela toda)."""
+        if seconds is None:
+            return self.span
+        return max(1, min(self.size, -(-seconds // self.bucket_seconds))) * self.bucket_seconds
+
+    def _slots(self, n):
+        """Posições no anel dos últimos n baldes."""
+        return [j % self.size for j in range(self.head - n + 1, self.head + 1)]
+
+    def window_counts(self, window=None):
+        """{nome: contagem} nos últimos `window` segundos (None = janela inteira)."""
+        self._rotate()
+        n = self.window(window) // self.bucket_seconds
+        if n == self.size:
+            return dict(self.counts)
+        result = {}
+        for slot in self._slots(n):
+            for name, count in (self.buckets[slot] or {}).items():
+                result[name] = result.get(name, 0) + count
+        return result
+
+    def summary(self, window=None, k=None):
+        """(total, nomes distintos, top-k) na janela.
+
+        A janela inteira sai dos totais mantidos; uma menor só lê os baldes dela.
+        """
+        k = k or self.k
+        self._rotate()
+        n = self.window(window) // self.bucket_seconds
+        if n == self.size:
+            return self.total, len(self.counts), self._top(k)
+        counts = self.window_counts(window)
+        total = sum(self.bucket_totals[slot] for slot in self._slots(n))
+        return total, len(counts), heapq.nlargest(k, counts.items(), key=lambda item: item[1])
+
+    def clear(self):
+        self.buckets = [None] * self.size
+        self.bucket_totals = [0] * self.size
+        self.counts = {}
+        self.total = 0
+        self.heap = []
+
+    def to_dict(self):
+        return self.window_counts()
+
+    def snapshot(self):
+        """Só os baldes não vazios: {nome: [[balde absoluto, contagem], ...]}."""
+        head = self._rotate()
+        names = {}
+        for j in range(head - self.size + 1, head + 1):
+            for name, count in (self.buckets[j % self.size] or {}).items():
+                names.setdefault(name, []).append([j, count])
+        return {"bucket_seconds": self.bucket_seconds, "names": names}
+
+    def restore(self, data):
+        """Carrega um snapshot() (mesmo se o tamanho do balde mudou)."""
+        bucket_seconds = data.get("bucket_seconds", self.bucket_seconds)
+        for name, buckets in data.get("names", {}).items():
+            for idx, count in buckets:
+                self.add(name, ts=idx * bucket_seconds, n=count)
+
+    def load(self, mapping):
+        """Contagens sem data (cache.json antigo): entram no balde atual."""
+        for name, count in mapping.items():
+            self.add(name, n=int(count))
+
+    def __len__(self):
+        return len(self.counts)
+
+# ==============================
+# CONFIG - WEBHOOKS & BOT
+# ==============================
+# (Você pode substituir as variáveis abaixo por ENV vars)
+WEBHOOK_A1 = os.environ.get("WEBHOOK_A1", "https://discord.com/api/webhooks/1434974603599675546/")
+WEBHOOK_A2 = os.environ.get("WEBHOOK_A2", "https://discord.com/api/webhooks/1434974826539520090/")
+WEBHOOK_B  = os.environ.get("WEBHOOK_B", "https://discord.com/api/webhooks/1434974948476190730/")
+WEBHOOK_C  = os.environ.get("WEBHOOK_C", "https://discord.com/api/webhooks/1434975012837920768/")
+
+BOT_TOKEN = os.environ.get("BOT_TOKEN", "")  # <-- coloque seu token aqui ou via ENV
+STATS_CHANNEL_ID = int(os.environ.get("STATS_CHANNEL_ID", "1434686237184233523"))
+
+PLACE_ID = int(os.environ.get("PLACE_ID", str(GAME_ID)))
+CACHE_FILE = os.environ.get("CACHE_FILE", os.path.join(STATE_DIR, "cache.json"))
+# Cada detecção vai para o journal; o cache.json vira snapshot a cada JOURNAL_COMPACT_EVERY registros
+JOURNAL_FILE = os.environ.get("JOURNAL_FILE", CACHE_FILE + ".journal")
+JOURNAL_COMPACT_EVERY = int(os.environ.get("JOURNAL_COMPACT_EVERY", "5000"))
+
+SEND_INTERVAL_WEBHOOK = int(os.environ.get("SEND_INTERVAL_WEBHOOK", "30"))
+# Stats em janela deslizante: STATS_BUCKETS baldes de STATS_BUCKET_SECONDS (padrão 288 x 5 min = 24h)
+STATS_BUCKET_SECONDS = int(os.environ.get("STATS_BUCKET_SECONDS", "300"))
+STATS_BUCKETS = int(os.environ.get("STATS_BUCKETS", "288"))
+STATS_WINDOW = parse_window(os.environ.get("STATS_WINDOW", "24h"))  # janela do embed de stats
+
+# Estado do bot/webhook
+STATS_TOP_K = int(os.environ.get("STATS_TOP_K", "10"))  # nomes no ranking do embed de stats
+name_counter = RollingCounter(STATS_BUCKET_SECONDS, STATS_BUCKETS, STATS_TOP_K)
+last_reset = datetime.now()  # último !reset manual (não há mais reset automático)
+_state = {"use_first_webhook": True, "stats_message_id": None}
+STATE_LOCK = threading.RLock()  # protege name_counter, job_history, last_reset e _state
+
+MAX_HISTORY = int(os.environ.get("MAX_HISTORY", "10000"))
+HISTORY_PAGE_DEFAULT = int(os.environ.get("HISTORY_PAGE_DEFAULT", "50"))  # /jobs_history sem filtros
+HISTORY_PAGE_MAX = int(os.environ.get("HISTORY_PAGE_MAX", "1000"))
+job_history = HistoryStore(MAX_HISTORY)  # histórico de secrets (com secrets e timestamps)
+
+# Envio de webhooks em segundo plano (fila limitada por webhook)
+WEBHOOK_QUEUE_MAX = int(os.environ.get("WEBHOOK_QUEUE_MAX", "200"))
+WEBHOOK_MAX_RETRIES = int(os.environ.get("WEBHOOK_MAX_RETRIES", "5"))
+WEBHOOK_TIMEOUT = float(os.environ.get("WEBHOOK_TIMEOUT", "8"))
+# Agrupa detecções do mesmo webhook numa mensagem (até 10 embeds); tier C sai na hora
+WEBHOOK_BATCH_WINDOW_MS = int(os.environ.get("WEBHOOK_BATCH_WINDOW_MS", "1500"))
+WEBHOOK_IMMEDIATE_TIERS = {t.strip() for t in os.environ.get("WEBHOOK_IMMEDIATE_TIERS", "C").split(",") if t.strip()}
+# serverless: tempo máximo entregando webhooks dentro de uma requisição; o resto fica para a próxima
+WEBHOOK_DRAIN_BUDGET_S = float(os.environ.get("WEBHOOK_DRAIN_BUDGET_S", "2"))
+
+# Deduplicação de /api: mesma (job_id, name, generation) dentro de DEDUP_TTL segundos é ignorada
+DEDUP_TTL = float(os.environ.get("DEDUP_TTL", "300"))
+DEDUP_MAX_ENTRIES = int(os.environ.get("DEDUP_MAX_ENTRIES", "50000"))
+
+# /api/batch: até API_BATCH_MAX detecções por array JSON; NDJSON é processado em lotes desse tamanho
+API_BATCH_MAX = int(os.environ.get("API_BATCH_MAX", "500"))
+
+# Fila entre /api e o processamento (webhook, contagem, histórico, journal). Cheia, /api
+# responde 429; tiers baixos param de entrar antes: <1M a partir de INGEST_SHED_LOW da
+# capacidade, A1/A2 a partir de INGEST_SHED_A, B/C só com a fila cheia
+INGEST_QUEUE_MAX = max(1, int(os.environ.get("INGEST_QUEUE_MAX", "2000")))
+INGEST_SHED_LOW = float(os.environ.get("INGEST_SHED_LOW", "0.5"))
+INGEST_SHED_A = float(os.environ.get("INGEST_SHED_A", "0.8"))
+INGEST_RETRY_AFTER = int(os.environ.get("INGEST_RETRY_AFTER", "2"))  # segundos
+
+# ==============================
+# HELPERS WEBHOOK/BOT
+# ==============================
+def parse_generation(gen_str: str) -> float:
+    """Converte strings como $1.5M/s em número absoluto."""
+    if not gen_str:
+        return 0.0
+    s = str(gen_str).upper().replace("$", "").replace("/S", "").strip()
+    m = re.search(r"([\d\.]+)\s*([KMB]?)", s)
+    if not m:
+        nums = re.findall(r"[\d\.]+", s)
+        return float(nums[0]) if nums else 0.0
+    val, suf = m.groups()
+    try:
+        v = float(val)
+    except:
+        return 0.0
+    if suf == "K":
+        v *= 1_000
+    elif suf == "M":
+        v *= 1_000_000
+    elif suf == "B":
+        v *= 1_000_000_000
+    return v
+
+def make_joiner_url(place_id: int, job_id: str) -> str:
+    return f"https://chillihub1.github.io/chillihub-joiner/?placeId={place_id}&gameInstanceId={job_id}"
+
+def make_teleport_script(place_id: int, job_id: str) -> str:
+    return (
+        f"local TeleportService = game:GetService('TeleportService')\n"
+        f"local Players = game:GetService('Players')\n"
+        f"TeleportService:TeleportToPlaceInstance({place_id}, '{job_id}', Players.LocalPlayer)"
+    )
+
+def build_embed_payload(name, generation, rarity, job_id):
+    join_url = make_joiner_url(PLACE_ID, job_id)
+    teleport_script = make_teleport_script(PLACE_ID, job_id)
+    embed = {
+        "title": "Charizard Notifier",
+        "color": 16753920,
+        "fields": [
+            {"name": "Name", "value": f"```{name or 'Unknown'}```", "inline": True},
+            {"name": "Generation", "value": f"```{generation or '0'}```", "inline": True},
+            {"name": "Rarity", "value": f"```{rarity or 'Unknown'}```", "inline": True},
+            {"name": "JOB ID", "value": f"```{job_id}```", "inline": False},
+            {"name": "Join Link", "value": f"[**Entrar**]({join_url})", "inline": False},
+            {"name": "Teleport Script", "value": f"```lua\n{teleport_script}\n```", "inline": False},
+        ],
+        "footer": {"text": f"Detectado em {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"}
+    }
+    components = [
+        {"type": 1, "components":[{"type": 2,"style":5,"label":"Entrar","url":join_url}]}
+    ]
+    return {"embeds":[embed], "components":components}
+
+# ==============================
+# DISPATCHER DE WEBHOOKS
+# ==============================
+class RateLimitBucket:
+    """Rate limit de um webhook, lido dos headers X-RateLimit-* do Discord."""
+
+    def __init__(self):
+        self.remaining = None
+        self.reset_at = 0.0
+
+    def delay(self):
+        if self.remaining == 0:
+            return max(0.0, self.reset_at - time.monotonic())
+        return 0.0
+
+    def update(self, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        try:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset_after is not None:
+                self.reset_at = time.monotonic() + float(reset_after)
+        except ValueError:
+            pass
+
+    def block(self, seconds):
+        self.remaining = 0
+        self.reset_at = time.monotonic() + seconds
+
+# limites do Discord por mensagem
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_EMBED_CHARS = 6000
+DISCORD_MAX_ROWS = 5
+DISCORD_MAX_ROW_BUTTONS = 5
+
+def embed_chars(embed):
+    """Caracteres que contam para o limite de 6000 do Discord."""
+    total = len(embed.get("title", "")) + len(embed.get("description", ""))
+    total += len(embed.get("footer", {}).get("text", "")) + len(embed.get("author", {}).get("name", ""))
+    for field in embed.get("fields", []):
+        total += len(field.get("name", "")) + len(field.get("value", ""))
+    return total
+
+def merge_webhook_payloads(payloads):
+    """Junta payloads de build_embed_payload numa mensagem só (embeds + botões)."""
+    if len(payloads) == 1:
+        return payloads[0]
+    embeds = []
+    buttons = []
+    for i, payload in enumerate(payloads, 1):
+        embeds.extend(payload.get("embeds", []))
+        for row in payload.get("components", []):
+            for button in row.get("components", []):
+                button = dict(button)
+                button["label"] = f"{button.get('label', 'Entrar')} #{i}"[:80]
+                buttons.append(button)
+    buttons = buttons[:DISCORD_MAX_ROWS * DISCORD_MAX_ROW_BUTTONS]
+    rows = [
+        {"type": 1, "components": buttons[i:i + DISCORD_MAX_ROW_BUTTONS]}
+        for i in range(0, len(buttons), DISCORD_MAX_ROW_BUTTONS)
+    ]
+    return {"embeds": embeds[:DISCORD_MAX_EMBEDS], "components": rows}
+
+def _retry_after(text, headers):
+    """Segundos de espera de um 429 (corpo JSON retry_after ou header Retry-After)."""
+    try:
+        return float(json.loads(text).get("retry_after"))
+    except (ValueError, TypeError, AttributeError):
+        pass
+    try:
+        return float(headers.get("Retry-After", "1"))
+    except ValueError:
+        return 1.0
+
+def _sleep_until(seconds, deadline):
+    """Dorme `seconds`; False (sem dormir) se isso passaria do deadline."""
+    if deadline is not None and time.monotonic() + seconds >= deadline:
+        return False
+    if seconds > 0:
+        time.sleep(seconds)
+    return True
+
+class WebhookLane:
+    """Fila + worker (thread ou task) de um webhook; respeita o bucket do Discord e refaz envios com falha."""
+
+    def __init__(self, dispatcher, url, label):
+        self.dispatcher = dispatcher
+        self.url = url
+        self.label = label
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.bucket = RateLimitBucket()
+        self.window = 0.0 if label in WEBHOOK_IMMEDIATE_TIERS else WEBHOOK_BATCH_WINDOW_MS / 1000
+        self.messages = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rate_limited = 0
+        self.signal = start_worker(self._run, self._run_async)
+
+    def put(self, payload, desc):
+        with self.cond:
+            if len(self.queue) >= WEBHOOK_QUEUE_MAX:
+                self.queue.popleft()
+                self.dropped += 1
+                logging.warning(f"[WEBHOOK {self.label}] fila cheia — descartando o mais antigo.")
+            self.queue.append((payload, desc))
+            self.cond.notify()
+            if self.signal is not None:
+                self.signal.set()
+
+    def _take_batch(self):
+        """Tira até 10 detecções da fila sem passar do limite de caracteres dos embeds."""
+        batch = []
+        chars = embeds = 0
+        while self.queue:
+            payload, desc = self.queue[0]
+            size = sum(embed_chars(e) for e in payload.get("embeds", []))
+            count = len(payload.get("embeds", []))
+            if batch and (embeds + count > DISCORD_MAX_EMBEDS or chars + size > DISCORD_MAX_EMBED_CHARS):
+                break
+            self.queue.popleft()
+            batch.append((payload, desc))
+            chars += size
+            embeds += count
+        return batch
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+                # tiers com janela esperam mais detecções antes de mandar
+                deadline = time.monotonic() + self.window
+                while len(self.queue) < DISCORD_MAX_EMBEDS:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self.cond.wait(left)
+                batch = self._take_batch()
+            payload = merge_webhook_payloads([p for p, _ in batch])
+            self._deliver(payload, ", ".join(d for _, d in batch), len(batch))
+
+    async def _run_async(self, signal):
+        while True:
+            with self.cond:
+                size = len(self.queue)
+            if not size:
+                await signal.wait()
+                continue
+            deadline = time.monotonic() + self.window
+            while size < DISCORD_MAX_EMBEDS:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                await signal.wait(left)
+                with self.cond:
+                    size = len(self.queue)
+            with self.cond:
+                batch = self._take_batch()
+            payload = merge_webhook_payloads([p for p, _ in batch])
+            await self._deliver_async(payload, ", ".join(d for _, d in batch), len(batch))
+
+    def drain(self, deadline=None):
+        """Entrega a fila agora, na thread de quem chamou (serverless).
+
+        Com `deadline` (time.monotonic()) para antes de estourar o prazo e devolve o lote
+        pendente ao começo da fila; retorna False nesse caso.
+        """
+        while deadline is None or time.monotonic() < deadline:
+            with self.cond:
+                batch = self._take_batch()
+            if not batch:
+                return True
+            payload = merge_webhook_payloads([p for p, _ in batch])
+            if not self._deliver(payload, ", ".join(d for _, d in batch), len(batch), deadline):
+                with self.cond:
+                    self.queue.extendleft(reversed(batch))
+                return False
+        return False
+
+    def _outcome(self, status, headers, text, desc, count):
+        """Trata a resposta: "ok", "throttled" (429), "retry" (5xx) ou "drop"."""
+        self.bucket.update(headers)
+        if status == 429:
+            self.rate_limited += 1
+            retry_after = _retry_after(text, headers)
+            if headers.get("X-RateLimit-Global"):
+                self.dispatcher.block_global(retry_after)
+            else:
+                self.bucket.block(retry_after)
+            logging.warning(f"[WEBHOOK {self.label}] 429 — aguardando {retry_after:.2f}s")
+            return "throttled"
+        if 200 <= status < 400:
+            self.messages += 1
+            self.sent += count
+            logging.info(f"[OK] enviado webhook para {desc}")
+            return "ok"
+        logging.warning(f"[ERRO WEBHOOK] {status} {text[:200]}")
+        # < 500: payload/URL inválido, não adianta repetir
+        return "retry" if status >= 500 else "drop"
+
+    def _observe(self, started, outcome):
+        WEBHOOK_SECONDS.observe(time.perf_counter() - started, self.label)
+        WEBHOOK_RESULTS.inc(self.label, outcome)
+
+    def _deliver(self, payload, desc, count=1, deadline=None):
+        """Envia com retries; False = o prazo acabou antes de terminar (quem chamou re-enfileira)."""
+        failures = 0
+        throttled = 0
+        while failures <= WEBHOOK_MAX_RETRIES:
+            wait_for = max(self.bucket.delay(), self.dispatcher.global_delay())
+            if not _sleep_until(wait_for, deadline):
+                return False
+            timeout = WEBHOOK_TIMEOUT if deadline is None else min(WEBHOOK_TIMEOUT, deadline - time.monotonic())
+            started = time.perf_counter()
+            try:
+                r = self.dispatcher.session.post(self.url, json=payload, timeout=timeout)
+            except Exception as e:
+                self._observe(started, "error")
+                failures += 1
+                logging.warning(f"[ERRO WEBHOOK {self.label}] {e}")
+                if not _sleep_until(min(30, 2 ** failures), deadline):
+                    return False
+                continue
+            outcome = self._outcome(r.status_code, r.headers, r.text, desc, count)
+            self._observe(started, outcome)
+            if outcome == "ok":
+                return True
+            if outcome == "throttled":
+                # 429 não conta como falha, mas não pode girar para sempre
+                throttled += 1
+                if throttled > WEBHOOK_MAX_RETRIES * 2:
+                    break
+                continue
+            if outcome == "drop":
+                break
+            failures += 1
+            if not _sleep_until(min(30, 2 ** failures), deadline):
+                return False
+        self.failed += count
+        return True
+
+    async def _deliver_async(self, payload, desc, count=1):
+        import aiohttp
+        failures = 0
+        throttled = 0
+        while failures <= WEBHOOK_MAX_RETRIES:
+            wait_for = max(self.bucket.delay(), self.dispatcher.global_delay())
+            if wait_for > 0:
+                await asyncio.sleep(wait_for)
+            started = time.perf_counter()
+            try:
+                async with ASYNC_HTTP.post(
+                    self.url, json=payload, timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT)
+                ) as r:
+                    status, headers = r.status, r.headers
+                    text = await r.text(errors="replace")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self._observe(started, "error")
+                failures += 1
+                logging.warning(f"[ERRO WEBHOOK {self.label}] {e}")
+                await asyncio.sleep(min(30, 2 ** failures))
+                continue
+            outcome = self._outcome(status, headers, text, desc, count)
+            self._observe(started, outcome)
+            if outcome == "ok":
+                return
+            if outcome == "throttled":
+                throttled += 1
+                if throttled > WEBHOOK_MAX_RETRIES * 2:
+                    break
+                continue
+            if outcome == "drop":
+                break
+            failures += 1
+            await asyncio.sleep(min(30, 2 ** failures))
+        self.failed += count
+
+    def stats(self):
+        with self.cond:
+            queued = len(self.queue)
+        return {
+            "queued": queued,
+            "messages": self.messages,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+        }
+
+class WebhookDispatcher:
+    def __init__(self):
+        self.lanes = {}
+        self.lock = threading.Lock()
+        self.global_until = 0.0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def submit(self, url, label, payload, desc):
+        with self.lock:
+            lane = self.lanes.get(url)
+            if lane is None:
+                lane = self.lanes[url] = WebhookLane(self, url, label)
+        lane.put(payload, desc)
+
+    def drain(self, deadline=None):
+        """Esvazia as filas (serverless); retorna quantas detecções ficaram para depois."""
+        with self.lock:
+            lanes = list(self.lanes.values())
+        for lane in lanes:
+            lane.drain(deadline)
+        return sum(len(lane.queue) for lane in lanes)
+
+    def global_delay(self):
+        return max(0.0, self.global_until - time.monotonic())
+
+    def block_global(self, seconds):
+        self.global_until = max(self.global_until, time.monotonic() + seconds)
+
+    def stats(self):
+        with self.lock:
+            lanes = list(self.lanes.values())
+        return {lane.label: lane.stats() for lane in lanes}
+
+WEBHOOKS = WebhookDispatcher()
+
+# ==============================
+# DEDUP DE DETECÇÕES
 # ==============================
-# HELPERS WEBHOOK/BOT
-# ==============================
-def parse_generation(gen_str: str) -> float:
-    """Converte strings como $1.5M/s em número absoluto."""
-    if not gen_str:
-        return 0.0
-    s = str(gen_str).upper().replace("$", "").replace("/S", "").strip()
-    m = re.search(r"([\d\.]+)\s*([KMB]?)", s)
-    if not m:
-        nums = re.findall(r"[\d\.]+", s)
-        return float(nums[0]) if nums else 0.0
-    val, suf = m.groups()
-    try:
-        v = float(val)
-    except:
-        return 0.0
-    if suf == "K":
-        v *= 1_000
-    elif suf == "M":
-        v *= 1_000_000
-    elif suf == "B":
-        v *= 1_000_000_000
-    return v
+class TTLDedup:
+    """Lembra chaves por ttl segundos (LRU limitado a max_entries)."""
 
-def make_joiner_url(place_id: int, job_id: str) -> str:
-    return f"https://chillihub1.github.io/chillihub-joiner/?placeId={place_id}&gameInstanceId={job_id}"
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.entries = OrderedDict()  # chave -> expira em (ordem de inserção = ordem de expiração)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
 
-def make_teleport_script(place_id: int, job_id: str) -> str:
-    return (
-        f"local TeleportService = game:GetService('TeleportService')\n"
-        f"local Players = game:GetService('Players')\n"
-        f"TeleportService:TeleportToPlaceInstance({place_id}, '{job_id}', Players.LocalPlayer)"
-    )
+    def seen(self, key):
+        """True se a chave já apareceu dentro do TTL; senão registra e retorna False."""
+        now = time.monotonic()
+        with self.lock:
+            expires = self.entries.get(key)
+            if expires is not None and expires > now:
+                self.hits += 1
+                return True
+            self.misses += 1
+            self.entries.pop(key, None)
+            self.entries[key] = now + self.ttl
+            while self.entries:
+                oldest, expires = next(iter(self.entries.items()))
+                if expires > now and len(self.entries) <= self.max_entries:
+                    break
+                del self.entries[oldest]
+            return False
 
-def build_embed_payload(name, generation, rarity, job_id):
-    join_url = make_joiner_url(PLACE_ID, job_id)
-    teleport_script = make_teleport_script(PLACE_ID, job_id)
-    embed = {
-        "title": "Charizard Notifier",
-        "color": 16753920,
-        "fields": [
-            {"name": "Name", "value": f"```{name or 'Unknown'}```", "inline": True},
-            {"name": "Generation", "value": f"```{generation or '0'}```", "inline": True},
-            {"name": "Rarity", "value": f"```{rarity or 'Unknown'}```", "inline": True},
-            {"name": "JOB ID", "value": f"```{job_id}```", "inline": False},
-            {"name": "Join Link", "value": f"[**Entrar**]({join_url})", "inline": False},
-            {"name": "Teleport Script", "value": f"```lua\n{teleport_script}\n```", "inline": False},
-        ],
-        "footer": {"text": f"Detectado em {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"}
-    }
-    components = [
-        {"type": 1, "components":[{"type": 2,"style":5,"label":"Entrar","url":join_url}]}
-    ]
-    return {"embeds":[embed], "components":components}
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+DEDUP = TTLDedup(DEDUP_TTL, DEDUP_MAX_ENTRIES)
 
-def send_to_webhook(name, generation, rarity, job_id):
+def generation_tier(generation):
+    """Faixa da geração: "low" (<1M, sem webhook), "A" (A1/A2), "B" ou "C"."""
     gen_value = parse_generation(generation)
-    webhook_url = None
+    if gen_value > 100_000_000:
+        return "C"
+    if gen_value > 10_000_000:
+        return "B"
+    if gen_value > 1_000_000:
+        return "A"
+    return "low"
+
+def send_to_webhook(name, generation, rarity, job_id, save=True):
+    """Escolhe o webhook pela geração e enfileira; retorna o tier ou None se nada foi enviado.
+
+    save=False deixa o save_state() do revezamento A1/A2 para quem chama (lotes).
+    """
+    band = generation_tier(generation)
 
     global _state
-    if 1_000_000 < gen_value <= 10_000_000:
-        webhook_url = WEBHOOK_A1 if _state.get("use_first_webhook", True) else WEBHOOK_A2
-        _state["use_first_webhook"] = not _state.get("use_first_webhook", True)
-        save_state()
-    elif 10_000_000 < gen_value <= 100_000_000:
-        webhook_url = WEBHOOK_B
-    elif gen_value > 100_000_000:
-        webhook_url = WEBHOOK_C
+    if band == "A":
+        with STATE_LOCK:
+            first = _state.get("use_first_webhook", True)
+            _state["use_first_webhook"] = not first
+        webhook_url, tier = (WEBHOOK_A1, "A1") if first else (WEBHOOK_A2, "A2")
+        if save:
+            save_state()
+    elif band == "B":
+        webhook_url, tier = WEBHOOK_B, "B"
+    elif band == "C":
+        webhook_url, tier = WEBHOOK_C, "C"
     else:
         # menor que 1M, não envia
-        return
+        return None
 
     payload = build_embed_payload(name, generation, rarity, job_id)
-    try:
-        r = requests.post(webhook_url, json=payload, timeout=8)
-        if not r.ok:
-            logging.warning(f"[ERRO WEBHOOK] {r.status_code} {r.text}")
-        else:
-            logging.info(f"[OK] enviado webhook para {name} (gen {generation})")
-    except Exception as e:
-        logging.exception("[ERRO request.post]")
+    WEBHOOKS.submit(webhook_url, tier, payload, f"{name} (gen {generation})")
+    return tier
 
 # ==============================
 # CACHE (load/save)
 # ==============================
+def _entry_time(entry):
+    """Horário da detecção (timestamp do histórico) para reposicionar no balde certo."""
+    try:
+        return datetime.strptime(entry["timestamp"], '%Y-%m-%d %H:%M:%S').timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _apply_detection(entry, ts=None):
+    name_counter.add(entry["name"], ts)
+
+    # buffer circular: a mais antiga sai sozinha ao passar de MAX_HISTORY
+    job_history.add(entry)
+
+def _apply_record(record):
+    """Reaplica um registro do journal (mesmo efeito que teve ao vivo)."""
+    global last_reset
+    op = record.get("op")
+    if op == "det":
+        _apply_detection(record["entry"], _entry_time(record["entry"]))
+    elif op == "dets":
+        for entry in record["entries"]:
+            _apply_detection(entry, _entry_time(entry))
+    elif op == "state":
+        _state["use_first_webhook"] = record.get("use_first_webhook", True)
+        _state["stats_message_id"] = record.get("stats_message_id")
+    elif op == "reset":
+        name_counter.clear()
+        job_history.clear()
+        try:
+            last_reset = datetime.fromisoformat(record["at"])
+        except (KeyError, ValueError):
+            last_reset = datetime.now()
+
 def load_cache():
     global name_counter, last_reset, _state, job_history
+    snapshot_seq = 0
     if os.path.exists(CACHE_FILE):
         try:
             with open(CACHE_FILE, "r", encoding="utf-8") as f:
                 data = json.load(f)
-                name_counter.update(data.get("names", {}))
-                job_history.extend(data.get("job_history", []))
+                if "rolling" in data:
+                    name_counter.restore(data["rolling"])
+                else:
+                    name_counter.load(data.get("names", {}))
+                # snapshot guarda a mais nova primeiro
+                for entry in reversed(data.get("job_history", [])):
+                    job_history.add(entry)
                 if "last_reset" in data:
                     try:
                         last_reset = datetime.fromisoformat(data["last_reset"])
@@ -312,66 +3519,247 @@ def load_cache():
                     _state["use_first_webhook"] = data["use_first_webhook"]
                 if "stats_message_id" in data:
                     _state["stats_message_id"] = data["stats_message_id"]
-            logging.info(f"[CACHE] carregado {len(name_counter)} nomes, {len(job_history)} jobs")
+                snapshot_seq = data.get("journal_seq", 0)
         except Exception as e:
             logging.warning("[WARN] falha ao carregar cache: %s", e)
 
-def save_state():
+    # depois do snapshot, o que ficou no journal
     try:
+        records = JOURNAL.replay(snapshot_seq)
+    except Exception as e:
+        logging.warning("[WARN] falha ao ler journal: %s", e)
+        records = []
+    with STATE_LOCK:
+        for record in records:
+            _apply_record(record)
+    logging.info(f"[CACHE] carregado {len(name_counter)} nomes, {len(job_history)} jobs ({len(records)} do journal)")
+
+def _write_snapshot():
+    if JOURNAL.shared:
+        with JOURNAL.file_lock:
+            JOURNAL.sync_locked()
+            _write_snapshot_locked()
+    else:
+        _write_snapshot_locked()
+
+def _write_snapshot_locked():
+    with STATE_LOCK:
         to_save = {
-            "names": name_counter,
-            "job_history": job_history,
+            "names": name_counter.to_dict(),  # totais da janela (leitura simples)
+            "rolling": name_counter.snapshot(),
+            "job_history": job_history.to_list(),
             "last_reset": last_reset.isoformat(),
             "use_first_webhook": _state.get("use_first_webhook", True),
-            "stats_message_id": _state.get("stats_message_id")
+            "stats_message_id": _state.get("stats_message_id"),
+            "journal_seq": JOURNAL.cover_pending(),
         }
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(to_save, f, indent=2)
-    except Exception as e:
-        logging.warning("[WARN] falha ao salvar cache: %s", e)
+    atomic_write(CACHE_FILE, dumps_compact(to_save))
+    JOURNAL.compacted(to_save["journal_seq"])
+
+# o snapshot é registrado antes do journal: numa mesma rodada, compacta e depois anexa o resto
+PERSIST.register("cache", _write_snapshot)
+def _apply_remote(records):
+    """serverless: registros gravados por outras instâncias; None = recarregar do snapshot."""
+    if records is not None:
+        with STATE_LOCK:
+            for record in records:
+                _apply_record(record)
+        return
+    with STATE_LOCK:
+        name_counter.clear()
+        job_history.clear()
+    load_cache()
+    # o que esta instância ainda não gravou já estava na memória: volta para ela
+    with STATE_LOCK, JOURNAL.lock:
+        for _, record in JOURNAL.buffer:
+            _apply_record(record)
+
+JOURNAL = Journal(JOURNAL_FILE, PERSIST, "journal", "cache", JOURNAL_COMPACT_EVERY,
+                  shared=SERVERLESS, on_remote=_apply_remote)
+
+def record_detection(entry):
+    """Conta e guarda uma detecção; no disco só vai uma linha no journal."""
+    with STATE_LOCK:
+        _apply_detection(entry)
+        JOURNAL.append({"op": "det", "entry": entry})
+
+def record_detections(entries):
+    """Lote de detecções: um lock, uma linha no journal."""
+    if not entries:
+        return
+    with STATE_LOCK:
+        for entry in entries:
+            _apply_detection(entry)
+        JOURNAL.append({"op": "dets", "entries": entries})
+
+def save_state():
+    """Registra use_first_webhook/stats_message_id no journal (gravado em segundo plano)."""
+    with STATE_LOCK:
+        JOURNAL.append({
+            "op": "state",
+            "use_first_webhook": _state.get("use_first_webhook", True),
+            "stats_message_id": _state.get("stats_message_id"),
+        })
 
 def reset_cache():
     global name_counter, last_reset, job_history
-    name_counter.clear()
-    job_history.clear()
-    last_reset = datetime.now()
-    save_state()
+    with STATE_LOCK:
+        name_counter.clear()
+        job_history.clear()
+        last_reset = datetime.now()
+        JOURNAL.append({"op": "reset", "at": last_reset.isoformat()})
+    # snapshot novo (pequeno) e journal zerado
+    PERSIST.mark_dirty("cache")
     logging.info("[CACHE] resetado")
 
+# ==============================
+# FILA DE INGESTÃO (/api)
+# ==============================
+def process_detections(entries):
+    """Webhook por detecção; contagem, histórico, journal e revezamento A1/A2 uma vez por lote."""
+    rotated = False
+    for entry in entries:
+        tier = send_to_webhook(entry["name"], entry["generation"], entry["rarity"], entry["jobId"], save=False)
+        rotated = rotated or tier in ("A1", "A2")
+    # contar + histórico (journal gravado em segundo plano)
+    if len(entries) == 1:
+        record_detection(entries[0])
+    else:
+        record_detections(entries)
+    if rotated:
+        save_state()
+    for entry in entries:
+        FEED.publish("detection", entry)
+
+class IngestQueue:
+    """Fila limitada entre /api e process_detections, esvaziada em lotes de até batch_size.
+
+    offer() decide na entrada: cada faixa tem seu teto de profundidade (limits), então
+    com a fila enchendo os tiers baixos recebem 429 antes de B/C. Quem entrou é processado.
+    """
+
+    def __init__(self, process, max_depth, limits, batch_size, dedup):
+        self.process = process
+        self.max_depth = max_depth
+        self.limits = {band: max(1, int(max_depth * share)) for band, share in limits.items()}
+        self.batch_size = max(1, batch_size)
+        self.dedup = dedup
+        self.items = deque()
+        self.cond = threading.Condition()
+        self.started = False
+        self.signal = None
+        self.high_water = 0
+        self.processed = 0
+        self.batches = 0
+        self.errors = 0
+        self.shed = {band: 0 for band in limits}
+
+    def offer(self, entry, band, key):
+        """"queued", "duplicate" ou "shed" (sem espaço para a faixa)."""
+        with self.cond:
+            if len(self.items) >= self.limits.get(band, self.max_depth):
+                self.shed[band] = self.shed.get(band, 0) + 1
+                return "shed"
+            # dedup só depois de admitir: um item recusado pode voltar no retry
+            if self.dedup.seen(key):
+                return "duplicate"
+            if not self.started:
+                self.started = True
+                self.signal = start_worker(self._run, self._run_async)
+            self.items.append(entry)
+            self.high_water = max(self.high_water, len(self.items))
+            self.cond.notify()
+            if self.signal is not None:
+                self.signal.set()
+            return "queued"
+
+    def _take(self):
+        n = min(self.batch_size, len(self.items))
+        return [self.items.popleft() for _ in range(n)]
+
+    def _process(self, batch):
+        try:
+            self.process(batch)
+        except Exception:
+            self.errors += len(batch)
+            logging.exception(f"[INGEST] Falha ao processar lote de {len(batch)}")
+        with self.cond:
+            self.processed += len(batch)
+            self.batches += 1
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.items:
+                    self.cond.wait()
+                batch = self._take()
+            self._process(batch)
+
+    async def _run_async(self, signal):
+        while True:
+            with self.cond:
+                batch = self._take()
+            if not batch:
+                await signal.wait()
+                continue
+            await run_blocking(self._process, batch)
+
+    def drain(self):
+        """Processa o que estiver na fila na thread de quem chamou (serverless)."""
+        while True:
+            with self.cond:
+                batch = self._take()
+            if not batch:
+                return
+            self._process(batch)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "depth": len(self.items),
+                "max_depth": self.max_depth,
+                "limits": dict(self.limits),
+                "high_water": self.high_water,
+                "processed": self.processed,
+                "batches": self.batches,
+                "errors": self.errors,
+                "shed": dict(self.shed),
+            }
+
+INGEST = IngestQueue(
+    process_detections,
+    INGEST_QUEUE_MAX,
+    {"low": INGEST_SHED_LOW, "A": INGEST_SHED_A, "B": 1.0, "C": 1.0},
+    API_BATCH_MAX,
+    DEDUP,
+)
+
 # ==============================
 # BOT DISCORD
 # ==============================
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = None  # criado por build_bot(): discord.py só é importado quando o bot vai rodar
 
-def build_stats_embed():
-    """Cria embed com estatísticas dos secrets encontrados."""
-    if not name_counter:
-        embed = discord.Embed(
-            title="📊 Estatísticas de Secrets",
-            description="Nenhum secret encontrado ainda neste período.",
-            color=discord.Color.blue()
-        )
-        return embed
-    
-    sorted_secrets = sorted(name_counter.items(), key=lambda x: x[1], reverse=True)
-    total = sum(name_counter.values())
-    
-    embed = discord.Embed(
-        title="📊 Estatísticas de Secrets - Últimas 24h",
-        description=f"**Total de secrets encontrados:** `{total}`\n**Jobs únicos rastreados:** `{len(job_history)}`",
-        color=discord.Color.gold(),
-        timestamp=datetime.now()
-    )
-    
-    top_10 = sorted_secrets[:10]
-    if top_10:
-        field_value = "\n".join([f"`{i+1}.` **{name}** - `{count}x`" for i, (name, count) in enumerate(top_10)])
-        embed.add_field(name="🏆 Top 10 Secrets Mais Encontrados", value=field_value, inline=False)
-    
-    if job_history:
-        recent_jobs = job_history[:5]
+def stats_content(window=None):
+    """Conteúdo do embed de stats como dados simples (sem o timestamp), para comparar entre envios."""
+    window = name_counter.window(window or STATS_WINDOW)
+    with STATE_LOCK:
+        total, unique, top = name_counter.summary(window, STATS_TOP_K)
+        if not total:
+            return {
+                "title": "📊 Estatísticas de Secrets",
+                "description": "Nenhum secret encontrado ainda neste período.",
+                "color": "blue",
+                "fields": [],
+            }
+        history_size = len(job_history)
+        recent_jobs = job_history.recent(5)
+
+    fields = []
+    if top:
+        field_value = "\n".join([f"`{i+1}.` **{name}** - `{count}x`" for i, (name, count) in enumerate(top)])
+        fields.append((f"🏆 Top {STATS_TOP_K} Secrets Mais Encontrados", field_value, False))
+
+    if recent_jobs:
         jobs_text = []
         for job in recent_jobs:
             # job['timestamp'] expected format '%Y-%m-%d %H:%M:%S'
@@ -380,153 +3768,337 @@ def build_stats_embed():
                 jobs_text.append(f"**{job['name']}** `{job['generation']}` - <t:{ts}:R>")
             except Exception:
                 jobs_text.append(f"**{job['name']}** `{job['generation']}` - {job.get('timestamp')}")
-        embed.add_field(name="🕐 Últimos 5 Encontrados", value="\n".join(jobs_text), inline=False)
-    
-    embed.add_field(name="📈 Tipos Únicos", value=f"`{len(name_counter)}`", inline=True)
-    embed.add_field(name="🔄 Próximo Reset", value=f"<t:{int((last_reset + timedelta(seconds=RESET_INTERVAL)).timestamp())}:R>", inline=True)
-    embed.set_footer(text="Acesse /jobs para ver job ids coletados • Atualizado")
+        fields.append(("🕐 Últimos 5 Encontrados", "\n".join(jobs_text), False))
+
+    fields.append(("📈 Tipos Únicos", f"`{unique}`", True))
+    fields.append(("⏱️ Janela", f"`{format_window(window)}` (baldes de {STATS_BUCKET_SECONDS // 60} min)", True))
+    return {
+        "title": f"📊 Estatísticas de Secrets - Últimas {format_window(window)}",
+        "description": f"**Total de secrets encontrados:** `{total}`\n**Jobs únicos rastreados:** `{history_size}`",
+        "color": "gold",
+        "fields": fields,
+        "footer": "Acesse /jobs para ver job ids coletados • Atualizado",
+    }
+
+def build_stats_embed(content=None):
+    """Cria embed com estatísticas dos secrets encontrados."""
+    import discord
+
+    content = content or stats_content()
+    embed = discord.Embed(
+        title=content["title"],
+        description=content["description"],
+        color=getattr(discord.Color, content["color"])(),
+        timestamp=datetime.now() if content["fields"] else None,
+    )
+    for name, value, inline in content["fields"]:
+        embed.add_field(name=name, value=value, inline=inline)
+    if "footer" in content:
+        embed.set_footer(text=content["footer"])
     return embed
 
-@bot.event
-async def on_ready():
-    logging.info(f"[BOT] Conectado como {bot.user}")
-    # Tenta enviar/editar a mensagem inicial de stats no canal (se existir)
-    try:
-        channel = bot.get_channel(STATS_CHANNEL_ID)
-        if channel:
-            embed = build_stats_embed()
-            try:
-                msg = await channel.send(embed=embed)
-                _state["stats_message_id"] = msg.id
-                save_state()
-                logging.info(f"[BOT] Mensagem de stats criada (ID: {msg.id})")
-            except Exception as e:
-                logging.warning(f"[BOT] Não foi possível enviar mensagem inicial de stats: {e}")
-        else:
-            logging.warning(f"[BOT] Canal {STATS_CHANNEL_ID} não encontrado.")
-    except Exception as e:
-        logging.warning(f"[BOT] Erro ao checar canal: {e}")
-
-    # inicia task loop se não rodando
-    if not send_stats.is_running():
-        send_stats.start()
-
-@bot.command(name="stats")
-async def manual_stats(ctx):
-    embed = build_stats_embed()
-    await ctx.send(embed=embed)
-
-@bot.command(name="reset")
-@commands.has_permissions(administrator=True)
-async def manual_reset(ctx):
-    reset_cache()
-    await ctx.send("✅ Estatísticas resetadas com sucesso!")
-
-@tasks.loop(minutes=5)
-async def send_stats():
-    """Atualiza estatísticas a cada 5 minutos."""
-    try:
-        channel = bot.get_channel(STATS_CHANNEL_ID)
-        if not channel:
-            logging.warning(f"[ERRO BOT] Canal {STATS_CHANNEL_ID} não encontrado!")
+def build_bot():
+    """Importa discord.py e monta o bot com eventos, comandos e o loop de stats."""
+    import discord
+    from discord.ext import commands, tasks
+
+    intents = discord.Intents.default()
+    intents.message_content = True
+    bot = commands.Bot(command_prefix="!", intents=intents)
+    # mensagem de stats atual (PartialMessage: edita sem fetch) e hash do último conteúdo enviado
+    stats_msg = {"partial": None, "digest": None}
+
+    async def publish_stats(channel, force=False):
+        """Edita a mensagem de stats só se o conteúdo mudou; cria uma nova se ela sumiu."""
+        content = await run_blocking(stats_content)
+        digest = hash(json.dumps(content, sort_keys=True, ensure_ascii=False))
+        if digest == stats_msg["digest"] and not force:
+            logging.info("[BOT] Estatísticas sem mudança — edição pulada")
             return
-        
-        embed = build_stats_embed()
+        embed = build_stats_embed(content)
         message_id = _state.get("stats_message_id")
         if message_id:
+            partial = stats_msg["partial"]
+            if partial is None or partial.id != message_id:
+                partial = stats_msg["partial"] = channel.get_partial_message(message_id)
             try:
-                message = await channel.fetch_message(message_id)
-                await message.edit(embed=embed)
+                await partial.edit(embed=embed)
+                stats_msg["digest"] = digest
                 logging.info("[BOT] ✓ Estatísticas atualizadas (editadas)")
                 return
             except discord.NotFound:
                 logging.info("[BOT] Mensagem antiga não encontrada, criando nova...")
             except Exception as e:
                 logging.warning(f"[ERRO BOT] Falha ao editar: {e}")
-        
+
         msg = await channel.send(embed=embed)
+        stats_msg["partial"] = channel.get_partial_message(msg.id)
+        stats_msg["digest"] = digest
         _state["stats_message_id"] = msg.id
-        save_state()
+        await run_blocking(save_state)
         logging.info(f"[BOT] ✓ Nova mensagem de estatísticas criada (ID: {msg.id})")
-    except Exception as e:
-        logging.exception("[ERRO BOT] Falha ao enviar stats")
 
-@send_stats.before_loop
-async def before_send_stats():
-    await bot.wait_until_ready()
-    logging.info("[BOT] Loop de estatísticas pronto para iniciar")
+    @bot.event
+    async def on_ready():
+        logging.info(f"[BOT] Conectado como {bot.user}")
+        # Reaproveita a mensagem de stats salva (ou cria uma) no canal, se existir
+        try:
+            channel = bot.get_channel(STATS_CHANNEL_ID)
+            if channel:
+                try:
+                    await publish_stats(channel, force=True)
+                except Exception as e:
+                    logging.warning(f"[BOT] Não foi possível enviar mensagem inicial de stats: {e}")
+            else:
+                logging.warning(f"[BOT] Canal {STATS_CHANNEL_ID} não encontrado.")
+        except Exception as e:
+            logging.warning(f"[BOT] Erro ao checar canal: {e}")
+
+        # inicia task loop se não rodando
+        if not send_stats.is_running():
+            send_stats.start()
+
+    @bot.command(name="stats")
+    async def manual_stats(ctx, window: str = None):
+        # !stats 1h / 6h / 24h (padrão STATS_WINDOW)
+        try:
+            seconds = name_counter.window(parse_window(window)) if window else None
+        except (ValueError, OverflowError):
+            await ctx.send("Janela inválida — use por exemplo `1h`, `6h` ou `24h`.")
+            return
+        embed = build_stats_embed(await run_blocking(stats_content, seconds))
+        await ctx.send(embed=embed)
+
+    @bot.command(name="reset")
+    @commands.has_permissions(administrator=True)
+    async def manual_reset(ctx):
+        await run_blocking(reset_cache)
+        await ctx.send("✅ Estatísticas resetadas com sucesso!")
+
+    @tasks.loop(minutes=5)
+    async def send_stats():
+        """Atualiza estatísticas a cada 5 minutos."""
+        try:
+            channel = bot.get_channel(STATS_CHANNEL_ID)
+            if not channel:
+                logging.warning(f"[ERRO BOT] Canal {STATS_CHANNEL_ID} não encontrado!")
+                return
+            await publish_stats(channel)
+        except Exception as e:
+            logging.exception("[ERRO BOT] Falha ao enviar stats")
+
+    @send_stats.before_loop
+    async def before_send_stats():
+        await bot.wait_until_ready()
+        logging.info("[BOT] Loop de estatísticas pronto para iniciar")
+
+    return bot
 
 # ==============================
 # ENDPOINTS FLASK
 # ==============================
+_cache_loaded = False
+_cache_load_lock = threading.Lock()
+
+def ensure_cache_loaded():
+    """load_cache() uma vez por processo (serverless: na primeira requisição, não no import)."""
+    global _cache_loaded
+    with _cache_load_lock:
+        if not _cache_loaded:
+            with JOURNAL.file_lock:  # snapshot e journal lidos sem compactação no meio
+                load_cache()
+            _cache_loaded = True
+
+@app.before_request
+def metrics_request_started():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def metrics_request_finished(resp):
+    started = g.pop("request_started", None)
+    if started is not None:
+        HTTP_SECONDS.observe(time.perf_counter() - started, request.endpoint or "none", resp.status_code)
+    return resp
+
+if SERVERLESS:
+    # cada invocação parte do snapshot em disco e grava/entrega tudo antes de responder
+    @app.before_request
+    def serverless_before():
+        if request.endpoint not in ("jobs", "jobids", "jobs_place", "metrics"):
+            ensure_cache_loaded()
+            JOURNAL.sync()  # o que as outras instâncias gravaram desde a última requisição
+        for place in PLACES.values():
+            place.load_saved(follow=True)
+
+    @app.after_request
+    def serverless_after(resp):
+        INGEST.drain()
+        left = WEBHOOKS.drain(time.monotonic() + WEBHOOK_DRAIN_BUDGET_S)
+        if left:
+            # ficam só na memória desta instância: se ela for reciclada, somem
+            logging.warning(f"[WEBHOOK] {left} detecções ficaram na fila para a próxima requisição.")
+        PERSIST.flush()
+        return resp
+
 @app.route("/", methods=["GET"])
 def home():
     return jsonify({
         "status": "combined API running",
+        "runtime": RUNTIME,
+        "import_ms": round(IMPORT_MS, 1),
         "proxy_count": len(PROXIES),
+        "proxies": PROXY_POOL.snapshot(),
         "game_id": GAME_ID,
         "target_api": MAIN_API_URL,
+        "push_mode": PUSH_MODE,
+        "push_outbox": sum(p.pusher.pending() for p in PLACES.values()),
+        "places": {place_id: place.stats() for place_id, place in PLACES.items()},
         "send_min_servers": SEND_MIN_SERVERS,
         "max_pages_per_cycle": MAX_PAGES_PER_CYCLE,
         "min_players": MIN_PLAYERS,
-        "max_players": MAX_PLAYERS
+        "max_players": MAX_PLAYERS,
+        "webhooks": WEBHOOKS.stats(),
+        "dedup": DEDUP.stats(),
+        "ingest": INGEST.stats(),
+        "feed": FEED_SERVER.stats() if FEED_SERVER else None,
+        "feed_main_port": FEED_STREAMS.stats() if FEED_STREAMS else None,
     })
 
 @app.route("/jobids", methods=["GET"])
 def jobids():
-    return jsonify({
-        "count": len(LAST_JOBIDS),
-        "servers": LAST_JOBIDS
-    })
+    return pool_response(POOL_VIEW)
 
 # -------------------------
-# MODIFIED: /jobs agora expõe os job ids coletados (LAST_JOBIDS)
+# MODIFIED: /jobs agora expõe os job ids coletados (place padrão)
 # -------------------------
 @app.route("/jobs", methods=["GET"])
 def jobs():
-    global LAST_JOBIDS
-
-    # Se nada foi coletado ainda, tenta ler o pool.json
-    if not LAST_JOBIDS and os.path.exists(POOL_FILE):
-        try:
-            with open(POOL_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                LAST_JOBIDS = data.get("servers", [])
-        except:
-            pass
+    # Se nada foi coletado ainda, tenta ler o pool salvo (uma vez só)
+    DEFAULT_PLACE.load_saved()
+    if "order" in request.args:
+        return ranked_response(DEFAULT_PLACE)
+    return pool_response(POOL_VIEW)
 
-    return jsonify({
-        "count": len(LAST_JOBIDS),
-        "servers": LAST_JOBIDS
-    })
+# Pool de cada place monitorado (PLACE_IDS)
+@app.route("/jobs/<place_id>", methods=["GET"])
+def jobs_place(place_id):
+    place = PLACES.get(place_id)
+    if place is None:
+        return jsonify({"error": "place não monitorado", "places": PLACE_IDS}), 404
+    place.load_saved()
+    if "order" in request.args:
+        return ranked_response(place)
+    return pool_response(place.view)
 
 # Para compatibilidade: manter endpoint que retorna job_history em /jobs_history
 @app.route("/jobs_history", methods=["GET"])
 def jobs_history():
-    """Retorna histórico de secrets detectados (job_history)."""
-    return jsonify(job_history)
+    """Retorna histórico de secrets detectados (job_history).
 
-# Endpoint que o webhook original usava para receber secrets
-@app.route("/api", methods=["POST"])
-def receive_api():
+    Sem parâmetros: lista com as HISTORY_PAGE_DEFAULT mais novas (formato antigo).
+    Com name/rarity/jobId/min_gen/max_gen/sort/limit/cursor: página filtrada.
+    """
+    args = request.args
+    if not args:
+        with STATE_LOCK:
+            return jsonify(job_history.recent(HISTORY_PAGE_DEFAULT))
+
+    sort = args.get("sort", "newest")
+    if sort not in ("newest", "oldest", "generation", "-generation"):
+        return jsonify({"error": "sort inválido (newest, oldest, generation, -generation)"}), 400
     try:
-        data = request.json or {}
+        limit = min(int(args.get("limit", HISTORY_PAGE_DEFAULT)), HISTORY_PAGE_MAX)
+        cursor = int(args["cursor"]) if "cursor" in args else None
+    except ValueError:
+        return jsonify({"error": "limit/cursor devem ser inteiros"}), 400
+    min_gen = parse_generation(args["min_gen"]) if "min_gen" in args else None
+    max_gen = parse_generation(args["max_gen"]) if "max_gen" in args else None
+
+    with STATE_LOCK:
+        items, next_cursor = job_history.query(
+            name=args.get("name"),
+            rarity=args.get("rarity"),
+            job_id=args.get("jobId") or args.get("job_id"),
+            min_gen=min_gen,
+            max_gen=max_gen,
+            sort=sort,
+            limit=limit,
+            cursor=cursor,
+        )
+        total = len(job_history)
+    return jsonify({"count": len(items), "total": total, "items": items, "next_cursor": next_cursor})
+
+# Contagens em janela deslizante: /stats?window=1h|6h|24h&top=N
+@app.route("/stats", methods=["GET"])
+def stats_api():
+    try:
+        window = name_counter.window(parse_window(request.args.get("window", "24h")))
+        top_n = max(1, min(int(request.args.get("top", STATS_TOP_K)), 100))
+    except (ValueError, OverflowError):
+        return jsonify({"error": "window (ex.: 1h, 6h, 24h) ou top inválido"}), 400
+    with STATE_LOCK:
+        total, unique, top = name_counter.summary(window, top_n)
+    return jsonify({
+        "window": format_window(window),
+        "window_seconds": window,
+        "bucket_seconds": STATS_BUCKET_SECONDS,
+        "total": total,
+        "unique": unique,
+        "top": [{"name": name, "count": count} for name, count in top],
+    })
+
+# Alternativa sem conexão aberta: eventos desde um id (mesmo cursor do SSE)
+@app.route("/events", methods=["GET"])
+def events_poll():
+    kinds = set(request.args["types"].split(",")) if "types" in request.args else None
+    if FEED_STREAMS is not None and "text/event-stream" in request.headers.get("Accept", ""):
+        try:
+            last_id = int(request.headers.get("Last-Event-ID") or request.args.get("since", "-1"))
+        except ValueError:
+            last_id = -1
+        body = FEED_STREAMS.stream(kinds, last_id)
+        if body is None:
+            # quem precisa de muitos clientes usa o FeedServer
+            return jsonify({"error": "muitos clientes", "feed_port": FEED_SERVER.port if FEED_SERVER else None}), 503
+        return Response(body, mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*",
+        })
+    try:
+        since = int(request.args.get("since", "0"))
+    except ValueError:
+        return jsonify({"error": "since deve ser inteiro"}), 400
+    if since < 0:
+        # como no SSE: -1 = só o que vier daqui em diante, sem replay
+        return jsonify({"last_id": FEED.last_id, "resync": False, "events": []})
+    backlog = FEED.since(since)
+    if backlog is None:
+        return jsonify({"last_id": FEED.last_id, "resync": True, "events": []})
+    events = [
+        {"id": event_id, "type": kind, "data": data}
+        for event_id, kind, data, _ in backlog
+        if kinds is None or kind in kinds
+    ]
+    return jsonify({"last_id": FEED.last_id, "resync": False, "events": events})
+
+def ingest_detections(items):
+    """Valida detecções e coloca na fila de ingestão; devolve [(resposta, status)] por item."""
+    results = []
+    for data in items:
+        if not isinstance(data, dict):
+            results.append(({"error": "Item deve ser um objeto"}, 400))
+            continue
         name = data.get("Name") or data.get("name")
         generation = data.get("Generation") or data.get("generation")
         job_id = data.get("JobId") or data.get("jobId") or data.get("job_id")
         rarity = data.get("Rarity") or data.get("rarity") or "Unknown"
 
         if not all([name, generation, job_id]):
-            return jsonify({"error":"Campos faltando"}),400
-
-        # envia ao webhook apropriado
-        send_to_webhook(name, generation, rarity, job_id)
+            results.append(({"error": "Campos faltando"}, 400))
+            continue
 
-        # contar
-        name_counter[name] = name_counter.get(name,0)+1
-        
-        # Adicionar ao histórico de jobs
-        job_entry = {
+        # Adicionar ao histórico de jobs (webhook, contagem e journal saem da fila)
+        entry = {
             "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             "name": name,
             "generation": generation,
@@ -534,33 +4106,133 @@ def receive_api():
             "placeId": str(PLACE_ID),
             "jobId": job_id
         }
-        
-        # Adiciona no início da lista
-        job_history.insert(0, job_entry)
-        
-        # Mantém apenas os últimos MAX_HISTORY
-        if len(job_history) > MAX_HISTORY:
-            job_history.pop()
-        
-        save_state()
-        return jsonify({"status":"OK"}),200
+        band = generation_tier(generation)
+        # vários clientes reportam o mesmo secret no mesmo server: responde sem reprocessar
+        outcome = INGEST.offer(entry, band, (str(job_id), str(name), str(generation)))
+        if outcome == "shed":
+            results.append(({"error": "Fila cheia, tente de novo", "retry_after": INGEST_RETRY_AFTER}, 429))
+        elif outcome == "duplicate":
+            results.append(({"status": "OK", "duplicate": True}, 200))
+        else:
+            results.append(({"status": "OK"}, 200 if band == "low" else 202))
+    return results
+
+# Endpoint que o webhook original usava para receber secrets
+@app.route("/api", methods=["POST"])
+def receive_api():
+    try:
+        data = request.json or {}
+        (body, status), = ingest_detections([data])
+        resp = jsonify(body)
+        if status == 429:
+            resp.headers["Retry-After"] = str(INGEST_RETRY_AFTER)
+        return resp, status
     except Exception as e:
         logging.exception("[ERRO API]")
         return jsonify({"error":str(e)}),500
 
-# ==============================
-# RESET LOOP (24h ou RESET_INTERVAL)
-# ==============================
-def reset_loop():
-    global last_reset
-    while True:
-        time.sleep(60)
+def _batch_result(index, body, status):
+    return {"index": index, "code": status, **body}  # code = o status HTTP que /api daria
+
+# Vários secrets por requisição: array JSON (resposta única) ou NDJSON (uma linha de
+# resultado por linha recebida, em lotes de API_BATCH_MAX)
+@app.route("/api/batch", methods=["POST"])
+def receive_api_batch():
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        return Response(stream_with_context(_ndjson_batches(request.stream)), mimetype="application/x-ndjson")
+    try:
+        items = request.get_json(force=True, silent=True)
+        if not isinstance(items, list):
+            return jsonify({"error": "Envie um array JSON (ou NDJSON com Content-Type: application/x-ndjson)"}), 400
+        if len(items) > API_BATCH_MAX:
+            return jsonify({"error": f"Máximo de {API_BATCH_MAX} itens por lote"}), 413
+        results = ingest_detections(items)
+        shed = sum(1 for _, status in results if status == 429)
+        resp = jsonify({
+            "count": len(items),
+            "accepted": sum(1 for body, status in results if status in (200, 202) and not body.get("duplicate")),
+            "shed": shed,
+            "results": [_batch_result(i, body, status) for i, (body, status) in enumerate(results)],
+        })
+        if shed:
+            resp.headers["Retry-After"] = str(INGEST_RETRY_AFTER)
+        return resp
+    except Exception as e:
+        logging.exception("[ERRO API BATCH]")
+        return jsonify({"error":str(e)}),500
+
+def _ndjson_batches(stream):
+    index = 0
+    done = False
+    while not done:
+        items, bad = [], {}
+        while len(items) + len(bad) < API_BATCH_MAX:
+            line = stream.readline()
+            if not line:
+                done = True
+                break
+            if not line.strip():
+                continue
+            try:
+                items.append((index, json.loads(line)))
+            except ValueError:
+                bad[index] = True
+            index += 1
+        if not items and not bad:
+            break
         try:
-            if (datetime.now() - last_reset).total_seconds() >= RESET_INTERVAL:
-                reset_cache()
-                last_reset = datetime.now()
+            results = ingest_detections([data for _, data in items])
         except Exception as e:
-            logging.warning("[RESET LOOP] %s", e)
+            logging.exception("[ERRO API BATCH]")
+            results = [({"error": str(e)}, 500)] * len(items)
+        out = [_batch_result(i, body, status) for (i, _), (body, status) in zip(items, results)]
+        out += [_batch_result(i, {"error": "JSON inválido"}, 400) for i in bad]
+        out.sort(key=lambda r: r["index"])
+        if SERVERLESS:
+            # o after_request já rodou quando a resposta começou a sair
+            INGEST.drain()
+            WEBHOOKS.drain(time.monotonic() + WEBHOOK_DRAIN_BUDGET_S)
+            PERSIST.flush()
+        yield b"".join(dumps_compact(r) + b"\n" for r in out)
+
+# Filas e pools lidos na hora do scrape
+CallbackMetric("mini_ingest_queue_depth", "Detecções esperando na fila de ingestão", (),
+               lambda: {(): INGEST.stats()["depth"]})
+CallbackMetric("mini_ingest_shed_total", "Detecções recusadas com 429 por faixa", ("band",),
+               lambda: {(band,): n for band, n in INGEST.stats()["shed"].items()}, kind="counter")
+CallbackMetric("mini_pool_servers", "Job ids publicados em /jobs por place", ("place",),
+               lambda: {(place_id,): len(place.view.ids) for place_id, place in PLACES.items()})
+CallbackMetric("mini_push_outbox", "Envios ao MAIN pendentes por place", ("place",),
+               lambda: {(place_id,): place.pusher.pending() for place_id, place in PLACES.items()})
+CallbackMetric("mini_webhook_queued", "Embeds esperando envio por tier", ("tier",),
+               lambda: {(tier,): lane["queued"] for tier, lane in WEBHOOKS.stats().items()})
+
+# Formato texto do Prometheus
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Serverless: um ciclo de crawl por chamada (Vercel Cron)
+@app.route("/cron/crawl", methods=["GET", "POST"])
+def cron_crawl():
+    if not SERVERLESS:
+        return jsonify({"error": "neste runtime o crawl roda em segundo plano"}), 409
+    auth = request.headers.get("Authorization", "")
+    if not CRON_SECRET or not hmac.compare_digest(auth, f"Bearer {CRON_SECRET}"):
+        return jsonify({"error": "não autorizado"}), 401
+    started = time.monotonic()
+    cycles = run_crawl_cycle()
+    return jsonify({
+        "places": {
+            place_id: {
+                "servers": cycle.total_servers,
+                "job_ids": len(cycle.job_ids),
+                "push_outbox": cycle.place.pusher.pending(),
+            }
+            for place_id, cycle in cycles.items()
+        },
+        "elapsed_ms": round((time.monotonic() - started) * 1000),
+    })
 
 # ==============================
 # RUN FLASK em thread
@@ -571,21 +4243,299 @@ def run_flask():
     # debug False para produção
     app.run(host="0.0.0.0", port=port, debug=False)
 
+# ==============================
+# RUNTIME ASYNCIO (RUNTIME=asyncio)
+# ==============================
+class SseHub(SseClients):
+    """SSE servido pelo próprio event loop em /events (Accept: text/event-stream).
+
+    Mesmo contrato do FeedServer: buffer limitado por cliente, lento é derrubado.
+    """
+
+    def __init__(self, bus, port, max_clients, buffer_limit):
+        super().__init__(bus, max_clients, buffer_limit)
+        self.port = port
+
+    async def handle(self, req):
+        from aiohttp import web
+
+        kinds = set(req.query["types"].split(",")) if "types" in req.query else None
+        try:
+            last_id = int(req.headers.get("Last-Event-ID") or req.query.get("since", "-1"))
+        except ValueError:
+            last_id = -1
+        client = self.open(kinds, last_id, AsyncSignal(asyncio.get_running_loop()))
+        if client is None:
+            return web.json_response({"error": "muitos clientes"}, status=503)
+
+        resp = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*",
+        })
+        try:
+            await resp.prepare(req)
+            await resp.write(b"retry: 3000\n\n")
+            while True:
+                data, closing = self.take(client)
+                if closing:
+                    break
+                if data:
+                    await resp.write(data)
+                    continue
+                await client.signal.wait(FEED_HEARTBEAT)
+                if not client.chunks and not client.closing:
+                    await resp.write(b": ping\n\n")
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.close(client)
+        return resp
+
+    def stats(self):
+        return {"port": self.port, **super().stats()}
+
+_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade"}
+
+class _WsgiInput:
+    """wsgi.input lido na thread do handler; cada leitura espera o corpo chegar pelo loop.
+
+    O corpo não é bufferizado inteiro: /api/batch em NDJSON processa linha a linha.
+    """
+
+    def __init__(self, content, loop):
+        self.content = content
+        self.loop = loop
+        self.buffer = bytearray()
+        self.eof = False
+
+    def _fill(self):
+        chunk = asyncio.run_coroutine_threadsafe(self.content.readany(), self.loop).result()
+        if chunk:
+            self.buffer += chunk
+        else:
+            self.eof = True
+
+    def _take(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            while not self.eof:
+                self._fill()
+            return self._take(len(self.buffer))
+        while len(self.buffer) < size and not self.eof:
+            self._fill()
+        return self._take(size)
+
+    def readline(self, size=-1):
+        size = -1 if size is None else size
+        scanned = 0
+        while True:
+            end = self.buffer.find(b"\n", scanned)
+            if end >= 0:
+                end += 1
+                break
+            scanned = len(self.buffer)
+            if self.eof or 0 <= size <= scanned:
+                end = scanned
+                break
+            self._fill()
+        return self._take(end if size < 0 else min(end, size))
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+def _wsgi_environ(req, loop):
+    """Environ WSGI (PEP 3333) a partir da requisição do aiohttp."""
+    path, _, query = req.raw_path.partition("?")
+    host, _, port = (req.host or "localhost").partition(":")
+    environ = {
+        "REQUEST_METHOD": req.method,
+        "SCRIPT_NAME": "",
+        "PATH_INFO": urllib.parse.unquote_to_bytes(path).decode("latin-1"),
+        "QUERY_STRING": query,
+        "SERVER_NAME": host,
+        "SERVER_PORT": port or ("443" if req.secure else "80"),
+        "SERVER_PROTOCOL": f"HTTP/{req.version.major}.{req.version.minor}",
+        "REMOTE_ADDR": req.remote or "",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": req.scheme,
+        "wsgi.input": _WsgiInput(req.content, loop),
+        "wsgi.input_terminated": True,  # o aiohttp já trata Content-Length e chunked
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for key, value in req.raw_headers:
+        name = key.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        name = "HTTP_" + name
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+class _WsgiCall:
+    """Uma chamada ao app Flask, rodada no WSGI_EXECUTOR com o mesmo contexto do começo ao fim."""
+
+    def __init__(self, environ):
+        self.environ = environ
+        self.context = contextvars.copy_context()  # stream_with_context guarda o request aqui
+        self.status = 500
+        self.headers = []
+        self.written = []  # o que o app mandou pelo write() do WSGI, antes do iterável
+        self.app_iter = None
+
+    def start_response(self, status, headers, exc_info=None):
+        self.status = int(status.split(" ", 1)[0])
+        self.headers = headers
+        return self._write
+
+    def _write(self, data):
+        if data:
+            self.written.append(bytes(data))
+
+    def sized(self):
+        return any(k.lower() == "content-length" for k, _ in self.headers)
+
+    def start(self):
+        """Chama o app; respostas com Content-Length já voltam inteiras (uma ida ao pool só)."""
+        self.app_iter = app(self.environ, self.start_response)
+        if not self.sized():
+            self.app_iter = iter(self.app_iter)
+            return None
+        try:
+            body = b"".join(self.app_iter)
+        finally:
+            self.close()
+        return b"".join(self.written) + body if self.written else body
+
+    def next_chunk(self):
+        # write() chamado durante a iteração sai antes do próximo pedaço do iterável
+        if self.written:
+            chunk, self.written = b"".join(self.written), []
+            return chunk
+        chunk = next(self.app_iter, None)
+        if self.written:
+            if chunk is not None:
+                self.written.append(chunk)
+            chunk, self.written = b"".join(self.written), []
+        return chunk
+
+    def close(self):
+        close = getattr(self.app_iter, "close", None)
+        if close is not None:
+            close()
+
+    async def run(self, method):
+        return await asyncio.get_running_loop().run_in_executor(WSGI_EXECUTOR, self.context.run, method)
+
+async def _wsgi_bridge(req):
+    """Repassa a requisição para o app Flask (mesmas rotas nos dois runtimes).
+
+    O handler roda no WSGI_EXECUTOR: /jobs?order=, /jobs_history?sort=generation e o gzip
+    não seguram o event loop. Respostas em streaming saem pedaço a pedaço.
+    """
+    from aiohttp import web
+    from multidict import CIMultiDict
+
+    call = _WsgiCall(_wsgi_environ(req, asyncio.get_running_loop()))
+    body = await call.run(call.start)
+    headers = CIMultiDict((k, v) for k, v in call.headers if k.lower() not in _HOP_HEADERS)
+    if body is not None:
+        return web.Response(body=body, status=call.status, headers=headers)
+
+    resp = web.StreamResponse(status=call.status, headers=headers)
+    try:
+        await resp.prepare(req)
+        while True:
+            chunk = await call.run(call.next_chunk)
+            if chunk is None:
+                break
+            if chunk:
+                await resp.write(chunk)
+        await resp.write_eof()
+    except ConnectionError:
+        pass
+    finally:
+        await call.run(call.close)
+    return resp
+
+async def _events_route(req):
+    if FEED_SERVER is not None and "text/event-stream" in req.headers.get("Accept", ""):
+        return await FEED_SERVER.handle(req)
+    return await _wsgi_bridge(req)  # ?since= sem conexão aberta
+
+async def main_async():
+    """Um processo, um event loop: crawler, push, webhooks, HTTP, SSE e bot."""
+    global ASYNC_LOOP, ASYNC_HTTP, FEED_SERVER, WSGI_EXECUTOR, bot
+    import aiohttp
+    from aiohttp import web
+
+    ASYNC_LOOP = asyncio.get_running_loop()
+    WSGI_EXECUTOR = ThreadPoolExecutor(max_workers=ASYNC_WSGI_THREADS, thread_name_prefix="wsgi")
+    load_cache()
+
+    ASYNC_HTTP = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=ASYNC_HTTP_LIMIT, ttl_dns_cache=300),
+    )
+    port = int(os.environ.get("PORT", "8080"))
+    FEED_SERVER = SseHub(FEED, port, FEED_MAX_CLIENTS, FEED_CLIENT_BUFFER)
+
+    web_app = web.Application()
+    web_app.router.add_get("/events", _events_route)
+    web_app.router.add_route("*", "/{tail:.*}", _wsgi_bridge)
+    runner = web.AppRunner(web_app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    logging.info(f"[HTTP] asyncio na porta {port} (SSE em /events)")
+
+    tasks = [asyncio.ensure_future(crawl_worker_async()) for _ in range(CRAWL_PLACE_WORKERS)]
+    try:
+        if BOT_TOKEN:
+            logging.info("[INICIANDO] Bot Discord...")
+            bot = build_bot()
+            await bot.start(BOT_TOKEN)
+        else:
+            logging.warning("[WARN] BOT_TOKEN vazio — bot Discord não será iniciado.")
+            await asyncio.Event().wait()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await runner.cleanup()
+        await ASYNC_HTTP.close()
+        WSGI_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+
+IMPORT_MS = (time.perf_counter() - _IMPORT_STARTED) * 1000
+if IMPORT_MS > IMPORT_BUDGET_MS:
+    logging.warning(f"[COLD START] import levou {IMPORT_MS:.0f}ms (orçamento: {IMPORT_BUDGET_MS:.0f}ms)")
+
 # ==============================
 # STARTUP
 # ==============================
-if __name__ == "__main__":
+if __name__ == "__main__" and RUNTIME == "asyncio":
+    try:
+        asyncio.run(main_async())
+    except KeyboardInterrupt:
+        logging.info("Encerrando...")
+elif __name__ == "__main__":
     # Carrega cache antes de iniciar bot
     load_cache()
 
+    # Feed SSE (uma thread para todos os clientes)
+    if FEED_PORT:
+        FEED_SERVER = FeedServer(FEED, FEED_PORT, FEED_MAX_CLIENTS, FEED_CLIENT_BUFFER)
+        FEED_SERVER.start()
+
     # Inicia Flask em thread separada
     flask_thread = threading.Thread(target=run_flask, daemon=True)
     flask_thread.start()
 
-    # Inicia reset loop em thread separada
-    reset_thread = threading.Thread(target=reset_loop, daemon=True)
-    reset_thread.start()
-
     # Inicia bot (bloqueante) - token vem do env
     if not BOT_TOKEN:
         logging.warning("[WARN] BOT_TOKEN vazio — bot Discord não será iniciado.")
@@ -598,6 +4548,7 @@ if __name__ == "__main__":
     else:
         logging.info("[INICIANDO] Bot Discord...")
         try:
+            bot = build_bot()
             bot.run(BOT_TOKEN)
         except Exception as e:
             logging.exception("[ERRO] falha ao iniciar bot: %s", e)
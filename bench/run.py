@@ -0,0 +1,482 @@
+"""Benchmark offline: sobe os stubs (bench/stubs.py), roda o app contra eles e imprime JSON.
+
+    python bench/run.py                            # tudo; resultado em JSON no stdout
+    python bench/run.py --out bench_output.txt     # também grava em arquivo
+    python bench/run.py --baseline antes.json      # exit 1 se algo piorar mais que --tolerance
+
+Mede:
+- crawl: duração e páginas por ciclo (lidas do /metrics de um app com ciclo curto)
+- api: /api req/s e p50/p99, /api/batch detecções/s
+- jobs: /jobs req/s e p99 (gzip e 304)
+- persistence: snapshot/journal/pool (binário e pool.json) em disco com históricos de tamanhos
+  diferentes, e bytes por id em memória (set de str x PackedIds)
+
+Nada sai da máquina: a API de games, o MAIN e o Discord são os stubs.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from stubs import GamesApiStub, MainApiStub, DiscordStub  # noqa: E402
+
+PLACE_ID = "109983668079237"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class App:
+    """api/index.py num subprocesso, apontado para os stubs."""
+
+    def __init__(self, args, stubs, state_dir, **env):
+        self.port = _free_port()
+        self.log_path = os.path.join(state_dir, f"app-{self.port}.log")
+        games, main, discord = stubs
+        full_env = {
+            **os.environ,
+            "RUNTIME": args.runtime,
+            "PORT": str(self.port),
+            "FEED_PORT": "0",
+            "BOT_TOKEN": "",
+            "PROXIES": "",
+            "STATE_DIR": state_dir,
+            "POOL_FILE": os.path.join(state_dir, "pool.bin"),
+            "CACHE_FILE": os.path.join(state_dir, "cache.json"),
+            "GAME_ID": PLACE_ID,
+            "PLACE_IDS": PLACE_ID,
+            "GAMES_API_URL": games.url,
+            "MAIN_API_URL": f"{main.url}/add-pool",
+            "WEBHOOK_A1": f"{discord.url}/api/webhooks/1/a1",
+            "WEBHOOK_A2": f"{discord.url}/api/webhooks/2/a2",
+            "WEBHOOK_B": f"{discord.url}/api/webhooks/3/b",
+            "WEBHOOK_C": f"{discord.url}/api/webhooks/4/c",
+            "MAX_PAGES_PER_CYCLE": str(args.pages),
+            **{k: str(v) for k, v in env.items()},
+        }
+        self.log = open(self.log_path, "wb")
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "api", "index.py")],
+            cwd=state_dir, env=full_env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                self.get("/")
+                return
+            except OSError:
+                if self.proc.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    with open(self.log_path, "rb") as f:
+                        tail = f.read()[-2000:].decode(errors="replace")
+                    raise RuntimeError(f"app não subiu:\n{tail}")
+                time.sleep(0.1)
+
+    def get(self, path):
+        with urllib.request.urlopen(f"http://127.0.0.1:{self.port}{path}", timeout=10) as r:
+            return r.read()
+
+    def metrics(self):
+        """{(nome, labels): valor} do /metrics."""
+        out = {}
+        for line in self.get("/metrics").decode().splitlines():
+            if line and not line.startswith("#"):
+                key, _, value = line.rpartition(" ")
+                out[key] = float(value)
+        return out
+
+    def stop(self):
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.log.close()
+
+
+def load(port, make_request, clients, duration):
+    """clients conexões keep-alive em paralelo por duration segundos.
+
+    make_request(i) -> (método, caminho, corpo, headers, itens); devolve latências e status.
+    """
+    latencies = [[] for _ in range(clients)]
+    statuses = {}
+    items = [0] * clients
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(n):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        i = 0
+        while time.monotonic() < stop_at:
+            method, path, body, headers, count = make_request(n * 1_000_000 + i)
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                status = "error"
+            latencies[n].append(time.perf_counter() - started)
+            items[n] += count
+            with lock:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+        conn.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+    flat = [x for part in latencies for x in part]
+    return {
+        "requests": len(flat),
+        "rps": round(len(flat) / elapsed, 1),
+        "items_per_s": round(sum(items) / elapsed, 1),
+        "p50_ms": _ms(_percentile(flat, 50)),
+        "p99_ms": _ms(_percentile(flat, 99)),
+        "statuses": statuses,
+    }
+
+
+GENERATIONS = ["250K", "900K", "2.5M", "7M", "25M", "80M", "150M", "1.2B"]
+NAMES = [f"Secret {n}" for n in range(60)]
+
+
+def _detection(i):
+    return {
+        "Name": NAMES[i % len(NAMES)],
+        "Generation": GENERATIONS[i % len(GENERATIONS)],
+        "JobId": str(uuid.UUID(int=i + 1)),  # único: nada cai no dedup
+        "Rarity": "Secret",
+    }
+
+
+def bench_crawl(args, stubs, state_dir):
+    games = stubs[0]
+    app = App(args, stubs, state_dir, CRAWL_ADAPTIVE="0", SEND_INTERVAL=args.crawl_interval, CRAWL_PLACE_WORKERS=1)
+    try:
+        key = f'mini_crawl_cycle_seconds_count{{place="{PLACE_ID}"}}'
+        deadline = time.monotonic() + args.cycles * (args.crawl_interval + 30)
+        seen = 0
+        while seen < args.cycles and time.monotonic() < deadline:
+            time.sleep(0.2)
+            count = int(app.metrics().get(key, 0))
+            if count > seen:
+                games.rotate(args.churn)  # próximo ciclo vê ids novos
+                seen = count
+        m = app.metrics()
+    finally:
+        app.stop()
+    label = f'{{place="{PLACE_ID}"}}'
+    cycles = m.get(f"mini_crawl_cycle_seconds_count{label}", 0) or 1
+    fetches = {k: v for k, v in m.items() if k.startswith("mini_page_fetches_total")}
+    page_count = m.get(f"mini_page_fetch_seconds_count{{proxy=\"sem proxy\"}}", 0) or 1
+    return {
+        "cycles": int(m.get(f"mini_crawl_cycle_seconds_count{label}", 0)),
+        "cycle_mean_ms": _ms(m.get(f"mini_crawl_cycle_seconds_sum{label}", 0) / cycles),
+        "pages_per_cycle": round(m.get(f"mini_crawl_cycle_pages_sum{label}", 0) / cycles, 2),
+        "page_fetch_mean_ms": _ms(m.get('mini_page_fetch_seconds_sum{proxy="sem proxy"}', 0) / page_count),
+        "filter_yield": round(
+            m.get(f"mini_crawl_servers_kept_total{label}", 0) / (m.get(f"mini_crawl_servers_total{label}", 0) or 1), 4
+        ),
+        "page_fetches": {k.split("{", 1)[1].rstrip("}"): int(v) for k, v in fetches.items()},
+        "stub_429": games.throttled,
+    }
+
+
+def bench_http(args, stubs, state_dir):
+    app = App(args, stubs, state_dir, CRAWL_ADAPTIVE="0", SEND_INTERVAL=3600)
+    try:
+        # espera o primeiro ciclo terminar (o pool é publicado página a página até lá)
+        key = f'mini_crawl_cycle_seconds_count{{place="{PLACE_ID}"}}'
+        deadline = time.monotonic() + 60
+        while not app.metrics().get(key) and time.monotonic() < deadline:
+            time.sleep(0.2)
+        pool_size = json.loads(app.get("/jobs"))["count"]
+
+        json_headers = {"Content-Type": "application/json"}
+        def api_request(i):
+            return "POST", "/api", json.dumps(_detection(i)), json_headers, 1
+
+        def batch_request(i):
+            base = 10_000_000 + i * args.batch_size
+            body = json.dumps([_detection(base + k) for k in range(args.batch_size)])
+            return "POST", "/api/batch", body, json_headers, args.batch_size
+
+        api = load(app.port, api_request, args.clients, args.duration)
+        batch = load(app.port, batch_request, max(1, args.clients // 2), args.duration)
+
+        etag = [None]
+
+        def jobs_request(i):
+            return "GET", "/jobs", None, {"Accept-Encoding": "gzip"}, 1
+
+        def jobs_304_request(i):
+            return "GET", "/jobs", None, {"Accept-Encoding": "gzip", "If-None-Match": etag[0]}, 1
+
+        jobs = load(app.port, jobs_request, args.clients, args.duration)
+        with urllib.request.urlopen(f"http://127.0.0.1:{app.port}/jobs") as r:
+            etag[0] = r.headers["ETag"]
+        jobs_304 = load(app.port, jobs_304_request, args.clients, args.duration)
+        time.sleep(1)  # deixa a fila de ingestão e os webhooks andarem antes de ler as métricas
+        m = app.metrics()
+        ingest = json.loads(app.get("/"))["ingest"]
+    finally:
+        app.stop()
+    return {
+        "api": api,
+        "api_batch": {**batch, "batch_size": args.batch_size},
+        "jobs": {**jobs, "pool_size": pool_size},
+        "jobs_304": jobs_304,
+        "ingest": ingest,
+        "persist_write_mean_ms": {
+            k.split('"')[1]: _ms(m[k] / (m.get(k.replace("_sum", "_count"), 0) or 1))
+            for k in m if k.startswith("mini_persist_write_seconds_sum")
+        },
+    }
+
+
+def bench_persistence(args, state_dir):
+    """Custo de disco com o app importado (serverless: sem threads) e histórico de N entradas."""
+    os.environ.update({
+        "RUNTIME": "serverless",
+        "STATE_DIR": state_dir,
+        "CACHE_FILE": os.path.join(state_dir, "cache.json"),
+        "POOL_FILE": os.path.join(state_dir, "pool.bin"),
+        "MAX_HISTORY": str(max(args.history_sizes)),
+        "JOURNAL_COMPACT_EVERY": str(10 ** 9),
+    })
+    sys.path.insert(0, ROOT)
+    import logging
+    logging.disable(logging.INFO)
+    from api import index as app
+
+    results = {}
+    for size in args.history_sizes:
+        with app.STATE_LOCK:
+            app.name_counter.clear()
+            app.job_history.clear()
+        started = time.perf_counter()
+        app.record_detections([
+            {
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "name": NAMES[i % len(NAMES)],
+                "generation": GENERATIONS[i % len(GENERATIONS)],
+                "rarity": "Secret",
+                "placeId": PLACE_ID,
+                "jobId": str(uuid.UUID(int=i + 1)),
+            }
+            for i in range(size)
+        ])
+        record_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        app.JOURNAL.write_pending()
+        journal_s = time.perf_counter() - started
+
+        runs = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            app._write_snapshot()
+            runs.append(time.perf_counter() - started)
+        snapshot_bytes = os.path.getsize(app.CACHE_FILE)
+
+        with app.STATE_LOCK:
+            app.name_counter.clear()
+            app.job_history.clear()
+        started = time.perf_counter()
+        app.load_cache()
+        load_s = time.perf_counter() - started
+
+        ids = app.PackedIds(app.pack_job_id(str(uuid.uuid4())) for _ in range(size))
+        pool_path = os.path.join(state_dir, "pool-bench.bin")
+        started = time.perf_counter()
+        app.atomic_write(pool_path, app.encode_pool(ids))
+        pool_save_s = time.perf_counter() - started
+        started = time.perf_counter()
+        view = app.PoolView(1)
+        view.load_file(pool_path)
+        view.rendered(True)
+        pool_load_s = time.perf_counter() - started
+
+        # mesmo pool no formato antigo (pool.json com indent=4, como o save_pool original)
+        json_path = os.path.join(state_dir, "pool-bench.json")
+        started = time.perf_counter()
+        app.atomic_write(json_path, json.dumps({"servers": ids.strings()}, indent=4).encode())
+        json_save_s = time.perf_counter() - started
+        started = time.perf_counter()
+        view = app.PoolView(1)
+        view.load_file(json_path)
+        view.rendered(True)
+        json_load_s = time.perf_counter() - started
+
+        results[str(size)] = {
+            "record_batch_ms": _ms(record_s),
+            "journal_write_ms": _ms(journal_s),
+            "snapshot_write_ms": _ms(min(runs)),
+            "snapshot_bytes": snapshot_bytes,
+            "load_cache_ms": _ms(load_s),
+            "pool_save_ms": _ms(pool_save_s),
+            "pool_load_render_ms": _ms(pool_load_s),
+            "pool_bytes": os.path.getsize(pool_path),
+            "pool_json_save_ms": _ms(json_save_s),
+            "pool_json_load_render_ms": _ms(json_load_s),
+            "pool_json_bytes": os.path.getsize(json_path),
+            "set_str_bytes_per_id": _bytes_per_id(lambda: set(ids.strings()), size),
+            "packed_ids_bytes_per_id": _bytes_per_id(lambda: app.PackedIds(iter(ids)), size),
+        }
+    return results
+
+
+def _bytes_per_id(build, size):
+    """Memória que a estrutura montada por build() mantém viva (tracemalloc), por id."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()  # noqa: F841 (precisa continuar vivo na medição)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return round((after - before) / max(1, size), 1)
+
+
+def _flatten(obj, prefix=""):
+    out = {}
+    for key, value in obj.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+    return out
+
+
+def compare(results, baseline, tolerance):
+    """Regressões: *_rps/*_per_s que caíram ou *_ms que subiram mais que tolerance."""
+    now, before = _flatten(results), _flatten(baseline)
+    regressions = []
+    for key, old in before.items():
+        new = now.get(key)
+        if new is None or not old:
+            continue
+        if key.endswith(("rps", "_per_s")) and new < old * (1 - tolerance):
+            regressions.append({"metric": key, "baseline": old, "now": new})
+        elif key.endswith("_ms") and new > old * (1 + tolerance):
+            regressions.append({"metric": key, "baseline": old, "now": new})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runtime", default="threads", choices=["threads", "asyncio"])
+    parser.add_argument("--servers", type=int, default=3000, help="servers no stub da API de games")
+    parser.add_argument("--pages", type=int, default=30, help="MAX_PAGES_PER_CYCLE do app")
+    parser.add_argument("--latency", type=float, default=0.03, help="latência por página do stub (s)")
+    parser.add_argument("--rate-429", type=float, default=0.05, help="fração de páginas respondidas com 429")
+    parser.add_argument("--churn", type=float, default=0.1, help="fração dos servers trocada entre ciclos")
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--crawl-interval", type=int, default=1, help="SEND_INTERVAL do app no teste de crawl (s)")
+    parser.add_argument("--clients", type=int, default=8, help="conexões em paralelo nos testes HTTP")
+    parser.add_argument("--duration", type=float, default=5.0, help="segundos por teste HTTP")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--history-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", default="crawl,http,persistence", help="partes a rodar (separadas por vírgula)")
+    parser.add_argument("--out", help="grava o JSON também neste arquivo")
+    parser.add_argument("--baseline", help="JSON de uma rodada anterior para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    parts = set(args.only.split(","))
+
+    random.seed(1)
+    state_root = tempfile.mkdtemp(prefix="bench-")
+    games = GamesApiStub(servers=args.servers, latency=args.latency, rate_429=args.rate_429)
+    main_api = MainApiStub()
+    discord = DiscordStub()
+    stubs = (games, main_api, discord)
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runtime": args.runtime,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "params": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        },
+    }
+    try:
+        if "crawl" in parts:
+            os.makedirs(os.path.join(state_root, "crawl"))
+            results["crawl"] = bench_crawl(args, stubs, os.path.join(state_root, "crawl"))
+        if "http" in parts:
+            os.makedirs(os.path.join(state_root, "http"))
+            results.update(bench_http(args, stubs, os.path.join(state_root, "http")))
+        results["stubs"] = {
+            "games": {"requests": games.requests, "throttled": games.throttled},
+            "main": {"requests": main_api.requests, "ids": main_api.ids, "removed": main_api.removed,
+                     "resyncs": main_api.resyncs},
+            "discord": {"messages": discord.messages, "embeds": discord.embeds,
+                        "rate_limited": discord.rate_limited},
+        }
+        if "persistence" in parts:
+            os.makedirs(os.path.join(state_root, "persistence"))
+            results["persistence"] = bench_persistence(args, os.path.join(state_root, "persistence"))
+    finally:
+        for stub in stubs:
+            stub.stop()
+        shutil.rmtree(state_root, ignore_errors=True)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+        status = 1 if regressions else 0
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
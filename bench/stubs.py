@@ -0,0 +1,213 @@
+"""Servidores locais no lugar da API de games, do MAIN e dos webhooks do Discord.
+
+Cada stub é um ThreadingHTTPServer numa thread daemon, numa porta livre do 127.0.0.1.
+Usados por bench/run.py; também servem para testar o app na mão:
+
+    python bench/stubs.py   # sobe os três e imprime as URLs
+"""
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b"", headers=None, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, str(value))
+        if body:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        try:
+            return json.loads(body or b"{}")
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        self.server.stub.handle_get(self)
+
+    def do_POST(self):
+        self.server.stub.handle_post(self)
+
+
+class StubServer:
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle_get(self, handler):
+        handler.reply(404, {"error": "not found"})
+
+    def handle_post(self, handler):
+        handler.reply(404, {"error": "not found"})
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class GamesApiStub(StubServer):
+    """/v1/games/<place>/servers/Public: páginas de 100 com cursor, 429 injetados e latência.
+
+    rotate(fração) troca parte dos servers, para o crawl ver churn entre ciclos.
+    """
+
+    def __init__(self, servers=2000, latency=0.02, jitter=0.01, rate_429=0.0, seed=1):
+        self.rng = random.Random(seed)
+        self.ids = [self._new_id() for _ in range(servers)]
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.requests = 0
+        self.throttled = 0
+        super().__init__()
+
+    def _new_id(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def rotate(self, fraction):
+        with self.lock:
+            ids = list(self.ids)
+            for i in self.rng.sample(range(len(ids)), int(len(ids) * fraction)):
+                ids[i] = self._new_id()
+            self.ids = ids
+
+    def handle_get(self, handler):
+        parts = urlsplit(handler.path)
+        if not parts.path.endswith("/servers/Public"):
+            return handler.reply(404, {"errors": [{"message": "NotFound"}]})
+        query = parse_qs(parts.query)
+        with self.lock:
+            self.requests += 1
+            ids = self.ids
+            throttle = random.random() < self.rate_429
+            if throttle:
+                self.throttled += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if throttle:
+            return handler.reply(429, {"errors": [{"code": 0, "message": "Too many requests"}]})
+        if query.get("sortOrder", ["Asc"])[0] == "Desc":
+            ids = ids[::-1]
+        limit = int(query.get("limit", ["100"])[0])
+        start = int(query.get("cursor", ["0"])[0] or 0)
+        page = ids[start:start + limit]
+        handler.reply(200, {
+            "previousPageCursor": str(max(0, start - limit)) if start else None,
+            "nextPageCursor": str(start + limit) if start + limit < len(ids) else None,
+            "data": [
+                {
+                    "id": job_id,
+                    "maxPlayers": 8,
+                    "playing": random.randint(0, 8),
+                    "playerTokens": [],
+                    "fps": 60,
+                    "ping": random.randint(20, 250),
+                }
+                for job_id in page
+            ],
+        })
+
+
+class MainApiStub(StubServer):
+    """/add-pool do MAIN: conta ids recebidos (delta, removidos e resync) e responde "added"."""
+
+    def __init__(self, latency=0.005):
+        self.latency = latency
+        self.requests = 0
+        self.ids = 0
+        self.removed = 0
+        self.resyncs = 0
+        super().__init__()
+
+    def handle_post(self, handler):
+        payload = handler.read_json()
+        time.sleep(self.latency)
+        if not isinstance(payload, dict):
+            return handler.reply(400, {"error": "json"})
+        servers = payload.get("servers") or []
+        with self.lock:
+            self.requests += 1
+            self.ids += len(servers)
+            self.removed += len(payload.get("removed") or [])
+            self.resyncs += bool(payload.get("resync"))
+        handler.reply(200, {"added": len(servers)})
+
+
+class DiscordStub(StubServer):
+    """Webhooks do Discord: balde por URL com headers X-RateLimit-* e 429 com retry_after."""
+
+    def __init__(self, limit=5, window=2.0, latency=0.02):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.buckets = {}  # path -> [restantes, reseta em]
+        self.messages = 0
+        self.embeds = 0
+        self.rate_limited = 0
+        super().__init__()
+
+    def handle_post(self, handler):
+        payload = handler.read_json()
+        time.sleep(self.latency)
+        path = urlsplit(handler.path).path
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(path)
+            if bucket is None or now >= bucket[1]:
+                bucket = self.buckets[path] = [self.limit, now + self.window]
+            reset_after = max(0.0, bucket[1] - now)
+            headers = {
+                "X-RateLimit-Limit": self.limit,
+                "X-RateLimit-Bucket": path,
+                "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            }
+            if bucket[0] <= 0:
+                self.rate_limited += 1
+                headers["X-RateLimit-Remaining"] = 0
+                headers["Retry-After"] = f"{reset_after:.3f}"
+                body = {"message": "You are being rate limited.", "retry_after": reset_after, "global": False}
+                return handler.reply(429, body, headers)
+            bucket[0] -= 1
+            headers["X-RateLimit-Remaining"] = bucket[0]
+            self.messages += 1
+            self.embeds += len((payload or {}).get("embeds") or [])
+        handler.reply(204, headers=headers)
+
+
+if __name__ == "__main__":
+    stubs = {"GAMES_API_URL": GamesApiStub(), "MAIN_API_URL": MainApiStub(), "WEBHOOK": DiscordStub()}
+    for name, stub in stubs.items():
+        print(f"{name}={stub.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,9 @@
+# server.py
+# Entrada serverless (Vercel): importa o app Flask sem bot, sem threads e sem crawler.
+# O crawl roda em /cron/crawl (ver "crons" no vercel.json).
+# Exige STATE_DIR num volume persistente: é de lá que cada invocação lê e grava o estado.
+import os
+
+os.environ.setdefault("RUNTIME", "serverless")
+
+from api.index import app  # noqa: E402
@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+import tempfile
+import uuid
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import API_BATCH_MAX, app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def detection(name, job_id=None):
+    # geração baixa: só histórico e contagem, sem webhook
+    return {"name": name, "generation": "10/s", "jobId": job_id or str(uuid.uuid4())}
+
+
+def unique(prefix):
+    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+
+
+def history(client, name):
+    return [e["jobId"] for e in client.get(f"/jobs_history?name={name}&sort=oldest").json["items"]]
+
+
+def test_json_array(client):
+    name = unique("arr")
+    items = [detection(name), {"name": name}, "nope", detection(name)]
+    items.append(dict(items[0]))  # repetido no mesmo lote
+    resp = client.post("/api/batch", json=items)
+    assert resp.status_code == 200
+    body = resp.json
+    assert body["count"] == 5 and body["accepted"] == 2 and body["shed"] == 0
+    assert [r["code"] for r in body["results"]] == [200, 400, 400, 200, 200]
+    assert [r["index"] for r in body["results"]] == list(range(5))
+    assert body["results"][4].get("duplicate") is True
+    assert history(client, name) == [items[0]["jobId"], items[3]["jobId"]]
+
+
+def test_json_errors(client):
+    assert client.post("/api/batch", json={"name": "x"}).status_code == 400
+    assert client.post("/api/batch", data="{", content_type="application/json").status_code == 400
+    assert client.post("/api/batch", json=[{}] * (API_BATCH_MAX + 1)).status_code == 413
+
+
+def test_ndjson_one_result_per_line(client):
+    name = unique("nd")
+    good = [detection(name) for _ in range(3)]
+    lines = [json.dumps(good[0]), "", "{ruim", json.dumps({"name": name}), json.dumps(good[1]), json.dumps(good[2])]
+    resp = client.post("/api/batch", data="\n".join(lines) + "\n", content_type="application/x-ndjson")
+    assert resp.status_code == 200 and resp.mimetype == "application/x-ndjson"
+    results = [json.loads(line) for line in resp.data.splitlines()]
+    # a linha em branco não conta: os índices são das linhas com conteúdo
+    assert [(r["index"], r["code"]) for r in results] == [(0, 200), (1, 400), (2, 400), (3, 200), (4, 200)]
+    assert results[1]["error"] == "JSON inválido"
+    assert history(client, name) == [d["jobId"] for d in good]
+
+
+def test_ndjson_without_trailing_newline(client):
+    name = unique("nd")
+    good = detection(name)
+    resp = client.post("/api/batch", data=json.dumps(good), content_type="application/jsonl")
+    assert [json.loads(line)["code"] for line in resp.data.splitlines()] == [200]
+    assert history(client, name) == [good["jobId"]]
+
+
+def test_single_api_still_works(client):
+    name = unique("one")
+    good = detection(name)
+    assert client.post("/api", json=good).json == {"status": "OK"}
+    assert client.post("/api", json=good).json == {"status": "OK", "duplicate": True}
+    assert client.post("/api", json={"name": name}).status_code == 400
+    assert history(client, name) == [good["jobId"]]
@@ -0,0 +1,80 @@
+import os
+import random
+import sys
+import tempfile
+import uuid
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import CRAWL_INTERVAL_MAX, Place, PoolCycle  # noqa: E402
+
+
+def make_ids(n, seed=0):
+    rng = random.Random(seed)
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(n)]
+
+
+@pytest.fixture
+def place(tmp_path):
+    return Place("1", str(tmp_path / "pool.bin"), "http://main.invalid/add-pool", False)
+
+
+def run_cycle(place, ids, report):
+    cycle = PoolCycle(place)
+    if ids:
+        cycle.on_page([{"id": i, "playing": 5, "maxPlayers": 10} for i in ids])
+    cycle.report.update(report)
+    return cycle.finish()
+
+
+def test_churn_counts_removals(place):
+    ids = make_ids(10)
+    run_cycle(place, ids, {"pages": 1})
+    run_cycle(place, ids[:5], {"pages": 1})  # metade sumiu, nada novo
+    assert place.churn == pytest.approx(0.5)
+    run_cycle(place, ids[:5] + ids[7:], {"pages": 1})  # 3 entraram
+    assert place.churn == pytest.approx(3 / 8)
+    run_cycle(place, ids[:5] + ids[7:], {"pages": 1})
+    assert place.churn == 0
+
+
+def test_partial_cycle_keeps_unseen_ids(place):
+    ids = make_ids(10, seed=1)
+    run_cycle(place, ids, {"pages": 1})
+    place.depth = 1
+    cycle = PoolCycle(place)
+    cycle.max_pages = 1
+    cycle.on_page([{"id": i, "playing": 5, "maxPlayers": 10} for i in ids[:4]])
+    cycle.report.update(pages=1)
+    # CRAWL_PAGES_MAX > 1: ciclo raso, os não vistos ficam no pool e não contam como saída
+    assert cycle.finish()
+    assert len(place.last_jobids) == 10
+    assert place.churn == 0
+
+
+def test_failed_cycle_does_not_tune(place):
+    run_cycle(place, make_ids(10, seed=2), {"pages": 1})
+    before = (place.activity, place.interval, place.depth, place.churn)
+    assert run_cycle(place, [], {"pages": 0, "errors": 6, "throttled": 6}) is False
+    assert (place.activity, place.interval, place.depth, place.churn) == before
+    assert place.failed_streak == 1 and place.rate_429 == 1.0
+    waits = []
+    for _ in range(8):
+        run_cycle(place, [], {"pages": 0, "errors": 2})
+        waits.append(place.next_wait)
+    assert waits[0] > place.interval
+    assert max(waits) <= CRAWL_INTERVAL_MAX * 1.11
+
+    run_cycle(place, make_ids(10, seed=2), {"pages": 1})
+    assert place.failed_streak == 0
+
+
+def test_empty_place_still_tunes(place):
+    # páginas ok, só que sem servers: é um place parado, não uma falha
+    assert run_cycle(place, [], {"pages": 1}) is False
+    assert place.failed_streak == 0 and place.activity == 0
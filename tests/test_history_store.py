@@ -0,0 +1,162 @@
+import os
+import random
+import sys
+import tempfile
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import HistoryStore, SeqIndex, parse_generation  # noqa: E402
+
+NAMES = ["Alpha", "Beta", "Gamma", "Delta"]
+RARITIES = ["Secret", "Mythic"]
+GENERATIONS = ["5/s", "$50/s", "$1.5K/s", "$20K/s", "$3M/s", "$1B/s"]
+
+
+def entry(i, rng):
+    return {
+        "name": rng.choice(NAMES),
+        "rarity": rng.choice(RARITIES),
+        "jobId": f"job-{rng.randrange(6)}",
+        "generation": rng.choice(GENERATIONS),
+        "i": i,
+    }
+
+
+def filled(capacity, count, seed=0):
+    rng = random.Random(seed)
+    store = HistoryStore(capacity)
+    entries = [entry(i, rng) for i in range(count)]
+    for e in entries:
+        store.add(e)
+    return store, entries[-capacity:]
+
+
+def brute(kept, name=None, rarity=None, job_id=None, min_gen=None, max_gen=None):
+    """(seq, entrada) que casam, do mais velho ao mais novo."""
+    out = []
+    for e in kept:
+        gen = parse_generation(e["generation"])
+        if ((name is None or e["name"] == name)
+                and (rarity is None or e["rarity"] == rarity)
+                and (job_id is None or e["jobId"] == job_id)
+                and (min_gen is None or gen >= min_gen)
+                and (max_gen is None or gen <= max_gen)):
+            out.append((e["i"], e))
+    return out
+
+
+def pages(store, **kwargs):
+    """Todas as páginas seguindo next_cursor."""
+    items, cursor, seen = [], None, 0
+    while True:
+        page, cursor = store.query(cursor=cursor, **kwargs)
+        items += page
+        seen += 1
+        assert seen < 1000
+        if cursor is None:
+            return items
+
+
+# -------------------------
+# SeqIndex
+# -------------------------
+def test_seq_index_compacts_head():
+    seqs = SeqIndex()
+    for seq in range(200):
+        seqs.append(seq)
+    for _ in range(150):
+        seqs.popleft()
+    assert len(seqs) == 50
+    assert list(seqs) == list(range(150, 200))
+    assert seqs.head < 150  # o começo morto já foi apagado
+    assert len(seqs.seqs) - seqs.head == 50
+
+
+# -------------------------
+# HistoryStore
+# -------------------------
+def test_ring_keeps_newest():
+    store, kept = filled(10, 25)
+    assert len(store) == 10
+    assert store.recent(3) == kept[::-1][:3]
+    assert store.to_list() == kept[::-1]
+    store.clear()
+    assert len(store) == 0 and store.recent(5) == []
+    assert store.query(name="Alpha") == ([], None)
+
+
+def test_indexes_drop_evicted_entries():
+    store, kept = filled(50, 5000, seed=1)
+    for index, key in (("name", "name"), ("rarity", "rarity"), ("jobId", "jobId")):
+        counts = {}
+        for e in kept:
+            counts[e[key]] = counts.get(e[key], 0) + 1
+        assert {k: len(v) for k, v in store.indexes[index].items()} == counts
+    # o array de cada índice não cresce sem limite
+    assert all(len(v.seqs) <= 2 * 50 + 64 for v in store.indexes["rarity"].values())
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"name": "Alpha"},
+    {"rarity": "Mythic"},
+    {"job_id": "job-3"},
+    {"name": "Beta", "rarity": "Secret"},
+    {"min_gen": 1000},
+    {"max_gen": 100},
+    {"name": "Gamma", "min_gen": 10, "max_gen": 2_000_000},
+    {"name": "Nobody"},
+])
+@pytest.mark.parametrize("sort", ["newest", "oldest"])
+def test_cursor_pagination_matches_brute_force(filters, sort):
+    store, kept = filled(300, 1000, seed=2)
+    expected = [e for _, e in brute(kept, **filters)]
+    if sort == "newest":
+        expected.reverse()
+    for limit in (1, 7, 1000):
+        assert pages(store, sort=sort, limit=limit, **filters) == expected
+
+
+@pytest.mark.parametrize("filters", [{}, {"name": "Delta"}, {"min_gen": 100, "max_gen": 5_000_000}])
+@pytest.mark.parametrize("sort", ["generation", "-generation"])
+def test_generation_sort(filters, sort):
+    store, kept = filled(200, 500, seed=3)
+    matched = brute(kept, **filters)
+    matched.sort(key=lambda item: (parse_generation(item[1]["generation"]), item[0]), reverse=sort != "generation")
+    expected = [e for _, e in matched]
+    for limit in (1, 9, 500):
+        assert pages(store, sort=sort, limit=limit, **filters) == expected
+
+
+def test_cursor_at_end_of_history():
+    store, kept = filled(20, 30, seed=4)
+    newest_seq, oldest_seq = kept[-1]["i"], kept[0]["i"]
+    # seq do item mais velho: nada mais antigo que ele
+    assert store.query(sort="newest", cursor=oldest_seq) == ([], None)
+    # seq do mais novo (ou além): nada mais novo
+    assert store.query(sort="oldest", cursor=newest_seq) == ([], None)
+    assert store.query(sort="oldest", cursor=newest_seq + 100) == ([], None)
+    # cursor que já saiu do buffer: continua do que restou
+    items, _ = store.query(sort="oldest", cursor=0, limit=100)
+    assert items == kept
+    items, _ = store.query(sort="newest", cursor=newest_seq + 1, limit=100, name=kept[-1]["name"])
+    assert items[0] is kept[-1]
+    # a última página tem exatamente `limit` itens e não devolve cursor
+    items, cursor = store.query(sort="newest", limit=len(kept))
+    assert len(items) == len(kept) and cursor is None
+    assert store.query(sort="-generation", cursor=len(kept), limit=5) == ([], None)
+
+
+def test_pagination_survives_inserts():
+    store, kept = filled(100, 100, seed=5)
+    first, cursor = store.query(sort="newest", limit=10)
+    store.add({"name": "Alpha", "rarity": "Secret", "jobId": "x", "generation": "1/s", "i": 100})
+    second, _ = store.query(sort="newest", limit=10, cursor=cursor)
+    # a entrada nova não aparece no meio da paginação em andamento
+    assert second == kept[::-1][10:20]
+    assert first == kept[::-1][:10]
@@ -0,0 +1,85 @@
+import os
+import sys
+import tempfile
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import IngestQueue, TTLDedup, generation_tier  # noqa: E402
+
+LIMITS = {"low": 0.5, "A": 0.8, "B": 1.0, "C": 1.0}
+
+
+def queue(max_depth=10, batch_size=4, process=None):
+    batches = []
+    q = IngestQueue(process or batches.append, max_depth, LIMITS, batch_size, TTLDedup(60, 1000))
+    q.batches_seen = batches
+    return q
+
+
+def fill(q, n, band="B"):
+    return [q.offer({"i": i}, band, (band, i)) for i in range(n)]
+
+
+@pytest.mark.parametrize("generation, band", [
+    ("500K/s", "low"), ("$1M/s", "low"), ("$1.5M/s", "A"), ("$10M/s", "A"),
+    ("$20M/s", "B"), ("$100M/s", "B"), ("$1B/s", "C"),
+])
+def test_generation_tier(generation, band):
+    assert generation_tier(generation) == band
+
+
+def test_limits_per_band():
+    q = queue(max_depth=10)
+    assert q.limits == {"low": 5, "A": 8, "B": 10, "C": 10}
+
+
+def test_tiered_shedding_thresholds():
+    q = queue(max_depth=10)
+    assert fill(q, 5, "low") == ["queued"] * 5
+    assert q.offer({}, "low", "low-6") == "shed"  # low para na metade
+    assert fill(q, 3, "A") == ["queued"] * 3
+    assert q.offer({}, "A", "A-4") == "shed"  # A para em 80%
+    assert fill(q, 2, "B") == ["queued"] * 2
+    assert q.offer({}, "C", "C-1") == "shed"  # cheia
+    assert q.stats()["shed"] == {"low": 1, "A": 1, "B": 0, "C": 1}
+    assert q.stats()["depth"] == 10 and q.stats()["high_water"] == 10
+
+
+def test_unknown_band_uses_max_depth():
+    q = queue(max_depth=3)
+    assert fill(q, 4, "?") == ["queued"] * 3 + ["shed"]
+
+
+def test_shed_item_is_not_remembered_by_dedup():
+    q = queue(max_depth=2)
+    fill(q, 1, "low")
+    assert q.offer({}, "low", "retry-me") == "shed"
+    q.drain()
+    assert q.offer({}, "low", "retry-me") == "queued"  # o retry entra
+    q.drain()
+    assert q.offer({}, "low", "retry-me") == "duplicate"
+
+
+def test_drain_in_batches_and_order():
+    q = queue(max_depth=10, batch_size=4)
+    fill(q, 10)
+    q.drain()
+    assert [[e["i"] for e in b] for b in q.batches_seen] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    stats = q.stats()
+    assert stats["processed"] == 10 and stats["batches"] == 3 and stats["depth"] == 0
+
+
+def test_failed_batch_counts_errors():
+    def process(batch):
+        raise RuntimeError("falhou")
+
+    q = queue(process=process, batch_size=3)
+    fill(q, 5)
+    q.drain()
+    stats = q.stats()
+    assert stats["errors"] == 5 and stats["processed"] == 5 and stats["depth"] == 0
@@ -0,0 +1,189 @@
+import json
+import os
+import sys
+import tempfile
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import Journal, StateWriter  # noqa: E402
+
+
+def journal(path, compact_every=1000, shared=False, on_remote=None):
+    # StateWriter no modo serverless não sobe thread: quem grava é o teste
+    return Journal(str(path), StateWriter(0), "journal", "cache", compact_every, shared, on_remote)
+
+
+def rec(n):
+    return {"op": "add", "name": f"n{n}"}
+
+
+def names(records):
+    return [r["name"] for r in records]
+
+
+def lines(path):
+    with open(path, "rb") as f:
+        return [json.loads(line) for line in f]
+
+
+# -------------------------
+# uma instância
+# -------------------------
+def test_append_write_replay(tmp_path):
+    path = tmp_path / "j.ndjson"
+    j = journal(path)
+    for n in range(1, 4):
+        j.append(rec(n))
+    assert not path.exists()  # append só bufferiza
+    j.write_pending()
+    assert [r["seq"] for r in lines(path)] == [1, 2, 3]
+
+    fresh = journal(path)
+    assert names(fresh.replay()) == ["n1", "n2", "n3"]
+    assert fresh.seq == 3
+    assert names(journal(path).replay(after_seq=2)) == ["n3"]
+
+
+def test_replay_skips_bad_lines(tmp_path):
+    path = tmp_path / "j.ndjson"
+    j = journal(path)
+    j.append(rec(1))
+    j.append(rec(2))
+    j.write_pending()
+    with open(path, "ab") as f:
+        f.write(b"{lixo\n")
+        f.write(b'{"op":"add","name":"n3","seq":3')  # escrita interrompida
+    fresh = journal(path)
+    assert names(fresh.replay()) == ["n1", "n2"]
+    assert fresh.seq == 2
+
+
+def test_replay_missing_file(tmp_path):
+    j = journal(tmp_path / "nada.ndjson")
+    assert j.replay(after_seq=7) == []
+    assert j.seq == 7
+    j.append(rec(8))
+    assert j.buffer[0][0] == 8
+
+
+def test_compaction_is_requested_every_n(tmp_path):
+    j = journal(tmp_path / "j.ndjson", compact_every=3)
+    for n in range(1, 3):
+        j.append(rec(n))
+    assert j.writer.dirty == {"journal"}
+    j.append(rec(3))
+    assert j.writer.dirty == {"journal", "cache"}
+
+
+def test_compaction_then_replay(tmp_path):
+    path = tmp_path / "j.ndjson"
+    j = journal(path)
+    for n in range(1, 4):
+        j.append(rec(n))
+    j.write_pending()
+    # o snapshot cobre até a 4 (a 4 ainda estava no buffer); a 5 chega depois
+    j.append(rec(4))
+    snapshot_seq = j.cover_pending()
+    assert snapshot_seq == 4
+    j.append(rec(5))
+    j.compacted(snapshot_seq)
+    assert path.read_bytes() == b""
+    assert [seq for seq, _ in j.buffer] == [5]  # o que o snapshot não cobriu continua
+    j.write_pending()
+
+    fresh = journal(path)
+    assert names(fresh.replay(after_seq=snapshot_seq)) == ["n5"]
+    assert fresh.seq == 5
+    fresh.append(rec(6))
+    assert fresh.buffer[-1][0] == 6
+
+
+def test_snapshot_without_compaction_replays_nothing_twice(tmp_path):
+    # caiu entre gravar o snapshot e compactar: o journal ainda tem o que o snapshot cobre
+    path = tmp_path / "j.ndjson"
+    j = journal(path)
+    for n in range(1, 4):
+        j.append(rec(n))
+    j.write_pending()
+    assert journal(path).replay(after_seq=j.cover_pending()) == []
+
+
+# -------------------------
+# várias instâncias no mesmo arquivo (shared)
+# -------------------------
+class Remote:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, records):
+        self.calls.append(None if records is None else names(records))
+
+
+def test_shared_instances_see_each_other(tmp_path):
+    path = tmp_path / "j.ndjson"
+    seen_a, seen_b = Remote(), Remote()
+    a = journal(path, shared=True, on_remote=seen_a)
+    b = journal(path, shared=True, on_remote=seen_b)
+    a.replay()
+    b.replay()
+
+    a.append(rec(1))
+    a.append(rec(2))
+    assert a.buffer[0][0] is None  # a sequência só sai do arquivo
+    a.write_pending()
+    b.sync()
+    assert seen_b.calls == [["n1", "n2"]] and b.seq == 2
+
+    b.append(rec(3))
+    b.write_pending()
+    a.append(rec(4))
+    a.write_pending()  # aplica a 3 de b antes de numerar a sua
+    assert seen_a.calls == [["n3"]]
+    assert [r["seq"] for r in lines(path)] == [1, 2, 3, 4]
+    b.sync()
+    assert seen_b.calls[-1] == ["n4"]
+    b.sync()
+    assert len(seen_b.calls) == 2  # nada novo: não chama de novo
+
+
+def test_shared_compaction_then_replay(tmp_path):
+    path = tmp_path / "j.ndjson"
+    seen_b = Remote()
+    a = journal(path, shared=True, on_remote=Remote())
+    b = journal(path, shared=True, on_remote=seen_b)
+    for n in range(1, 4):
+        a.append(rec(n))
+    a.write_pending()
+    b.sync()
+
+    # a compacta: o snapshot cobre o arquivo e o buffer, e a sequência avança
+    a.append(rec(4))
+    upto = a.cover_pending()
+    assert upto == 4 and a.buffer == []
+    a.compacted(upto)
+    assert lines(path) == [{"op": "base", "seq": 4}]
+
+    b.sync()
+    assert seen_b.calls[-1] is None  # b ficou para trás da base: recarrega do snapshot
+
+    fresh = journal(path, shared=True, on_remote=Remote())
+    assert fresh.replay(after_seq=upto) == []
+    assert fresh.seq == 4
+    fresh.append(rec(5))
+    fresh.write_pending()
+    assert lines(path)[-1]["seq"] == 5
+    assert names(journal(path, shared=True).replay(after_seq=upto)) == ["n5"]
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_failed_write_keeps_buffer(tmp_path, shared):
+    j = journal(tmp_path / "sem-dir" / "j.ndjson", shared=shared, on_remote=Remote())
+    j.append(rec(1))
+    with pytest.raises(OSError):
+        j.write_pending()
+    assert names(r for _, r in j.buffer) == ["n1"]
@@ -0,0 +1,177 @@
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import uuid
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.index import MainPusher, PackedIds, PushBatcher, pack_job_id  # noqa: E402
+
+
+def make_ids(n, seed=0):
+    rng = random.Random(seed)
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(n)]
+
+
+class Response:
+    def __init__(self, status_code, text='{"added": 0}'):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeSession:
+    """Guarda os payloads decodificados; `statuses` dita as respostas (default 200)."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.payloads = []
+
+    def post(self, url, data, headers, timeout):
+        if headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        self.payloads.append(json.loads(data))
+        return Response(self.statuses.pop(0) if self.statuses else 200)
+
+
+def pusher(mode="delta", resync_every=100, outbox_max=100, statuses=(), use_gzip=False, extra=None):
+    session = FakeSession(statuses)
+    return MainPusher("http://main/add-pool", mode, resync_every, use_gzip, outbox_max,
+                      extra=extra, session=session), session
+
+
+# -------------------------
+# MainPusher
+# -------------------------
+def test_delta_sends_only_new_ids():
+    ids = make_ids(4)
+    p, session = pusher()
+    p.push_ids([pack_job_id(i) for i in ids[:3]])
+    p.push_ids([pack_job_id(i) for i in ids[1:]])
+    p.drain()
+    assert [x["servers"] for x in session.payloads] == [ids[:3], ids[3:]]
+
+
+def test_full_mode_sends_everything():
+    ids = make_ids(2)
+    p, session = pusher(mode="full")
+    p.push_ids([pack_job_id(i) for i in ids])
+    p.push_ids([pack_job_id(i) for i in ids])
+    p.end_cycle(PackedIds([pack_job_id(i) for i in ids[:1]]))
+    p.drain()
+    assert [x["servers"] for x in session.payloads] == [ids, ids]
+
+
+def test_end_cycle_sends_removed():
+    ids = make_ids(3)
+    p, session = pusher(extra={"placeId": 7})
+    p.push_ids([pack_job_id(i) for i in ids])
+    p.end_cycle(PackedIds([pack_job_id(ids[1])]))
+    p.drain()
+    assert session.payloads[-1] == {"servers": [], "removed": [ids[0], ids[2]], "placeId": 7}
+
+    # o que saiu e volta é novo de novo
+    p.push_ids([pack_job_id(ids[0]), pack_job_id(ids[1])])
+    p.drain()
+    assert session.payloads[-1]["servers"] == [ids[0]]
+
+
+def test_resync_every_n_cycles():
+    ids = make_ids(2)
+    current = PackedIds([pack_job_id(i) for i in ids])
+    p, session = pusher(resync_every=2)
+    p.push_ids(list(current))
+    p.end_cycle(current)  # ciclo 1: nada removido, nada enviado
+    p.end_cycle(current)  # ciclo 2: resync
+    p.drain()
+    assert session.payloads[-1] == {"servers": ids, "resync": True}
+    assert len(session.payloads) == 2
+
+
+def test_outbox_overflow_forces_resync():
+    ids = make_ids(4)
+    p, session = pusher(outbox_max=2)
+    for i in ids[:3]:
+        p.push_ids([pack_job_id(i)])
+    assert p.pending() == 2  # o mais antigo foi descartado
+    p.end_cycle(PackedIds([pack_job_id(i) for i in ids]))
+    p.drain()
+    assert session.payloads[-1] == {"servers": ids, "resync": True}
+
+
+def test_retry_keeps_payload_and_drop_forces_resync():
+    ids = make_ids(2)
+    p, session = pusher(statuses=[503])
+    p.push_ids([pack_job_id(ids[0])])
+    p.drain()
+    assert p.pending() == 1  # 5xx: fica na outbox
+    p.drain()
+    assert p.pending() == 0
+    assert [x["servers"] for x in session.payloads] == [[ids[0]], [ids[0]]]
+
+    session.statuses = [422]  # 4xx: descartado, mas o MAIN pode estar fora de sincronia
+    p.push_ids([pack_job_id(ids[1])])
+    p.drain()
+    assert p.pending() == 0
+    p.end_cycle(PackedIds([pack_job_id(i) for i in ids]))
+    p.drain()
+    assert session.payloads[-1] == {"servers": ids, "resync": True}
+
+
+def test_gzip_refused_falls_back_to_plain():
+    p, session = pusher(statuses=[415], use_gzip=True)
+    p.push_ids([pack_job_id(make_ids(1)[0])])
+    p.drain()
+    assert p.gzip is False
+    assert len(session.payloads) == 2 and p.pending() == 0
+
+
+# -------------------------
+# PushBatcher
+# -------------------------
+def test_batcher_splits_by_size():
+    batches = []
+    batcher = PushBatcher(batches.append, 3, 60)
+    batcher.started = True  # sem worker: só o flush
+    batcher.add(list(range(7)))
+    batcher.flush()
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_flush_waits_for_batch_in_flight():
+    ids = [pack_job_id(i) for i in make_ids(3)]
+    p, session = pusher()
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_send(batch):
+        entered.set()
+        release.wait(5)
+        p.push_ids(batch)
+
+    batcher = PushBatcher(slow_send, 10, 0)
+    batcher.started = True
+    batcher.add(ids)
+    worker = threading.Thread(target=batcher._run, daemon=True)
+    worker.start()
+    assert entered.wait(5)  # o worker tirou o lote e está no send
+
+    done = threading.Event()
+
+    def finish():
+        batcher.flush()
+        p.end_cycle(PackedIds(ids))
+        done.set()
+
+    threading.Thread(target=finish, daemon=True).start()
+    assert not done.wait(0.2)  # flush espera o lote em voo
+    release.set()
+    assert done.wait(5)
+    p.drain()
+    # o lote chegou ao MAIN antes do fim do ciclo trocar o `sent`
+    assert [x["servers"] for x in session.payloads] == [[str(uuid.UUID(bytes=i)) for i in ids]]
@@ -0,0 +1,205 @@
+import json
+import mmap
+import os
+import random
+import sys
+import tempfile
+import uuid
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import (  # noqa: E402
+    PackedIds, PoolView, _pool_files, encode_pool, format_job_ids, map_pool,
+    pack_job_id, unpack_job_ids,
+)
+
+
+def make_ids(n, seed=0):
+    rng = random.Random(seed)
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(n)]
+
+
+def packed(ids):
+    return [pack_job_id(i) for i in ids]
+
+
+# -------------------------
+# pack_job_id / format_job_ids / unpack_job_ids
+# -------------------------
+def test_pack_job_id_roundtrip():
+    job_id = "0f8fad5b-d9cb-469f-a165-70867728950e"
+    raw = pack_job_id(job_id)
+    assert raw == uuid.UUID(job_id).bytes
+    assert unpack_job_ids(raw) == [job_id]
+
+
+@pytest.mark.parametrize("job_id", [
+    None,
+    123,
+    "",
+    "0F8FAD5B-D9CB-469F-A165-70867728950E",  # maiúsculo
+    "0f8fad5bd9cb469fa16570867728950e",  # sem hífens
+    "0f8fad5b-d9cb-469f-a165-70867728950",  # curto
+    "0f8fad5b-d9cb-469f-a165-70867728950e0",  # longo
+    "0f8fad5bd-9cb-469f-a165-70867728950e",  # hífen fora do lugar
+    "0f8fad5b-d9cb-469f-a165-70867728950g",  # não hex
+    "0f8fad5b-d9cb-469f-a165-7086772895 e",  # espaço (fromhex ignoraria)
+])
+def test_pack_job_id_rejects(job_id):
+    assert pack_job_id(job_id) is None
+
+
+def test_format_job_ids_matches_uuid_str():
+    ids = make_ids(257)
+    buf = b"".join(packed(ids))
+    assert format_job_ids(buf, b",") == ",".join(ids).encode()
+    assert format_job_ids(buf, b'","') == '","'.join(ids).encode()
+    assert format_job_ids(buf, b"") == "".join(ids).encode()
+    assert unpack_job_ids(buf) == ids
+
+
+def test_format_job_ids_empty_and_memoryview():
+    assert format_job_ids(b"", b",") == b""
+    assert unpack_job_ids(b"") == []
+    ids = make_ids(3)
+    assert unpack_job_ids(memoryview(b"".join(packed(ids)))) == ids
+
+
+# -------------------------
+# PackedIds
+# -------------------------
+def test_add_contains_and_dedup():
+    ids = packed(make_ids(100))
+    pool = PackedIds()
+    assert ids[0] not in pool
+    for job_id in ids:
+        assert pool.add(job_id) is True
+    assert len(pool) == 100
+    assert all(job_id in pool for job_id in ids)
+    assert pool.add(ids[42]) is False
+    assert len(pool) == 100
+    assert packed(make_ids(1, seed=99))[0] not in pool
+
+
+def test_constructor_dedups_and_keeps_first_order():
+    ids = packed(make_ids(20))
+    pool = PackedIds(ids + ids[::-1])
+    assert len(pool) == 20
+    assert list(pool) == ids
+
+
+def test_rehash_keeps_everything_findable():
+    ids = packed(make_ids(5000, seed=1))
+    pool = PackedIds()
+    sizes = set()
+    for job_id in ids:
+        pool.add(job_id)
+        sizes.add(len(pool.table))
+        assert 2 * len(pool) <= len(pool.table)  # carga máxima de 50%
+    assert len(sizes) > 1  # a tabela cresceu várias vezes
+    assert all(job_id in pool for job_id in ids)
+    assert list(pool) == ids
+
+
+def test_colliding_prefixes():
+    # mesmos 8 primeiros bytes (o hash): só a sondagem linear separa
+    ids = [bytes(8) + n.to_bytes(8, "big") for n in range(50)]
+    pool = PackedIds(ids)
+    assert len(pool) == 50
+    assert all(job_id in pool for job_id in ids)
+    assert bytes(8) + (50).to_bytes(8, "big") not in pool
+
+
+def test_copy_is_independent():
+    ids = packed(make_ids(30))
+    pool = PackedIds(ids[:20])
+    clone = pool.copy()
+    clone.add(ids[25])
+    pool.add(ids[21])
+    assert ids[25] in clone and ids[25] not in pool
+    assert ids[21] in pool and ids[21] not in clone
+    assert list(clone) == ids[:20] + [ids[25]]
+
+
+def test_iteration_is_a_snapshot():
+    ids = packed(make_ids(10))
+    pool = PackedIds(ids[:5])
+    it = iter(pool)
+    for job_id in ids[5:]:
+        pool.add(job_id)
+    assert list(it) == ids[:5]
+    assert list(pool) == ids
+    assert pool.strings() == unpack_job_ids(b"".join(ids))
+
+
+def test_from_buffer_on_readonly_mmap(tmp_path):
+    ids = make_ids(64, seed=2)
+    path = tmp_path / "pool.bin"
+    path.write_bytes(encode_pool(PackedIds(packed(ids))))
+
+    pool = map_pool(str(path))
+    assert isinstance(pool.buf, memoryview) and pool.buf.readonly
+    assert pool.table is None  # tabela só na primeira consulta
+    assert len(pool) == 64
+    assert pack_job_id(ids[10]) in pool
+    assert pool.strings() == ids
+
+    # acrescentar copia o buffer: o arquivo continua intacto
+    extra = pack_job_id(make_ids(1, seed=3)[0])
+    assert pool.add(extra) is True
+    assert isinstance(pool.buf, bytearray)
+    assert extra in pool and len(pool) == 65
+    assert map_pool(str(path)).strings() == ids
+
+
+def test_from_buffer_plain_mmap_is_read_only(tmp_path):
+    path = tmp_path / "raw.bin"
+    path.write_bytes(b"".join(packed(make_ids(4))))
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    pool = PackedIds.from_buffer(memoryview(mapped))
+    assert len(pool) == 4
+    with pytest.raises(TypeError):
+        pool.buf[0] = 0
+
+
+def test_map_pool_rejects_json_and_truncated(tmp_path):
+    legacy = tmp_path / "pool.json"
+    legacy.write_text(json.dumps({"servers": make_ids(2)}))
+    assert map_pool(str(legacy)) is None
+
+    truncated = tmp_path / "pool.bin"
+    truncated.write_bytes(encode_pool(PackedIds(packed(make_ids(3))))[:-1])
+    with pytest.raises(ValueError):
+        map_pool(str(truncated))
+
+
+# -------------------------
+# arquivo do pool: binário + pool.json legado
+# -------------------------
+def test_pool_files_never_write_binary_into_json():
+    assert _pool_files("/s/pool.bin") == ("/s/pool.bin", "/s/pool.json")
+    assert _pool_files("/s/pool.json") == ("/s/pool.bin", "/s/pool.json")
+    assert _pool_files("/s/pool.123.json") == ("/s/pool.123.bin", "/s/pool.123.json")
+
+
+def test_load_file_falls_back_to_legacy_json(tmp_path):
+    ids = make_ids(5, seed=4)
+    (tmp_path / "pool.json").write_text(json.dumps({"servers": ids + ["não-é-uuid"]}))
+    view = PoolView(10, "1")
+    view.load_file(str(tmp_path / "pool.bin"), legacy=str(tmp_path / "pool.json"))
+    assert view.ids.strings() == ids
+
+
+def test_load_file_prefers_binary(tmp_path):
+    ids = make_ids(5, seed=5)
+    (tmp_path / "pool.json").write_text(json.dumps({"servers": make_ids(2, seed=6)}))
+    (tmp_path / "pool.bin").write_bytes(encode_pool(PackedIds(packed(ids))))
+    view = PoolView(10, "1")
+    view.load_file(str(tmp_path / "pool.bin"), legacy=str(tmp_path / "pool.json"))
+    assert view.ids.strings() == ids
@@ -0,0 +1,135 @@
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import uuid
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import (  # noqa: E402
+    BOOT_ID, PackedIds, PoolView, app, pack_job_id, parse_version_tag, pool_response, version_tag,
+)
+
+
+def make_ids(n, seed=0):
+    rng = random.Random(seed)
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(n)]
+
+
+def packed(ids):
+    return [pack_job_id(i) for i in ids]
+
+
+def get(view, query="", headers=None):
+    with app.test_request_context(f"/jobs{query}", headers=headers or {}):
+        resp = pool_response(view)
+    if isinstance(resp, tuple):
+        resp, status = resp
+        resp.status_code = status
+    return resp
+
+
+@pytest.fixture
+def view():
+    """Versões 1 (publish), 2 (extend) e 3 (publish com remoções), com 2 diffs guardados."""
+    ids = make_ids(6)
+    v = PoolView(2)
+    v.publish(packed(ids[:3]))
+    v.extend(packed(ids[3:5]))
+    v.publish(packed(ids[1:4] + ids[5:]))
+    v.test_ids = ids
+    return v
+
+
+# -------------------------
+# versões
+# -------------------------
+def test_version_tag_roundtrip():
+    assert parse_version_tag(version_tag(7)) == 7
+    assert parse_version_tag(f'"{version_tag(7)}"') == 7  # aceita a ETag também
+    assert parse_version_tag("deadbeef-7") is None  # outro boot
+    assert parse_version_tag("7") is None  # sem boot
+    assert parse_version_tag(f"{BOOT_ID}--1") is None  # "<BOOT_ID>-" não é este boot
+    for bad in ("abc", "", f"{BOOT_ID}-x"):
+        with pytest.raises(ValueError):
+            parse_version_tag(bad)
+
+
+def test_diff_since_merges_versions(view):
+    ids = view.test_ids
+    assert view.version == 3
+    added, removed, version = view.diff_since(2)
+    assert (sorted(added), sorted(removed), version) == (sorted(ids[5:]), sorted([ids[0], ids[4]]), 3)
+    # 1 -> 3: ids[4] entrou e saiu, não aparece
+    added, removed, _ = view.diff_since(1)
+    assert sorted(added) == sorted([ids[3], ids[5]]) and removed == [ids[0]]
+    assert view.diff_since(3) == ([], [], 3)
+    assert view.diff_since(0) is None  # só 2 diffs guardados
+    assert view.diff_since(4) is None  # versão do futuro
+
+
+def test_publish_without_changes_keeps_version(view):
+    view.publish(PackedIds(view.ids))
+    assert view.version == 3
+    view.extend(packed(view.test_ids[1:2]))
+    assert view.version == 3
+
+
+# -------------------------
+# /jobs: diff, ETag e 304
+# -------------------------
+def test_since_returns_diff(view):
+    resp = get(view, f"?since={version_tag(2)}")
+    assert resp.status_code == 200
+    assert resp.json == {
+        "version": version_tag(3), "since": version_tag(2),
+        "added": view.test_ids[5:], "removed": sorted([view.test_ids[0], view.test_ids[4]], key=view.test_ids.index),
+    }
+    assert resp.headers["X-Pool-Version"] == version_tag(3)
+
+
+@pytest.mark.parametrize("since", ["0", "1", "3", "deadbeef-3"])
+def test_since_from_other_boot_gets_full_body(view, since):
+    # inteiro puro (formato antigo) ou boot diferente: a versão não diz nada deste pool
+    resp = get(view, f"?since={since}")
+    assert resp.status_code == 200
+    assert resp.json["count"] == len(view.ids)
+    assert "added" not in resp.json
+
+
+def test_since_too_old_gets_full_body(view):
+    resp = get(view, f"?since={version_tag(0)}")
+    assert resp.status_code == 200
+    assert sorted(resp.json["servers"]) == sorted(view.ids.strings())
+    assert resp.headers["ETag"] == f'"{version_tag(3)}"'
+
+
+def test_since_invalid(view):
+    assert get(view, "?since=abc").status_code == 400
+
+
+def test_etag_and_304(view):
+    resp = get(view)
+    etag = resp.headers["ETag"]
+    assert etag == view.etag() and BOOT_ID in etag
+    assert json.loads(resp.data)["servers"] == view.ids.strings()
+
+    assert get(view, headers={"If-None-Match": etag}).status_code == 304
+    assert get(view, headers={"If-None-Match": '"deadbeef-3"'}).status_code == 200
+
+    view.extend(packed(make_ids(1, seed=9)))
+    assert get(view, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_gzip_body_is_cached_per_version(view):
+    resp = get(view, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(resp.data)) == {"count": 4, "servers": view.ids.strings()}
+    assert view.rendered(True)[0] is view.body_gz
@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import time
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import RollingCounter  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [6000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_full_window_totals_and_top(clock):
+    counter = RollingCounter(60, 10, 3)
+    for name, n in (("a", 5), ("b", 3), ("c", 1), ("d", 4)):
+        counter.add(name, n=n)
+    assert counter.summary() == (13, 4, [("a", 5), ("d", 4), ("b", 3)])
+    assert len(counter) == 4
+    assert counter.to_dict() == {"a": 5, "b": 3, "c": 1, "d": 4}
+
+
+def test_partial_window_reads_only_its_buckets(clock):
+    counter = RollingCounter(60, 10, 5)
+    counter.add("old", n=7)
+    clock[0] += 180
+    counter.add("new", n=2)
+    counter.add("old")
+    assert counter.window_counts(60) == {"new": 2, "old": 1}
+    assert counter.summary(60) == (3, 2, [("new", 2), ("old", 1)])
+    # 61s arredonda para dois baldes; ainda não alcança o de 3 minutos atrás
+    assert counter.window(61) == 120
+    assert counter.summary(61)[0] == 3
+    assert counter.summary(240) == (10, 2, [("old", 8), ("new", 2)])
+
+
+def test_rotation_expires_counts(clock):
+    counter = RollingCounter(60, 3, 5)
+    counter.add("a", n=2)
+    clock[0] += 60
+    counter.add("b")
+    clock[0] += 120  # o balde de "a" sai da janela
+    assert counter.summary() == (1, 1, [("b", 1)])
+    clock[0] += 60
+    assert counter.summary() == (0, 0, [])
+    assert len(counter) == 0
+
+
+def test_top_skips_stale_heap_entries(clock):
+    counter = RollingCounter(60, 2, 2)
+    counter.add("a", n=10)
+    clock[0] += 60
+    counter.add("b", n=3)
+    counter.add("c", n=2)
+    clock[0] += 60  # "a" expira, mas a entrada (10, a) continua no heap
+    counter.add("c", n=2)
+    assert counter.summary() == (7, 2, [("c", 4), ("b", 3)])
+    assert counter.summary(k=1) == (7, 2, [("c", 4)])
+
+
+def test_add_with_old_timestamp(clock):
+    counter = RollingCounter(60, 5, 5)
+    counter.add("a", ts=clock[0] - 120)
+    counter.add("b", ts=clock[0] - 600)  # fora da janela: ignorado
+    counter.add("c", ts=clock[0] + 600)  # futuro: vai para o balde atual
+    assert counter.to_dict() == {"a": 1, "c": 1}
+    assert counter.window_counts(60) == {"c": 1}
+
+
+def test_snapshot_restore_roundtrip(clock):
+    counter = RollingCounter(60, 10, 5)
+    counter.add("a", n=2)
+    clock[0] += 120
+    counter.add("a")
+    counter.add("b", n=4)
+    snap = counter.snapshot()
+    assert snap["names"]["a"] == [[100, 2], [102, 1]]
+
+    restored = RollingCounter(60, 10, 5)
+    restored.restore(snap)
+    assert restored.to_dict() == counter.to_dict()
+    assert restored.window_counts(60) == {"a": 1, "b": 4}
+
+
+def test_restore_with_different_bucket_size(clock):
+    counter = RollingCounter(30, 20, 5)
+    counter.add("a", ts=clock[0] - 90)
+    counter.add("a")
+    restored = RollingCounter(60, 10, 5)
+    restored.restore(counter.snapshot())
+    assert restored.to_dict() == {"a": 2}
+    assert restored.window_counts(60) == {"a": 1}
+
+
+def test_load_and_clear(clock):
+    counter = RollingCounter(60, 10, 5)
+    counter.load({"a": "3", "b": 1})
+    assert counter.summary() == (4, 2, [("a", 3), ("b", 1)])
+    counter.clear()
+    assert counter.summary() == (0, 0, [])
+    assert counter.snapshot()["names"] == {}
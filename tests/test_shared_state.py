@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# uma instância serverless "quente": lê comandos do stdin e responde uma linha por comando
+INSTANCE = textwrap.dedent("""
+    import json, sys
+    sys.path.insert(0, sys.argv[1])
+    import api.index as app_module
+    client = app_module.app.test_client()
+    for line in sys.stdin:
+        cmd, _, arg = line.strip().partition(" ")
+        if cmd == "post":
+            r = client.post("/api", json={
+                "job_id": "0f8fad5b-d9cb-469f-a165-70867728950e", "name": arg, "generation": "10/s",
+            })
+            print(r.status_code, flush=True)
+        elif cmd == "names":
+            r = client.get("/jobs_history?limit=1000")
+            print(json.dumps(sorted(e["name"] for e in r.json["items"])), flush=True)
+""")
+
+
+class Instance:
+    def __init__(self, state_dir, compact_every):
+        env = {
+            **os.environ,
+            "RUNTIME": "serverless",
+            "STATE_DIR": str(state_dir),
+            "JOURNAL_COMPACT_EVERY": str(compact_every),
+        }
+        self.proc = subprocess.Popen(
+            [sys.executable, "-c", INSTANCE, ROOT],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, env=env,
+        )
+
+    def send(self, command):
+        self.proc.stdin.write(command + "\n")
+        self.proc.stdin.flush()
+        return self.proc.stdout.readline().strip()
+
+    def names(self):
+        return json.loads(self.send("names"))
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait(timeout=30)
+
+
+@pytest.mark.parametrize("compact_every", [1, 2, 5000])
+def test_instances_sharing_state_dir_lose_nothing(tmp_path, compact_every):
+    a, b = Instance(tmp_path, compact_every), Instance(tmp_path, compact_every)
+    fresh = None
+    try:
+        expected = []
+        for i in range(4):
+            for name, inst in ((f"A{i}", a), (f"B{i}", b)):
+                assert inst.send(f"post {name}") == "200"
+                expected.append(name)
+        expected.sort()
+        assert a.names() == expected
+        assert b.names() == expected
+        fresh = Instance(tmp_path, compact_every)
+        assert fresh.names() == expected
+    finally:
+        for inst in (a, b, fresh):
+            if inst is not None:
+                inst.close()
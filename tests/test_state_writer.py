@@ -0,0 +1,81 @@
+import os
+import stat
+import sys
+import tempfile
+import threading
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.index import StateWriter, atomic_write  # noqa: E402
+
+
+def test_atomic_write_replaces_without_leftovers(tmp_path):
+    path = tmp_path / "cache.json"
+    atomic_write(str(path), b"old")
+    atomic_write(str(path), b"new")
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["cache.json"]
+    plain = tmp_path / "plain"
+    plain.write_bytes(b"")
+    # mesma permissão de um open() normal, não a 0600 do mkstemp
+    assert stat.S_IMODE(os.stat(path).st_mode) == stat.S_IMODE(os.stat(plain).st_mode)
+
+
+def test_flush_writes_only_dirty_targets_in_order():
+    calls = []
+    writer = StateWriter(0)
+    for name in ("journal", "cache", "pool:1"):
+        writer.register(name, lambda name=name: calls.append(name))
+    writer.mark_dirty("pool:1")
+    writer.mark_dirty("journal")
+    writer.mark_dirty("journal")  # várias marcações viram uma escrita
+    writer.flush()
+    assert calls == ["journal", "pool:1"]
+    writer.flush()
+    assert calls == ["journal", "pool:1"]
+
+
+def test_failing_target_does_not_stop_the_others():
+    calls = []
+    writer = StateWriter(0)
+
+    def broken():
+        raise OSError("disco cheio")
+
+    writer.register("cache", broken)
+    writer.register("pool:1", lambda: calls.append("pool:1"))
+    writer.mark_dirty("cache")
+    writer.mark_dirty("pool:1")
+    writer.flush()
+    assert calls == ["pool:1"]
+
+
+def test_flush_passes_do_not_interleave():
+    writer = StateWriter(0)
+    inside, release = threading.Event(), threading.Event()
+    order = []
+
+    def slow():
+        order.append("slow:start")
+        inside.set()
+        release.wait(5)
+        order.append("slow:end")
+
+    writer.register("cache", slow)
+    writer.register("pool:1", lambda: order.append("pool:1"))
+    writer.mark_dirty("cache")
+    first = threading.Thread(target=writer.flush)
+    first.start()
+    assert inside.wait(5)
+    writer.mark_dirty("pool:1")
+    second = threading.Thread(target=writer.flush)
+    second.start()
+    second.join(0.2)
+    assert second.is_alive()  # espera a passada em andamento
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert order == ["slow:start", "slow:end", "pool:1"]
@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+import tempfile
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+import api.index as app_module  # noqa: E402
+from api.index import format_window, parse_window, record_detections, reset_cache, stats_content  # noqa: E402
+
+
+def detections(counts):
+    return [
+        {"timestamp": "2026-01-01 00:00:00", "name": name, "generation": "10/s", "rarity": "Secret",
+         "placeId": "1", "jobId": f"{name}-{i}"}
+        for name, n in counts.items() for i in range(n)
+    ]
+
+
+@pytest.fixture
+def fresh():
+    app_module.ensure_cache_loaded()  # senão a primeira requisição recarregaria o STATE_DIR por cima
+    reset_cache()
+    yield
+    reset_cache()
+
+
+@pytest.mark.parametrize("text, seconds", [
+    ("90m", 5400), ("6h", 21600), ("1d", 86400), ("45", 45), (" 2H ", 7200), ("1.5h", 5400),
+])
+def test_parse_window(text, seconds):
+    assert parse_window(text) == seconds
+
+
+@pytest.mark.parametrize("text", ["", "h", "0", "-1h", "abc", "nanh", "infm"])
+def test_parse_window_rejects(text):
+    with pytest.raises(ValueError):
+        parse_window(text)
+
+
+@pytest.mark.parametrize("seconds, text", [(3600, "1h"), (86400, "24h"), (172800, "2d"), (900, "15min"), (30, "1min")])
+def test_format_window(seconds, text):
+    assert format_window(seconds) == text
+
+
+def test_stats_content_empty(fresh):
+    content = stats_content()
+    assert content["fields"] == [] and "Nenhum secret" in content["description"]
+
+
+def test_stats_content_top_and_totals(fresh):
+    record_detections(detections({"A": 3, "B": 5, "C": 1}))
+    content = stats_content()
+    assert "`9`" in content["description"]
+    top = content["fields"][0][1].splitlines()
+    assert top[0].startswith("`1.` **B** - `5x`") and top[1].startswith("`2.` **A** - `3x`")
+    assert ("📈 Tipos Únicos", "`3`", True) in content["fields"]
+
+
+def test_stats_content_is_stable_until_something_changes(fresh):
+    record_detections(detections({"A": 2}))
+    first = json.dumps(stats_content(), sort_keys=True, ensure_ascii=False)
+    # o bot compara este JSON para pular a edição da mensagem
+    assert json.dumps(stats_content(), sort_keys=True, ensure_ascii=False) == first
+    record_detections(detections({"B": 1}))
+    assert json.dumps(stats_content(), sort_keys=True, ensure_ascii=False) != first
+
+
+def test_stats_route(fresh):
+    record_detections(detections({"A": 3, "B": 5, "C": 1}))
+    client = app_module.app.test_client()
+    body = client.get("/stats?window=1h&top=2").json
+    assert body["window"] == "1h" and body["window_seconds"] == 3600
+    assert (body["total"], body["unique"]) == (9, 3)
+    assert body["top"] == [{"name": "B", "count": 5}, {"name": "A", "count": 3}]
+    assert client.get("/stats?window=0").status_code == 400
+    assert client.get("/stats?top=x").status_code == 400
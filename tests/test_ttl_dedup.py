@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+import time
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from api.index import TTLDedup  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_seen_within_ttl(clock):
+    dedup = TTLDedup(60, 100)
+    assert dedup.seen(("job", "A", "1M/s")) is False
+    assert dedup.seen(("job", "A", "1M/s")) is True
+    assert dedup.seen(("job", "A", "2M/s")) is False  # chave inteira conta
+    clock[0] += 59
+    assert dedup.seen(("job", "A", "1M/s")) is True
+
+
+def test_expires_after_ttl(clock):
+    dedup = TTLDedup(60, 100)
+    dedup.seen("a")
+    clock[0] += 60
+    assert dedup.seen("a") is False  # expirou: conta de novo e renova o prazo
+    clock[0] += 30
+    assert dedup.seen("a") is True
+
+
+def test_expired_entries_are_dropped(clock):
+    dedup = TTLDedup(10, 100)
+    for key in "abc":
+        dedup.seen(key)
+    clock[0] += 11
+    dedup.seen("d")
+    assert list(dedup.entries) == ["d"]
+
+
+def test_bounded_drops_oldest(clock):
+    dedup = TTLDedup(60, 3)
+    for key in "abcd":
+        dedup.seen(key)
+        clock[0] += 1
+    assert list(dedup.entries) == ["b", "c", "d"]
+    assert dedup.seen("a") is False
+    assert dedup.seen("d") is True
+
+
+def test_reinsert_moves_to_the_end(clock):
+    dedup = TTLDedup(5, 3)
+    dedup.seen("a")
+    clock[0] += 3
+    dedup.seen("b")
+    clock[0] += 3  # "a" venceu
+    dedup.seen("a")
+    assert list(dedup.entries) == ["b", "a"]
+
+
+def test_stats(clock):
+    dedup = TTLDedup(60, 100)
+    dedup.seen("a")
+    dedup.seen("a")
+    dedup.seen("a")
+    dedup.seen("b")
+    assert dedup.stats() == {"entries": 2, "hits": 2, "misses": 2, "hit_rate": 0.5}
+    assert TTLDedup(60, 10).stats()["hit_rate"] == 0.0
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# serverless: o import não sobe threads, bot nem crawler
+os.environ["RUNTIME"] = "serverless"
+os.environ["STATE_DIR"] = tempfile.mkdtemp(prefix="jobids-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+import api.index as app_module  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def executor(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="wsgi")
+    monkeypatch.setattr(app_module, "WSGI_EXECUTOR", pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def call(method, path, **kwargs):
+    """Uma requisição pelo _wsgi_bridge; devolve (status, headers, corpo)."""
+    async def run():
+        web_app = web.Application()
+        web_app.router.add_route("*", "/{tail:.*}", app_module._wsgi_bridge)
+        async with TestClient(TestServer(web_app)) as client:
+            async with client.request(method, path, **kwargs) as resp:
+                return resp.status, resp.headers, await resp.read()
+    return asyncio.run(run())
+
+
+def test_write_callable_sized(monkeypatch):
+    def wsgi(environ, start_response):
+        write = start_response("201 Created", [("Content-Type", "text/plain"), ("Content-Length", "11")])
+        write(b"hello ")
+        return [b"world"]
+
+    monkeypatch.setattr(app_module, "app", wsgi)
+    status, _, body = call("GET", "/x")
+    assert (status, body) == (201, b"hello world")
+
+
+def test_write_callable_streamed(monkeypatch):
+    def wsgi(environ, start_response):
+        write = start_response("200 OK", [("Content-Type", "text/plain")])
+        write(b"a")
+        write(bytearray(b"b"))
+
+        def chunks():
+            yield b"c"
+            write(b"d")
+            yield b""
+            yield b"e"
+            write(b"f")
+        return chunks()
+
+    monkeypatch.setattr(app_module, "app", wsgi)
+    assert call("GET", "/x")[2] == b"abcdef"
+
+
+def test_environ_and_request_body(monkeypatch):
+    seen = {}
+
+    def wsgi(environ, start_response):
+        seen.update(
+            method=environ["REQUEST_METHOD"], path=environ["PATH_INFO"], query=environ["QUERY_STRING"],
+            type=environ.get("CONTENT_TYPE"), custom=environ.get("HTTP_X_CUSTOM"),
+            lines=list(environ["wsgi.input"]),
+        )
+        start_response("200 OK", [("Content-Length", "0")])
+        return []
+
+    monkeypatch.setattr(app_module, "app", wsgi)
+    call("POST", "/a%20b?x=1&y=2", data=b"um\ndois\ntres", headers={
+        "Content-Type": "text/plain", "X-Custom": "v",
+    })
+    assert seen == {
+        "method": "POST", "path": "/a b", "query": "x=1&y=2", "type": "text/plain", "custom": "v",
+        "lines": [b"um\n", b"dois\n", b"tres"],
+    }
+
+
+def test_flask_routes_through_bridge():
+    status, headers, body = call("GET", "/jobs")
+    assert status == 200 and headers["ETag"].startswith('"')
+    status, _, _ = call("GET", "/jobs", headers={"If-None-Match": headers["ETag"]})
+    assert status == 304
+
+    name = f"bridge-{uuid.uuid4().hex[:8]}"
+    lines = [json.dumps({"name": name, "generation": "10/s", "jobId": str(uuid.uuid4())}) for _ in range(3)]
+    status, headers, body = call("POST", "/api/batch", data="\n".join(lines).encode(),
+                                 headers={"Content-Type": "application/x-ndjson"})
+    assert status == 200
+    assert [json.loads(line)["code"] for line in body.splitlines()] == [200, 200, 200]
+
+
+def test_run_blocking_leaves_the_loop_thread():
+    async def run():
+        loop_thread = threading.current_thread()
+        worker = await app_module.run_blocking(threading.current_thread)
+        return loop_thread, worker
+
+    loop_thread, worker = asyncio.run(run())
+    assert worker is not loop_thread